@@ -86,10 +86,16 @@ class Chatbot {
     } catch (e) {
         // Invalid user data, redirect to login
         localStorage.removeItem('user');
+        localStorage.removeItem('token');
         window.location.href = 'login.html';
     }
 }
 
+    authHeaders() {
+        const token = localStorage.getItem('token');
+        return token ? { 'Authorization': `Bearer ${token}` } : {};
+    }
+
     updateCharCounter() {
         const count = this.input.value.length;
         const max = 2000;
@@ -148,6 +154,14 @@ class Chatbot {
         this.messages.innerHTML = '';
         this.chatHistory = [];
         this.addWelcomeMessage();
+        fetch('http://localhost:5000/clear', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                ...this.authHeaders()
+            },
+            body: JSON.stringify({ conversation_id: this.currentSessionId })
+        }).catch(error => console.error('Error clearing chat:', error));
         this.showToast('Chat cleared successfully');
     }
 
@@ -335,8 +349,9 @@ class Chatbot {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    ...this.authHeaders()
                 },
-                body: JSON.stringify({ message: message })
+                body: JSON.stringify({ message: message, conversation_id: this.currentSessionId })
             });
             
             if (!response.ok) {
@@ -468,9 +483,11 @@ class Chatbot {
         const formData = new FormData();
         formData.append('image', file);
         formData.append('message', 'Analyze this image');
+        formData.append('conversation_id', this.currentSessionId);
         
         fetch('http://localhost:5000/chat-image', {
             method: 'POST',
+            headers: this.authHeaders(),
             body: formData
         })
         .then(response => response.json())
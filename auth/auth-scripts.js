@@ -283,6 +283,7 @@ class AuthHandler {
                 
                 // Store user info in localStorage
                 localStorage.setItem('user', JSON.stringify(result.user));
+                localStorage.setItem('token', result.token);
                 
                 // Redirect to chat after a short delay
                 setTimeout(() => {
@@ -1,18 +1,24 @@
 from flask import Flask
 from flask_cors import CORS
 import logging
+import threading
 from config import *
 from utils.database import test_db_connection
 from routes.auth import auth_bp
 from routes.chat import chat_bp
 from routes.agent import agent_bp
-from models.conversation import SimpleChatBot
+from models.session_store import SessionStore
 
 # Import configuration
 from config import *
 
 # Import utilities
 from utils.database import test_db_connection
+from utils.ollama_client import ollama_client
+from utils.health_monitor import health_monitor
+from utils.python_sandbox import python_sandbox
+from utils.csharp_runner import csharp_runner
+from utils.uploads import UploadRequest
 
 # Import route blueprints
 from routes.auth import auth_bp
@@ -20,7 +26,7 @@ from routes.chat import chat_bp
 from routes.agent import agent_bp
 
 # Import models
-from models.conversation import SimpleChatBot
+from models.session_store import SessionStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,14 +37,26 @@ app = Flask(__name__)
 CORS(app)
 CORS(app, supports_credentials=True, origins=['*'])
 
+# Refuse oversized bodies before reading them and spool large uploads to disk
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES
+app.request_class = UploadRequest
+
 # Test database connection on startup
 test_db_connection()
 
-# Initialize chatbot instance
-chatbot = SimpleChatBot()
+# Load the models in the background so the first chat doesn't wait for it
+threading.Thread(target=ollama_client.warmup, daemon=True).start()
+
+# Keep Ollama's status fresh for /health and the circuit breaker
+health_monitor.start()
+
+# Start the Python sandbox workers so the first code run doesn't wait for them
+python_sandbox.start()
+# Create and restore the C# workspaces in the background
+csharp_runner.start()
 
-# Make chatbot available to routes
-app.chatbot = chatbot
+# Per-user chat sessions, each with its own chatbot and history
+app.sessions = SessionStore()
 
 # Register blueprints
 app.register_blueprint(auth_bp)
@@ -47,7 +65,7 @@ app.register_blueprint(agent_bp)
 
 if __name__ == '__main__':
     print(f"🚀 Starting Flask server...")
-    print(f"📡 Ollama URL: {OLLAMA_BASE_URL}")
+    print(f"📡 Ollama URLs: {', '.join(endpoint['url'] for endpoint in OLLAMA_ENDPOINTS)}")
     print(f"🤖 Model: {MODEL_NAME}")
     print(f"🌐 Visit: http://localhost:5000")
     print("⚠️  Make sure Ollama is running!")
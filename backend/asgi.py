@@ -0,0 +1,82 @@
+"""Async (ASGI) entry point serving the same routes as app.py.
+
+Run with an ASGI server, e.g. `hypercorn asgi:app --bind 0.0.0.0:5000`.
+Requests waiting on Ollama or MySQL hold a coroutine instead of a thread.
+"""
+from quart import Quart
+from quart_cors import cors
+import asyncio
+import logging
+
+# Import configuration
+from config import OLLAMA_ENDPOINTS, MODEL_NAME, UPLOAD_MAX_BYTES
+
+# Import utilities
+from utils.async_database import init_db_pool, close_db_pool
+from utils.async_ollama_client import async_ollama_client
+from utils.history_writer import history_writer
+from utils.health_monitor import health_monitor
+from utils.python_sandbox import python_sandbox
+from utils.csharp_runner import csharp_runner
+from utils.async_uploads import UploadRequest
+
+# Import route blueprints
+from routes.async_auth import auth_bp
+from routes.async_chat import chat_bp
+from routes.async_agent import agent_bp
+
+# Import models
+from models.session_store import SessionStore
+from models.async_summarizer import async_summarizer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Initialize Quart app
+app = Quart(__name__)
+app = cors(app, allow_origin='*')
+
+# Refuse oversized bodies before reading them and spool large uploads to disk
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES
+app.request_class = UploadRequest
+
+# Per-user chat sessions, each with its own chatbot and history
+app.sessions = SessionStore(summarizer=async_summarizer)
+
+# Register blueprints
+app.register_blueprint(auth_bp)
+app.register_blueprint(chat_bp)
+app.register_blueprint(agent_bp)
+
+@app.before_serving
+async def startup():
+    await init_db_pool()
+    # Load the models in the background so the first chat doesn't wait for it
+    app.warmup_task = asyncio.create_task(async_ollama_client.warmup())
+    # Keep Ollama's status fresh for /health and the circuit breaker
+    health_monitor.start()
+    # Run summaries on this loop through the async scheduler and client
+    async_summarizer.start()
+    # Start the Python sandbox workers so the first code run doesn't wait for them
+    python_sandbox.start()
+    # Create and restore the C# workspaces in the background
+    csharp_runner.start()
+
+@app.after_serving
+async def shutdown():
+    health_monitor.stop()
+    await asyncio.to_thread(python_sandbox.stop)
+    await async_ollama_client.aclose()
+    # Write out any queued history before the process exits
+    await asyncio.to_thread(history_writer.stop)
+    await close_db_pool()
+
+if __name__ == '__main__':
+    print(f"🚀 Starting ASGI server...")
+    print(f"📡 Ollama URLs: {', '.join(endpoint['url'] for endpoint in OLLAMA_ENDPOINTS)}")
+    print(f"🤖 Model: {MODEL_NAME}")
+    print(f"🌐 Visit: http://localhost:5000")
+    print("⚠️  Make sure Ollama is running!")
+    
+    app.run(host='0.0.0.0', port=5000)
@@ -27,6 +27,9 @@ app = Flask(__name__)
 CORS(app)
 CORS(app, supports_credentials=True, origins=['*'])
 
+# Local data such as SQLite caches, kept next to the code rather than in the working directory
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
 # Configuration
 OLLAMA_BASE_URL = "http://localhost:11434"
 MODEL_NAME = "deepseek-r1:1.5b"
@@ -39,4 +42,150 @@ DB_CONFIG = {
     'user': 'root',
     'password': 'Alinx123@'
 }
-JWT_SECRET = 'sk-auth-2024-xyz789-secure-jwt-token-abcd1234-random-key'
\ No newline at end of file
+JWT_SECRET = 'sk-auth-2024-xyz789-secure-jwt-token-abcd1234-random-key'
+
+# Ollama HTTP client
+OLLAMA_POOL_CONNECTIONS = 2      # Distinct hosts kept in the pool
+OLLAMA_POOL_MAXSIZE = 16         # Keep-alive connections kept per host; extra ones are closed after use
+OLLAMA_MAX_RETRIES = 3           # Retries on connection errors only
+OLLAMA_RETRY_BACKOFF = 0.5       # Seconds, doubled on every retry
+OLLAMA_CONNECT_TIMEOUT = 3
+OLLAMA_TIMEOUTS = {              # Read timeout in seconds per route
+    'chat': 60,
+    'vision': 120,
+    'summary': 120,
+    'health': 5,
+    'warmup': 300
+}
+OLLAMA_KEEP_ALIVE = '30m'           # How long Ollama keeps a model loaded after a request
+OLLAMA_WARMUP_MODELS = ['deepseek-r1:1.5b', 'llava:7b']  # Loaded at startup
+
+# Ollama endpoints and the models each one serves (no 'models' means all).
+# Requests go to the healthy endpoint with the fewest requests in flight,
+# and a conversation sticks to the endpoint that served it last.
+OLLAMA_ENDPOINTS = [
+    {'url': OLLAMA_BASE_URL, 'models': ['deepseek-r1:1.5b', 'llava:7b']},
+]
+OLLAMA_AFFINITY_SIZE = 1000         # Conversations whose endpoint is remembered
+
+# Conversation sessions
+SESSION_MAX_SESSIONS = 500          # Least recently used sessions are evicted past this
+SESSION_TTL_SECONDS = 60 * 60       # Idle sessions expire after an hour
+SESSION_MAX_BYTES = 50 * 1024 * 1024  # Cap on history text held across all sessions
+
+# Database connection pool
+DB_POOL_MIN_SIZE = 1                # Connections the async pool opens up front
+DB_POOL_MAX_SIZE = 10               # Hard cap on open connections per process
+DB_POOL_CHECKOUT_TIMEOUT = 5        # Seconds to wait for a free connection
+DB_POOL_PING_INTERVAL = 30          # Ping idle connections older than this before reuse
+
+# Password hashing
+BCRYPT_ROUNDS = 12                  # Hashes with other rounds are upgraded on login
+AUTH_HASH_WORKERS = 2               # Threads dedicated to bcrypt
+AUTH_HASH_QUEUE_LIMIT = 8           # Hashes allowed to wait before we answer 503
+AUTH_HASH_TIMEOUT = 10              # Seconds a request waits for its hash
+
+# Verified token cache
+JWT_CACHE_SIZE = 10000              # Recently verified tokens kept in memory
+
+# Conversation persistence (write-behind to MySQL)
+HISTORY_PERSISTENCE = True
+HISTORY_BATCH_SIZE = 200            # Messages per multi-row insert
+HISTORY_FLUSH_INTERVAL = 1.0        # Max seconds a message waits before being written
+HISTORY_QUEUE_LIMIT = 10000         # Messages are dropped (and counted) past this backlog
+HISTORY_LOAD_LIMIT = 50             # Messages loaded when a session resumes
+
+# Prompt token budgets (approximate tokens for system prompt + history)
+CONTEXT_TOKEN_BUDGETS = {
+    'deepseek-r1:1.5b': 3000,
+    'llava:7b': 2000
+}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 2000
+HISTORY_MAX_MESSAGES = 50           # Hard cap on messages kept per session
+
+# Rolling summaries of older turns
+SUMMARY_ENABLED = True
+SUMMARY_TRIGGER = 10                # Fold old turns once a session holds more messages than this
+SUMMARY_KEEP_RECENT = 6             # Newest messages always kept verbatim
+SUMMARY_MAX_TOKENS = 300            # Length limit for the generated summary
+SUMMARY_WORKERS = 1                 # Background threads generating summaries
+
+# System prompt cache
+PROMPT_CACHE_SIZE = 256             # Distinct context signatures kept rendered
+# 'prefix' keeps the system prompt static so Ollama can reuse its cached
+# prefill, and sends context hints with the latest user turn instead.
+# 'system' renders the hints into the system prompt as before.
+PROMPT_LAYOUT = 'prefix'
+
+# Exact-match response cache
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_MAX_BYTES = 16 * 1024 * 1024   # Total response text kept in memory
+RESPONSE_CACHE_TTL = 24 * 3600      # Seconds before a cached answer is regenerated
+RESPONSE_CACHE_PATH = None          # SQLite file that keeps the cache across restarts, e.g. os.path.join(DATA_DIR, 'response_cache.db')
+
+# Coalesce identical concurrent requests into one Ollama generation
+SINGLE_FLIGHT_ENABLED = True
+
+# Ollama request scheduling (weighted fair queuing per user)
+SCHEDULER_MODEL_CONCURRENCY = {     # Generations run in parallel per model and endpoint
+    'deepseek-r1:1.5b': 1,
+    'llava:7b': 1
+}
+SCHEDULER_DEFAULT_CONCURRENCY = 1
+SCHEDULER_QUEUE_LIMIT = 32          # Waiting requests per model before we answer 503
+SCHEDULER_QUEUE_TIMEOUT = 60        # Seconds a request may wait before it is dropped
+SCHEDULER_USER_WEIGHTS = {}         # Share of a user key relative to the default 1.0, e.g. {'user:1': 2.0}
+
+# Ollama health monitoring and circuit breaker
+HEALTH_CHECK_INTERVAL = 10          # Seconds between background checks while Ollama is up
+HEALTH_RETRY_INTERVAL = 2           # Seconds between checks while it is down
+HEALTH_FAILURE_THRESHOLD = 3        # Consecutive failed checks before an endpoint is ejected
+CIRCUIT_FAILURE_THRESHOLD = 3       # Consecutive failed calls that open the circuit
+CIRCUIT_RESET_TIMEOUT = 15          # Seconds the circuit stays open before probing again
+CIRCUIT_HALF_OPEN_PROBES = 1        # Calls let through while half-open
+
+# Image preprocessing for the vision model
+IMAGE_MAX_BYTES = 20 * 1024 * 1024  # Largest upload accepted
+IMAGE_MAX_PIXELS = 50_000_000       # Largest image accepted, in width * height
+IMAGE_TARGET_SIZE = 672             # Longest side sent to llava, its native input resolution
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WORKERS = 2                   # Threads decoding and resizing uploads
+IMAGE_QUEUE_LIMIT = 8               # Uploads allowed to wait before we answer 503
+IMAGE_TIMEOUT = 30                  # Seconds a request waits for its image
+
+# Python code sandbox (worker processes for execute_python_code)
+SANDBOX_WORKERS = 2
+SANDBOX_MAX_RUNS = 50               # Runs before a worker is replaced by a fresh process
+SANDBOX_CPU_SECONDS = 5             # CPU time per run (rlimit, not enforced on Windows)
+SANDBOX_WALL_SECONDS = 10           # Real time per run before the worker is killed
+SANDBOX_MEMORY_BYTES = 512 * 1024 * 1024   # Address space per worker (rlimit, not enforced on Windows)
+SANDBOX_OUTPUT_BYTES = 64 * 1024    # Captured stdout/stderr kept per run
+SANDBOX_QUEUE_TIMEOUT = 10          # Seconds a run waits for a free worker
+SANDBOX_PRELOAD = ['math', 'json', 're', 'datetime', 'collections', 'itertools', 'random', 'statistics']
+
+# C# snippets (pre-restored .NET workspaces and a cache of compiled snippets)
+DOTNET_EXECUTABLE = 'dotnet'        # Path to the .NET CLI, or a stand-in for local testing
+CSHARP_WORK_DIR = None              # Workspaces and build cache; None uses <tempdir>/agent_csharp
+CSHARP_WORKSPACES = 2               # Projects available for concurrent builds
+CSHARP_CACHE_ENTRIES = 200          # Compiled snippets kept, least recently used evicted
+CSHARP_BUILD_TIMEOUT = 60
+CSHARP_RUN_TIMEOUT = 10
+CSHARP_QUEUE_TIMEOUT = 30           # Seconds a build waits for a free workspace
+CSHARP_RETRY_INTERVAL = 60          # Seconds before workspaces that failed to prepare are tried again
+
+# Calculator tool limits
+CALC_MAX_LENGTH = 500               # Characters in one expression
+CALC_MAX_OPERATIONS = 100           # Operators and function calls in one expression
+CALC_MAX_EXPONENT = 1000
+CALC_MAX_DIGITS = 100               # Largest result (and fraction denominator), in decimal digits
+CALC_CACHE_SIZE = 1024              # Compiled expressions kept
+
+# Request bodies and file uploads
+UPLOAD_MAX_BYTES = IMAGE_MAX_BYTES + 1024 * 1024   # Largest request body, an image plus form fields
+UPLOAD_SPOOL_BYTES = 512 * 1024     # Uploads past this are spooled to a temporary file
+
+# Image analysis cache (vision answers keyed by preprocessed image and prompt)
+IMAGE_CACHE_ENABLED = True
+IMAGE_CACHE_PATH = os.path.join(DATA_DIR, 'image_cache.db')   # SQLite file that keeps answers across restarts
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024   # Least recently used answers are evicted past this
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from config import MODEL_NAME, SUMMARY_WORKERS
+from models.summarizer import ConversationSummarizer
+from utils.async_ollama_client import async_ollama_client
+from utils.async_scheduler import async_ollama_scheduler
+from utils.scheduler import request_cost
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConversationSummarizer(ConversationSummarizer):
+    """ConversationSummarizer for the ASGI app.
+
+    Summaries run as tasks on the serving loop through the async scheduler
+    and client, so they share slots and endpoints with the app's own chats.
+    """
+
+    def __init__(self, workers=SUMMARY_WORKERS, scheduler=async_ollama_scheduler, client=async_ollama_client):
+        self.workers = workers
+        self.scheduler = scheduler
+        self.client = client
+        self.loop = None
+        self.semaphore = None
+
+    def start(self):
+        """Bind to the serving loop; called at app startup"""
+        self.loop = asyncio.get_running_loop()
+        self.semaphore = asyncio.Semaphore(self.workers)
+
+    def submit(self, chatbot, messages):
+        # Turns may finish on worker threads, so always hand over to the loop
+        if self.loop is None:
+            chatbot.end_summary()
+            return
+        asyncio.run_coroutine_threadsafe(self.run(chatbot, messages), self.loop)
+
+    async def run(self, chatbot, messages):
+        try:
+            async with self.semaphore:
+                summary = await self.summarize(chatbot, messages)
+            if summary:
+                chatbot.apply_summary(summary, messages)
+                logger.info(f"Folded {len(messages)} messages into summary")
+        except Exception as e:
+            logger.error(f"Summary error: {str(e)}")
+        finally:
+            chatbot.end_summary()
+
+    async def summarize(self, chatbot, messages):
+        """Ask the model for an updated summary, or None on failure"""
+        payload = self.build_payload(chatbot, messages)
+        async with self.scheduler.slot(MODEL_NAME, 'system:summary', request_cost(payload)):
+            response = await self.client.chat(payload, route='summary')
+        return self.parse_response(chatbot, response)
+
+
+async_summarizer = AsyncConversationSummarizer()
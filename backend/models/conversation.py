@@ -1,8 +1,13 @@
 from dataclasses import dataclass
+from collections import Counter, deque
 from typing import Dict, List, Set, Tuple
 import requests
+import httpx
+import json
 import re
 import logging
+import threading
+import asyncio
 import os
 import glob
 import platform
@@ -12,10 +17,29 @@ import sys
 from io import StringIO
 import tempfile
 import shutil
-from config import OLLAMA_BASE_URL, MODEL_NAME, MAX_TOKENS, TEMPERATURE
+from config import MODEL_NAME, MAX_TOKENS, TEMPERATURE, HISTORY_MAX_MESSAGES, SUMMARY_TRIGGER, SUMMARY_KEEP_RECENT, PROMPT_LAYOUT, RESPONSE_CACHE_ENABLED
 from utils.agent_tools import AgentTools
+from utils.stream_cleaner import StreamCleaner, tidy
+from utils.single_flight import single_flight
+from utils.async_single_flight import async_single_flight
+from utils.scheduler import SchedulerBusy
+from utils.circuit_breaker import CircuitOpen
+from utils.response_cache import response_cache, cache_key
+from utils.token_budget import budget_for, fit_history, message_tokens, estimate_tokens, MESSAGE_OVERHEAD
+from models.summarizer import summarizer
+from models.prompts import BASE_PROMPT, render_system_prompt, render_context_hints, prompt_signature
+from utils.keyword_matcher import keyword_matcher, QUESTION_TYPES, LANGUAGE_ALIASES
 logger = logging.getLogger(__name__)
 
+CONTEXT_WINDOW = 6  # Messages the conversation context is derived from
+
+# Failures of the sync (requests) and async (httpx) clients, checked in this order
+TIMEOUT_ERRORS = (requests.exceptions.Timeout, httpx.TimeoutException)
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError, httpx.TransportError, CircuitOpen)
+
+MODEL_ERROR_REPLY = "I'm having trouble connecting to the AI model. Please try again."
+AGENTIC_ERROR_REPLY = "I encountered an error processing your request."
+
 @dataclass
 class Task:
     id: str
@@ -32,6 +56,7 @@ class ConversationContext:
     user_skill_level: str  # beginner, intermediate, advanced
     question_types: List[str]
     error_patterns: List[str]
+    top_topics: List[str] = None  # Up to 3 most mentioned topics
     
     def __post_init__(self):
         if not isinstance(self.languages_mentioned, set):
@@ -39,223 +64,175 @@ class ConversationContext:
         if not isinstance(self.topics_discussed, set):
             self.topics_discussed = set()
 
+
+@dataclass
+class MessageAnalysis:
+    """Keyword analysis of one message, computed once when it is added"""
+    languages: Set[str]
+    topics: Set[str]
+    question_type: str
+    skill_hint: str     # beginner, advanced or '' if neither
+    error_excerpt: str  # Start of the message if it mentions an error, else ''
+
+
+def analyze_message(content: str) -> MessageAnalysis:
+    """Run the keyword matcher once and derive everything the context needs"""
+    hits = keyword_matcher.find(content)
+    if 'beginner' in hits:
+        skill_hint = 'beginner'
+    elif 'advanced' in hits:
+        skill_hint = 'advanced'
+    else:
+        skill_hint = ''
+    return MessageAnalysis(
+        languages={LANGUAGE_ALIASES.get(lang, lang) for lang in hits.get('language', ())},
+        topics=set(hits.get('topic', ())),
+        question_type=next((q_type for q_type in QUESTION_TYPES if q_type in hits), 'general'),
+        skill_hint=skill_hint,
+        error_excerpt=content[:100] if 'error' in hits else ''  # First 100 chars
+    )
+
 class SimpleChatBot:
-    def __init__(self):
-        self.conversation_history = []
-        self.max_history = 6  # Keep last 6 messages
+    def __init__(self, persist=None, history_loader=None, user_key=None, conversation_id=None,
+                 summarizer=summarizer):
+        self.user_key = user_key  # Whose turn this is, for fair scheduling
+        # Keeps the conversation on the Ollama endpoint holding its prompt cache
+        self.affinity_key = (user_key, conversation_id) if user_key else None
+        self._history = []
+        self.max_history = HISTORY_MAX_MESSAGES  # Prompts are trimmed by token budget
+        self.lock = threading.Lock()  # Serializes turns within one session
+        self.async_lock = asyncio.Lock()  # Same, for the ASGI app
+        self.persist = persist  # Called with (role, content) for every new message
+        self.history_loader = history_loader  # Loads saved history on first use
+        self.history_lock = threading.Lock()  # Guards history against the summarizer thread
+        # Running summary of turns folded out of history. It lives in memory
+        # only: folded messages stay in the database, so a reloaded session
+        # summarizes its last HISTORY_LOAD_LIMIT messages again as it grows
+        self.summary = ""
+        self.summarizing = False  # A summary update is in flight; guarded by history_lock
+        self.summarizer = summarizer  # Sync or async, matching the app serving this session
+        # Context of the last CONTEXT_WINDOW messages, updated as they are added
+        self.context_window = deque()
+        self.language_counts = Counter()
+        self.topic_counts = Counter()
+        self.queue_info = {}  # Queue position and wait of the latest generation
+
+    @property
+    def conversation_history(self):
+        self.load_history()
+        return self._history
+
+    @conversation_history.setter
+    def conversation_history(self, history):
+        self._history = history
+
+    def load_history(self):
+        """Load persisted history the first time a resumed session is used"""
+        if self.history_loader is None:
+            return
+        loader, self.history_loader = self.history_loader, None
+        try:
+            loaded = loader()[-self.max_history:]
+        except Exception as e:
+            logger.error(f"History load error: {str(e)}")
+            return
+        with self.history_lock:
+            self._history = loaded + self._history
+            self.rebuild_context()
+
+    def track_message(self, msg):
+        """Add a message's analysis to the context window, evicting the oldest"""
+        analysis = msg['analysis']
+        self.context_window.append(analysis)
+        self.language_counts.update(analysis.languages)
+        self.topic_counts.update(analysis.topics)
+        if len(self.context_window) > CONTEXT_WINDOW:
+            evicted = self.context_window.popleft()
+            for counts, keys in ((self.language_counts, evicted.languages), (self.topic_counts, evicted.topics)):
+                for key in keys:
+                    counts[key] -= 1
+                    if counts[key] <= 0:
+                        del counts[key]
+
+    def rebuild_context(self):
+        """Recompute the context window after history was replaced wholesale"""
+        self.context_window.clear()
+        self.language_counts.clear()
+        self.topic_counts.clear()
+        for msg in self._history[-CONTEXT_WINDOW:]:
+            if 'analysis' not in msg:
+                msg['analysis'] = analyze_message(msg.get('content', ''))
+            self.track_message(msg)
 
     def classify_question_type(self, message: str) -> str:
         """Classify the type of programming question"""
-        message_lower = message.lower()
-        if any(word in message_lower for word in ["error", "exception", "bug", "not working", "broken", "crash"]):
-            return "debugging"
-        elif any(phrase in message_lower for phrase in ["how to", "how do i", "how can i", "tutorial", "guide"]):
-            return "tutorial"
-        elif any(word in message_lower for word in ["best", "better", "optimize", "improve", "recommend"]):
-            return "advice"
-        elif any(phrase in message_lower for phrase in ["explain", "what does", "analyze", "review"]):
-            return "explanation"
-        elif any(word in message_lower for word in ["vs", "versus", "compare", "difference"]):
-            return "comparison"
-        elif any(word in message_lower for word in ["install", "setup", "configure", "environment"]):
-            return "setup"
-        else:
-            return "general"
+        hits = keyword_matcher.find(message)
+        for question_type in QUESTION_TYPES:
+            if question_type in hits:
+                return question_type
+        return "general"
         
     def extract_programming_languages(self, message: str) -> Set[str]:
         """Extract mentioned programming languages from message"""
-        languages = {
-            'python', 'javascript', 'java', 'c#', 'csharp', 'c++', 'cpp', 'c', 
-            'php', 'ruby', 'go', 'rust', 'swift', 'kotlin', 'scala', 'r',
-            'html', 'css', 'sql', 'typescript', 'dart', 'perl', 'bash', 'shell'
-        }
-        message_lower = message.lower()
-        found_languages = set()
-
-        for lang in languages:
-            if lang in message_lower:
-                # Normalize language names
-                if lang in ['c#', 'csharp']:
-                    found_languages.add('csharp')
-                elif lang in ['c++', 'cpp']:
-                    found_languages.add('cpp')
-                elif lang == 'javascript':
-                    found_languages.add('javascript')
-                else:
-                    found_languages.add(lang)
-                    
-        return found_languages
+        languages = keyword_matcher.find(message).get('language', set())
+        # Normalize language names
+        return {LANGUAGE_ALIASES.get(lang, lang) for lang in languages}
     
     def detect_skill_level(self, message: str, history: List[Dict]) -> str:
         """Detect user's programming skill level"""
-        message_lower = message.lower()
-        
-        # Beginner indicators
-        beginner_keywords = [
-            'beginner', 'new to', 'learning', 'just started', 'first time',
-            'basics', 'simple', 'easy way', 'tutorial', 'guide'
-        ]
-        
-        # Advanced indicators  
-        advanced_keywords = [
-            'optimization', 'performance', 'architecture', 'design pattern',
-            'algorithm complexity', 'scalability', 'refactor', 'enterprise'
-        ]
-        
-        if any(keyword in message_lower for keyword in beginner_keywords):
+        hits = keyword_matcher.find(message)
+        if 'beginner' in hits:
             return 'beginner'
-        elif any(keyword in message_lower for keyword in advanced_keywords):
+        elif 'advanced' in hits:
             return 'advanced'
         
         # Check conversation history for skill indicators
-        recent_messages = [msg.get('content', '') for msg in history[-4:]]
-        all_text = ' '.join(recent_messages).lower()
+        history_hits = set()
+        for msg in history[-4:]:
+            history_hits.update(keyword_matcher.find(msg.get('content', '')))
         
-        if any(keyword in all_text for keyword in beginner_keywords):
+        if 'beginner' in history_hits:
             return 'beginner'
-        elif any(keyword in all_text for keyword in advanced_keywords):
+        elif 'advanced' in history_hits:
             return 'advanced'
             
         return 'intermediate'
     
     def build_context_from_history(self) -> ConversationContext:
-        """Extract context from recent conversation history"""
-        languages_mentioned = set()
-        topics_discussed = set()
-        question_types = []
-        error_patterns = []
+        """Build context from the incrementally maintained window of recent messages"""
+        self.load_history()
+        with self.history_lock:
+            window = list(self.context_window)
+            languages_mentioned = set(self.language_counts)
+            topics_discussed = set(self.topic_counts)
+            top_topics = [topic for topic, _ in sorted(self.topic_counts.items(), key=lambda item: (-item[1], item[0]))[:3]]
         
-        # Analyze last 6 messages
-        for msg in self.conversation_history[-6:]:
-            content = msg.get('content', '')
-            
-            # Extract languages
-            languages_mentioned.update(self.extract_programming_languages(content))
-            
-            # Extract question type
-            q_type = self.classify_question_type(content)
-            if q_type != 'general':
-                question_types.append(q_type)
-            
-            # Extract topics (frameworks, technologies)
-            content_lower = content.lower()
-            topics = [
-                'react', 'angular', 'vue', 'nodejs', 'express', 'django', 'flask',
-                'spring', 'hibernate', 'mongodb', 'mysql', 'postgresql', 'redis',
-                'docker', 'kubernetes', 'aws', 'azure', 'git', 'machine learning',
-                'ai', 'web development', 'mobile development', 'game development'
-            ]
-            
-            for topic in topics:
-                if topic in content_lower:
-                    topics_discussed.add(topic)
-            
-            # Extract error patterns
-            if any(word in content_lower for word in ['error', 'exception', 'traceback']):
-                error_patterns.append(content[:100])  # First 100 chars
+        question_types = [a.question_type for a in window if a.question_type != 'general']
+        error_patterns = [a.error_excerpt for a in window if a.error_excerpt]
         
-        skill_level = self.detect_skill_level(
-            self.conversation_history[-1].get('content', '') if self.conversation_history else '',
-            self.conversation_history
-        )
+        # The latest message decides first, then the last 4 messages
+        skill_level = 'intermediate'
+        if window and window[-1].skill_hint:
+            skill_level = window[-1].skill_hint
+        else:
+            recent_hints = {a.skill_hint for a in window[-4:]}
+            if 'beginner' in recent_hints:
+                skill_level = 'beginner'
+            elif 'advanced' in recent_hints:
+                skill_level = 'advanced'
         
         return ConversationContext(
             languages_mentioned=languages_mentioned,
             topics_discussed=topics_discussed,
             user_skill_level=skill_level,
             question_types=question_types[-3:],  # Keep last 3 question types
-            error_patterns=error_patterns[-2:]   # Keep last 2 error patterns
+            error_patterns=error_patterns[-2:],  # Keep last 2 error patterns
+            top_topics=top_topics
         )
     
     def get_dynamic_system_prompt(self, user_message: str, context: ConversationContext) -> str:
         """Generate dynamic system prompt based on context"""
-        base_prompt = """You are a helpful programming assistant focused on clear communication and practical solutions.
-
-QUESTION UNDERSTANDING:
-- Read the entire question carefully before responding
-- If a question is vague or ambiguous, ask for clarification
-- Identify the programming language, framework, or technology mentioned
-- Determine the user's skill level from context (beginner/intermediate/advanced)
-- Look for specific requirements, constraints, or desired outcomes
-- Pay attention to error messages, code snippets, or examples provided
-
-RESPONSE STRATEGY:
-- Start with a direct answer to the main question
-- If multiple interpretations exist, address the most likely one first
-- Break down complex problems into smaller, manageable parts
-- Explain the "why" behind solutions, not just the "how"
-- Anticipate follow-up questions and provide relevant context
-
-CODE FORMATTING RULES:
-- ALWAYS use proper line breaks and indentation
-- NEVER put multiple statements on one line  
-- Use markdown code blocks with language tags
-- Format with 4-space indentation for most languages
-- Each statement on its own line
-- Include helpful comments explaining key concepts
-
-MATH FORMATTING:
-- Wrap inline math in \\( ... \\)
-- Wrap block math in $$ ... $$
-- Use proper LaTeX syntax
-
-COMMUNICATION STYLE:
-- Be concise but thorough
-- Use simple language when possible
-- Provide examples that match the user's context
-- If you need more information, ask specific questions
-- Acknowledge when you're making assumptions
-
-Remember: Better to ask for clarification than to guess incorrectly."""
-
-        # Add context-specific guidance
-        dynamic_additions = []
-        
-        # Language-specific guidance
-        if context.languages_mentioned:
-            langs = ', '.join(context.languages_mentioned)
-            dynamic_additions.append(f"\nCONTEXT: User is working with {langs}. Focus on best practices for these languages.")
-        
-        # Skill level adjustments
-        if context.user_skill_level == 'beginner':
-            dynamic_additions.append("""
-BEGINNER MODE:
-- Provide extra explanations and context
-- Define technical terms when first used
-- Include step-by-step instructions
-- Suggest learning resources when appropriate
-- Be encouraging and patient""")
-        
-        elif context.user_skill_level == 'advanced':
-            dynamic_additions.append("""
-ADVANCED MODE:
-- Focus on efficiency and best practices
-- Discuss trade-offs and alternatives
-- Include performance considerations
-- Reference design patterns when relevant
-- Assume familiarity with basic concepts""")
-        
-        # Question type specific guidance
-        if 'debugging' in context.question_types:
-            dynamic_additions.append("""
-DEBUGGING FOCUS:
-- Ask for complete error messages and stack traces
-- Suggest systematic debugging approaches
-- Recommend debugging tools and techniques""")
-        
-        if 'tutorial' in context.question_types:
-            dynamic_additions.append("""
-TUTORIAL MODE:
-- Provide step-by-step instructions
-- Include multiple examples
-- Explain concepts progressively""")
-        
-        # Topic-specific guidance
-        if context.topics_discussed:
-            topics = ', '.join(list(context.topics_discussed)[:3])  # Limit to 3 topics
-            dynamic_additions.append(f"\nRELEVANT TOPICS: Consider {topics} in your responses.")
-        
-        return base_prompt + ''.join(dynamic_additions)
+        return render_system_prompt(*prompt_signature(context))
 
     def clean_response(self, response):
         """Minimal response cleaning - preserve formatting"""
@@ -266,24 +243,44 @@ TUTORIAL MODE:
         response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL | re.IGNORECASE)
         response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL | re.IGNORECASE)
         
-        # Clean up excessive newlines (max 2 consecutive)
-        response = re.sub(r'\n\s*\n\s*\n+', '\n\n', response)
-        
-        # Remove trailing spaces at end of lines
-        response = re.sub(r'[ \t]+\n', '\n', response)
-        
-        # Remove header markdown
-        response = re.sub(r'^#{1,3}\s*', '', response, flags=re.MULTILINE)
+        # Cap blank lines, drop trailing spaces and header markdown
+        response = tidy(response)
         
         return response.strip()
         
 
     def add_to_history(self, role, content):
         """Add message to conversation history"""
-        self.conversation_history.append({"role": role, "content": content})
-        # Keep only recent history
-        if len(self.conversation_history) > self.max_history:
-            self.conversation_history = self.conversation_history[-self.max_history:]
+        self.load_history()
+        msg = {"role": role, "content": content, "analysis": analyze_message(content)}
+        with self.history_lock:
+            self._history.append(msg)
+            self.track_message(msg)
+            # Keep only recent history
+            if len(self._history) > self.max_history:
+                self._history = self._history[-self.max_history:]
+        if self.persist:
+            self.persist(role, content)
+
+    def begin_summary(self):
+        """Claim the next summary update: the older messages to fold, or [] if
+        none are due or an update is already running"""
+        with self.history_lock:
+            if self.summarizing or len(self._history) <= SUMMARY_TRIGGER:
+                return []
+            self.summarizing = True
+            return self._history[:-SUMMARY_KEEP_RECENT]
+
+    def end_summary(self):
+        with self.history_lock:
+            self.summarizing = False
+
+    def apply_summary(self, summary, folded):
+        """Replace folded messages with the updated summary"""
+        folded_ids = {id(msg) for msg in folded}
+        with self.history_lock:
+            self._history = [msg for msg in self._history if id(msg) not in folded_ids]
+            self.summary = summary
 
 
     def get_response(self, user_message):
@@ -297,82 +294,254 @@ TUTORIAL MODE:
                 logger.info("Routing to regular LLM response")
                 return self.get_llm_response(user_message)
             
+        except SchedulerBusy:
+            raise
         except Exception as e:
             logger.error(f"Error: {str(e)}")
             return "An error occurred. Please try again."
             
             
 
-    def get_llm_response(self, user_message):
+    def build_chat_payload(self, user_message, stream=False):
+        """Add the user turn to history and build the Ollama chat payload"""
+        self.add_to_history("user", user_message)
+        
+        # Build conversation context
+        context = self.build_context_from_history()
+        
+        # With the prefix layout the system prompt never changes, so Ollama
+        # can reuse its cached prefill; the context hints ride along with
+        # the latest user turn instead.
+        if PROMPT_LAYOUT == 'prefix':
+            system_prompt = BASE_PROMPT
+            hints = render_context_hints(*prompt_signature(context))
+        else:
+            system_prompt = self.get_dynamic_system_prompt(user_message, context)
+            hints = ""
+        
+        # Log context for debugging
+        logger.info(f"Context - Languages: {context.languages_mentioned}, "
+                   f"Skill: {context.user_skill_level}, "
+                   f"Question type: {self.context_window[-1].question_type}")
+        
+        # The running summary of older turns follows the system prompt
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        
+        # Fill what is left of the budget with recent history
+        budget = budget_for(MODEL_NAME) - sum(estimate_tokens(msg["content"]) + MESSAGE_OVERHEAD for msg in messages)
+        budget -= estimate_tokens(hints)
+        history = fit_history(self.conversation_history, budget)
+        logger.info(f"Prompt history: {len(history)}/{len(self.conversation_history)} messages, "
+                   f"~{sum(message_tokens(msg) for msg in history)} tokens")
+        
+        messages.extend({"role": msg["role"], "content": msg["content"]} for msg in history)
+        if hints and messages[-1]["role"] == "user":
+            messages[-1]["content"] += "\n" + hints
+        
+        return {
+            "model": MODEL_NAME,
+            "messages": messages,
+            "stream": stream,
+            "options": {
+                "temperature": 0.1,  # Lower for more consistent formatting
+                "num_predict": MAX_TOKENS,
+                "top_p": 0.9,
+                "top_k": 40
+            }
+        }
+
+    def finish_response(self, ai_response):
+        """Clean the raw model output and record it in history"""
+        if not ai_response.strip():
+            ai_response = "I couldn't generate a response. Please try again."
+        
+        ai_response = self.clean_response(ai_response)
+        self.add_to_history("assistant", ai_response)
+        self.summarizer.maybe_schedule(self)
+        return ai_response
+
+    def lookup_cache(self, payload, use_cache):
+        """(request key, cached raw response or None) for a payload"""
+        key = cache_key(payload)
+        if not (use_cache and RESPONSE_CACHE_ENABLED):
+            return key, None
+        return key, response_cache.get(key)
+
+    def start_request(self, user_message, use_cache, stream=False):
+        """(payload, request key, finished reply if the response cache had one)"""
+        payload = self.build_chat_payload(user_message, stream)
+        key, cached = self.lookup_cache(payload, use_cache)
+        if cached is None:
+            return payload, key, None
+        logger.info("Response cache hit")
+        return payload, key, self.finish_response(cached)
+
+    def complete_response(self, key, raw_response):
+        """Cache the raw model output and record the cleaned reply"""
+        if RESPONSE_CACHE_ENABLED and raw_response.strip():
+            response_cache.put(key, raw_response)
+        return self.finish_response(raw_response)
+
+    def reply_from(self, key, response):
+        """Reply for a non-streaming /api/chat response from either client"""
+        if response.status_code != 200:
+            logger.error(f"Ollama error: {response.status_code}")
+            return MODEL_ERROR_REPLY
+        raw_response = response.json().get("message", {}).get("content", "")
+        ai_response = self.complete_response(key, raw_response)
+        logger.info(f"Response received: {ai_response[:50]}...")
+        return ai_response
+
+    def read_stream_line(self, line, raw_parts, cleaner):
+        """(cleaned text to emit, whether Ollama is done) for one NDJSON line"""
+        chunk = json.loads(line)
+        token = chunk.get("message", {}).get("content", "")
+        if not token:
+            return "", chunk.get("done")
+        raw_parts.append(token)
+        return cleaner.feed(token), chunk.get("done")
+
+    def error_reply(self, error):
+        """Reply for a model call that raised, from either client"""
+        if isinstance(error, TIMEOUT_ERRORS):
+            logger.error("Request timed out")
+            return "Request timed out. Please try again."
+        if isinstance(error, CONNECTION_ERRORS):
+            logger.error("Connection error")
+            return "Cannot connect to Ollama. Make sure it's running."
+        logger.error(f"Error: {str(error)}")
+        return "An error occurred. Please try again."
+
+    def stream_error_event(self, error):
+        if isinstance(error, SchedulerBusy):
+            logger.warning(f"Not scheduled: {str(error)}")
+            return {"done": True, "error": "Server busy, please try again", "retry_after": 1}
+        return {"done": True, "response": self.error_reply(error)}
+
+    def get_llm_response(self, user_message, use_cache=True):
         """Enhanced LLM response with dynamic prompting and context analysis"""
         try:
-            self.add_to_history("user", user_message)
+            payload, key, cached = self.start_request(user_message, use_cache)
+            if cached is not None:
+                return cached
             
-            # Build conversation context
-            context = self.build_context_from_history()
+            logger.info(f"Sending request: {user_message[:50]}...")
             
-            # Get dynamic system prompt
-            system_prompt = self.get_dynamic_system_prompt(user_message, context)
+            response = single_flight.chat(key, payload, user=self.user_key, queue_info=self.queue_info,
+                                         affinity=self.affinity_key)
+            return self.reply_from(key, response)
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            return self.error_reply(e)
+
+    def stream_llm_response(self, user_message, use_cache=True):
+        """Stream the LLM response as events.
+
+        Yields {"token": text} for each cleaned chunk as Ollama produces it and
+        finishes with {"done": True, "response": full_text}. The full text is
+        cleaned with clean_response and added to history like get_llm_response.
+        """
+        raw_parts = []
+        try:
+            payload, key, cached = self.start_request(user_message, use_cache, stream=True)
+            if cached is not None:
+                yield {"token": cached}
+                yield {"done": True, "response": cached}
+                return
+            cleaner = StreamCleaner()
             
-            # Log context for debugging
-            logger.info(f"Context - Languages: {context.languages_mentioned}, "
-                       f"Skill: {context.user_skill_level}, "
-                       f"Question type: {self.classify_question_type(user_message)}")
+            logger.info(f"Sending streaming request: {user_message[:50]}...")
             
-            messages = [{"role": "system", "content": system_prompt}]
-            messages.extend(self.conversation_history)
+            with single_flight.stream_chat(key, payload, user=self.user_key, affinity=self.affinity_key) as response:
+                self.queue_info.update(response.queue)
+                if response.status_code != 200:
+                    logger.error(f"Ollama error: {response.status_code}")
+                    yield {"done": True, "response": MODEL_ERROR_REPLY}
+                    return
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    text, done = self.read_stream_line(line, raw_parts, cleaner)
+                    if text:
+                        yield {"token": text}
+                    if done:
+                        break
             
-            payload = {
-                "model": MODEL_NAME,
-                "messages": messages,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,  # Lower for more consistent formatting
-                    "num_predict": MAX_TOKENS,
-                    "top_p": 0.9,
-                    "top_k": 40
-                }
-            }
+            text = cleaner.flush()
+            if text:
+                yield {"token": text}
+        except Exception as e:
+            yield self.stream_error_event(e)
+            return
+        
+        ai_response = self.complete_response(key, ''.join(raw_parts))
+        logger.info(f"Streamed response received: {ai_response[:50]}...")
+        yield {"done": True, "response": ai_response}
+        
+    async def aget_llm_response(self, user_message, use_cache=True):
+        """Async variant of get_llm_response for the ASGI app"""
+        try:
+            payload, key, cached = self.start_request(user_message, use_cache)
+            if cached is not None:
+                return cached
             
-            logger.info(f"Sending request: {user_message[:50]}...")
+            logger.info(f"Sending async request: {user_message[:50]}...")
             
-            response = requests.post(
-                f"{OLLAMA_BASE_URL}/api/chat",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=60
-            )
+            response = await async_single_flight.chat(key, payload, user=self.user_key, queue_info=self.queue_info,
+                                                     affinity=self.affinity_key)
+            return self.reply_from(key, response)
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            return self.error_reply(e)
+
+    async def astream_llm_response(self, user_message, use_cache=True):
+        """Async variant of stream_llm_response for the ASGI app"""
+        raw_parts = []
+        try:
+            payload, key, cached = self.start_request(user_message, use_cache, stream=True)
+            if cached is not None:
+                yield {"token": cached}
+                yield {"done": True, "response": cached}
+                return
+            cleaner = StreamCleaner()
             
-            if response.status_code == 200:
-                result = response.json()
-                ai_response = result.get("message", {}).get("content", "")
-                
-                if not ai_response.strip():
-                    ai_response = "I couldn't generate a response. Please try again."
-                
-                ai_response = self.clean_response(ai_response)
-                self.add_to_history("assistant", ai_response)
-                logger.info(f"Response received: {ai_response[:50]}...")
-                
-                return ai_response
-            else:
-                logger.error(f"Ollama error: {response.status_code}")
-                return "I'm having trouble connecting to the AI model. Please try again."
+            logger.info(f"Sending async streaming request: {user_message[:50]}...")
+            
+            async with async_single_flight.stream_chat(key, payload, user=self.user_key, affinity=self.affinity_key) as response:
+                self.queue_info.update(response.queue)
+                if response.status_code != 200:
+                    logger.error(f"Ollama error: {response.status_code}")
+                    yield {"done": True, "response": MODEL_ERROR_REPLY}
+                    return
                 
-        except requests.exceptions.Timeout:
-            logger.error("Request timed out")
-            return "Request timed out. Please try again."
-        except requests.exceptions.ConnectionError:
-            logger.error("Connection error")
-            return "Cannot connect to Ollama. Make sure it's running."
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    text, done = self.read_stream_line(line, raw_parts, cleaner)
+                    if text:
+                        yield {"token": text}
+                    if done:
+                        break
+            
+            text = cleaner.flush()
+            if text:
+                yield {"token": text}
         except Exception as e:
-            logger.error(f"Error: {str(e)}")
-            return "An error occurred. Please try again."
+            yield self.stream_error_event(e)
+            return
+        
+        ai_response = self.complete_response(key, ''.join(raw_parts))
+        logger.info(f"Streamed response received: {ai_response[:50]}...")
+        yield {"done": True, "response": ai_response}
         
     def is_agentic_request(self, message):
         """Check if request needs agentic behavior"""
-        agentic_keywords = ['search for', 'find files', 'read file', 'calculate', 'help me with', 'can you', 'what can you do', 'system info', 'capabilities', 'execute', 'run this']
-        is_agentic = any(keyword in message.lower() for keyword in agentic_keywords)
+        is_agentic = 'agentic' in keyword_matcher.find(message)
         print(f"DEBUG: Message='{message[:50]}...' | Is_Agentic={is_agentic}")
         logger.info(f"Checking if agentic: '{message}' -> {is_agentic}")
         return is_agentic
@@ -473,26 +642,86 @@ TUTORIAL MODE:
         task.status = "completed"
         return task
     
-    def get_agentic_response(self, user_message):
+    def run_tasks(self, user_message):
+        """Plan and execute the tasks for a request, returning their results"""
+        tasks = self.plan_tasks(user_message)
+        results = []
+        for task in tasks:
+            executed_task = self.execute_task(task)
+            results.append(executed_task.result)
+        return results
+
+    def agentic_followup(self, user_message, results):
+        """(direct answer, None) for an 'execute' request, else (None, prompt asking the model about the results)"""
+        if 'execute' in user_message.lower():
+            return results[0], None
+        context = "\n".join(results)
+        return None, f"The user asked: {user_message}\n\nResults: {context}\n\nProvide a helpful response."
+
+    def get_agentic_response(self, user_message, use_cache=True):
         """Handle agentic requests"""
+        self.queue_info = {}
         try:
-            tasks = self.plan_tasks(user_message)
-            results = []
-            for task in tasks:
-                executed_task = self.execute_task(task)
-                results.append(executed_task.result)
-
-            if 'execute' in user_message.lower():
-                return results[0]
-            
-            context = "\n".join(results)
-            enhanced_prompt = f"The user asked: {user_message}\n\nResults: {context}\n\nProvide a helpful response."
-            return self.get_llm_response(enhanced_prompt)
-          
+            answer, prompt = self.agentic_followup(user_message, self.run_tasks(user_message))
+            return answer if prompt is None else self.get_llm_response(prompt, use_cache)
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            logger.error(f"Agentic error: {str(e)}")
+            return AGENTIC_ERROR_REPLY
+
+    def stream_agentic_response(self, user_message, use_cache=True):
+        """Handle agentic requests, streaming the LLM part of the answer"""
+        self.queue_info = {}
+        try:
+            answer, prompt = self.agentic_followup(user_message, self.run_tasks(user_message))
         except Exception as e:
             logger.error(f"Agentic error: {str(e)}")
-            return "I encountered an error processing your request."
+            yield {"done": True, "response": AGENTIC_ERROR_REPLY}
+            return
+
+        if prompt is None:
+            yield {"done": True, "response": answer}
+            return
+        yield from self.stream_llm_response(prompt, use_cache)
     
+    async def aget_agentic_response(self, user_message, use_cache=True):
+        """Async variant of get_agentic_response; tools run in a worker thread"""
+        self.queue_info = {}
+        try:
+            results = await asyncio.to_thread(self.run_tasks, user_message)
+            answer, prompt = self.agentic_followup(user_message, results)
+            return answer if prompt is None else await self.aget_llm_response(prompt, use_cache)
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            logger.error(f"Agentic error: {str(e)}")
+            return AGENTIC_ERROR_REPLY
+
+    async def astream_agentic_response(self, user_message, use_cache=True):
+        """Async variant of stream_agentic_response"""
+        self.queue_info = {}
+        try:
+            results = await asyncio.to_thread(self.run_tasks, user_message)
+            answer, prompt = self.agentic_followup(user_message, results)
+        except Exception as e:
+            logger.error(f"Agentic error: {str(e)}")
+            yield {"done": True, "response": AGENTIC_ERROR_REPLY}
+            return
+
+        if prompt is None:
+            yield {"done": True, "response": answer}
+            return
+        async for event in self.astream_llm_response(prompt, use_cache):
+            yield event
+
+    def history_size(self):
+        """Approximate memory held by this session's history, in bytes"""
+        return sum(len(msg.get('content', '')) for msg in self._history)
+
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
\ No newline at end of file
+        with self.history_lock:
+            self._history = []
+            self.summary = ""
+            self.rebuild_context()
\ No newline at end of file
@@ -0,0 +1,117 @@
+from functools import lru_cache
+from config import PROMPT_CACHE_SIZE
+
+BASE_PROMPT = """You are a helpful programming assistant focused on clear communication and practical solutions.
+
+QUESTION UNDERSTANDING:
+- Read the entire question carefully before responding
+- If a question is vague or ambiguous, ask for clarification
+- Identify the programming language, framework, or technology mentioned
+- Determine the user's skill level from context (beginner/intermediate/advanced)
+- Look for specific requirements, constraints, or desired outcomes
+- Pay attention to error messages, code snippets, or examples provided
+
+RESPONSE STRATEGY:
+- Start with a direct answer to the main question
+- If multiple interpretations exist, address the most likely one first
+- Break down complex problems into smaller, manageable parts
+- Explain the "why" behind solutions, not just the "how"
+- Anticipate follow-up questions and provide relevant context
+
+CODE FORMATTING RULES:
+- ALWAYS use proper line breaks and indentation
+- NEVER put multiple statements on one line  
+- Use markdown code blocks with language tags
+- Format with 4-space indentation for most languages
+- Each statement on its own line
+- Include helpful comments explaining key concepts
+
+MATH FORMATTING:
+- Wrap inline math in \\( ... \\)
+- Wrap block math in $$ ... $$
+- Use proper LaTeX syntax
+
+COMMUNICATION STYLE:
+- Be concise but thorough
+- Use simple language when possible
+- Provide examples that match the user's context
+- If you need more information, ask specific questions
+- Acknowledge when you're making assumptions
+
+Remember: Better to ask for clarification than to guess incorrectly."""
+
+LANGUAGES_HINT = "\nCONTEXT: User is working with {languages}. Focus on best practices for these languages."
+
+SKILL_HINTS = {
+    'beginner': """
+BEGINNER MODE:
+- Provide extra explanations and context
+- Define technical terms when first used
+- Include step-by-step instructions
+- Suggest learning resources when appropriate
+- Be encouraging and patient""",
+    'advanced': """
+ADVANCED MODE:
+- Focus on efficiency and best practices
+- Discuss trade-offs and alternatives
+- Include performance considerations
+- Reference design patterns when relevant
+- Assume familiarity with basic concepts"""
+}
+
+DEBUGGING_HINT = """
+DEBUGGING FOCUS:
+- Ask for complete error messages and stack traces
+- Suggest systematic debugging approaches
+- Recommend debugging tools and techniques"""
+
+TUTORIAL_HINT = """
+TUTORIAL MODE:
+- Provide step-by-step instructions
+- Include multiple examples
+- Explain concepts progressively"""
+
+TOPICS_HINT = "\nRELEVANT TOPICS: Consider {topics} in your responses."
+
+
+def prompt_signature(context):
+    """Normalized tuple of everything the system prompt depends on.
+
+    Languages and topics are sorted so the same context always renders the
+    same bytes, which lets Ollama reuse its cached prompt prefix.
+    """
+    return (
+        tuple(sorted(context.languages_mentioned)),
+        context.user_skill_level,
+        'debugging' in context.question_types,
+        'tutorial' in context.question_types,
+        tuple(sorted(context.top_topics or sorted(context.topics_discussed)[:3]))
+    )
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def render_context_hints(languages, skill_level, debugging, tutorial, topics):
+    """Context-specific guidance for a prompt signature"""
+    hints = []
+    if languages:
+        hints.append(LANGUAGES_HINT.format(languages=', '.join(languages)))
+    if skill_level in SKILL_HINTS:
+        hints.append(SKILL_HINTS[skill_level])
+    if debugging:
+        hints.append(DEBUGGING_HINT)
+    if tutorial:
+        hints.append(TUTORIAL_HINT)
+    if topics:
+        hints.append(TOPICS_HINT.format(topics=', '.join(topics)))
+    return ''.join(hints)
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def render_system_prompt(*signature):
+    """Full system prompt for a prompt signature"""
+    return BASE_PROMPT + render_context_hints(*signature)
+
+def prompt_cache_stats():
+    """Hit/miss counters of the prompt caches"""
+    return {
+        "system_prompt": render_system_prompt.cache_info()._asdict(),
+        "context_hints": render_context_hints.cache_info()._asdict()
+    }
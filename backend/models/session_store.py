@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from functools import partial
+import threading
+import time
+import logging
+from config import SESSION_MAX_SESSIONS, SESSION_TTL_SECONDS, SESSION_MAX_BYTES, HISTORY_PERSISTENCE
+from models.conversation import SimpleChatBot
+from models.summarizer import summarizer
+from utils.history_writer import history_writer
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """Per-user conversation sessions with LRU/TTL eviction and a memory cap.
+
+    Sessions are keyed by (user key, conversation id) and each holds its own
+    SimpleChatBot, so history is never shared between users or chats. With a
+    writer, messages are persisted and an evicted session reloads its history
+    the first time it is used again.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, ttl=SESSION_TTL_SECONDS,
+                 max_bytes=SESSION_MAX_BYTES, factory=SimpleChatBot,
+                 writer=history_writer if HISTORY_PERSISTENCE else None, summarizer=summarizer):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.factory = factory
+        self.writer = writer
+        self.summarizer = summarizer
+        self.sessions = OrderedDict()  # key -> (chatbot, last_access), oldest first
+        self.lock = threading.Lock()
+
+    def get(self, user_key, conversation_id):
+        """Return the chatbot for a session, creating it if needed"""
+        key = (str(user_key), str(conversation_id))
+        now = time.monotonic()
+        with self.lock:
+            self._evict_expired(now)
+            entry = self.sessions.pop(key, None)
+            chatbot = entry[0] if entry else self.create(key)
+            self.sessions[key] = (chatbot, now)
+            self._enforce_limits(key)
+            return chatbot
+
+    def create(self, key):
+        if self.writer is None:
+            return self.factory(user_key=key[0], conversation_id=key[1], summarizer=self.summarizer)
+        return self.factory(
+            persist=partial(self.writer.enqueue_message, *key),
+            history_loader=partial(self.writer.load_history, *key),
+            user_key=key[0],
+            conversation_id=key[1],
+            summarizer=self.summarizer
+        )
+
+    def clear(self, user_key, conversation_id):
+        """Drop a session and its history"""
+        with self.lock:
+            self.sessions.pop((str(user_key), str(conversation_id)), None)
+        if self.writer is not None:
+            self.writer.enqueue_clear(str(user_key), str(conversation_id))
+
+    def stats(self):
+        """Current session count and memory use"""
+        with self.lock:
+            return {
+                "sessions": len(self.sessions),
+                "history_bytes": sum(chatbot.history_size() for chatbot, _ in self.sessions.values())
+            }
+
+    def _evict_expired(self, now):
+        while self.sessions:
+            key, (_, last_access) = next(iter(self.sessions.items()))
+            if now - last_access < self.ttl:
+                break
+            del self.sessions[key]
+            logger.info(f"Session expired: {key}")
+
+    def _enforce_limits(self, keep_key):
+        """Evict least recently used sessions until under both caps"""
+        while len(self.sessions) > self.max_sessions:
+            self._evict_oldest(keep_key)
+
+        total = sum(chatbot.history_size() for chatbot, _ in self.sessions.values())
+        while total > self.max_bytes and len(self.sessions) > 1:
+            chatbot = self._evict_oldest(keep_key)
+            total -= chatbot.history_size()
+
+    def _evict_oldest(self, keep_key):
+        key = next(k for k in self.sessions if k != keep_key)
+        chatbot, _ = self.sessions.pop(key)
+        logger.info(f"Session evicted: {key}")
+        return chatbot
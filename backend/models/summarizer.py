@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from config import MODEL_NAME, SUMMARY_ENABLED, SUMMARY_MAX_TOKENS, SUMMARY_WORKERS
+from utils.ollama_client import ollama_client
+from utils.scheduler import ollama_scheduler, request_cost
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a programming assistant.
+Keep facts, names, code details and decisions that later answers may rely on. Reply with the summary only, in at most a few short paragraphs.
+
+Current summary:
+{summary}
+
+New messages to fold in:
+{transcript}"""
+
+
+class ConversationSummarizer:
+    """Folds older turns of a session into a running summary in the background.
+
+    Runs after a response has been produced, so the user never waits for it,
+    and keeps prompt size roughly constant as conversations grow.
+    """
+
+    def __init__(self, workers=SUMMARY_WORKERS, scheduler=ollama_scheduler, client=ollama_client):
+        self.scheduler = scheduler
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='summarizer')
+
+    def maybe_schedule(self, chatbot):
+        """Queue a summary update if the session has turns to fold"""
+        if not SUMMARY_ENABLED:
+            return
+        messages = chatbot.begin_summary()
+        if not messages:
+            return
+        self.submit(chatbot, messages)
+
+    def submit(self, chatbot, messages):
+        self.executor.submit(self.run, chatbot, messages)
+
+    def run(self, chatbot, messages):
+        try:
+            summary = self.summarize(chatbot, messages)
+            if summary:
+                chatbot.apply_summary(summary, messages)
+                logger.info(f"Folded {len(messages)} messages into summary")
+        except Exception as e:
+            logger.error(f"Summary error: {str(e)}")
+        finally:
+            chatbot.end_summary()
+
+    def summarize(self, chatbot, messages):
+        """Ask the model for an updated summary, or None on failure"""
+        payload = self.build_payload(chatbot, messages)
+        # Background work queues like everyone else, under its own user key
+        with self.scheduler.slot(MODEL_NAME, 'system:summary', request_cost(payload)):
+            response = self.client.chat(payload, route='summary')
+        return self.parse_response(chatbot, response)
+
+    def build_payload(self, chatbot, messages):
+        transcript = "\n\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = SUMMARY_PROMPT.format(summary=chatbot.summary or "(none yet)", transcript=transcript)
+        return {
+            "model": MODEL_NAME,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": False,
+            "options": {
+                "temperature": 0.1,
+                "num_predict": SUMMARY_MAX_TOKENS
+            }
+        }
+
+    def parse_response(self, chatbot, response):
+        if response.status_code != 200:
+            logger.error(f"Ollama summary error: {response.status_code}")
+            return None
+        content = response.json().get("message", {}).get("content", "")
+        if not content.strip():
+            return None
+        return chatbot.clean_response(content)
+
+
+summarizer = ConversationSummarizer()
@@ -1,24 +1,36 @@
 from flask import Blueprint, jsonify, current_app
-import requests
 import logging
-from config import OLLAMA_BASE_URL, MODEL_NAME
+from config import MODEL_NAME
+from utils.ollama_client import ollama_client
+from utils.auth_utils import token_optional, get_session_key, token_cache
+from utils.database import db_pool
+from utils.password_hasher import password_hasher
+from utils.history_writer import history_writer
+from models.prompts import prompt_cache_stats
+from utils.response_cache import response_cache
+from utils.image_cache import image_cache
+from utils.python_sandbox import python_sandbox
+from utils.csharp_runner import csharp_runner
+from utils.calculator import calculator_cache_stats
+from utils.health_monitor import health_monitor
+from utils.image_preprocessor import image_preprocessor
+from utils.ollama_endpoints import endpoint_pool
+from utils.single_flight import single_flight
+from utils.scheduler import ollama_scheduler
 
 agent_bp = Blueprint('agent', __name__)
 logger = logging.getLogger(__name__)
 
 @agent_bp.route('/health', methods=['GET'])
 def health_check():
-    """Health check"""
-    try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/version", timeout=5)
-        ollama_status = "connected" if response.status_code == 200 else "disconnected"
-    except:
-        ollama_status = "disconnected"
-    
+    """Health check, answered from the background monitor's last result"""
+    status = health_monitor.snapshot()
     return jsonify({
         "status": "healthy",
-        "ollama": ollama_status,
-        "model": MODEL_NAME
+        "ollama": status["ollama"],
+        "model": MODEL_NAME,
+        "checked_at": status["checked_at"],
+        "endpoints": status["endpoints"]
     })
 
 @agent_bp.route('/agent/status', methods=['GET'])
@@ -30,17 +42,41 @@ def agent_status():
         "available_actions": ["file_operations", "calculations", "searches"]
     })
 
+@agent_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Runtime metrics for the process"""
+    return jsonify({
+        "db_pool": db_pool.metrics(),
+        "password_hasher": password_hasher.metrics(),
+        "token_cache": token_cache.metrics(),
+        "history_writer": history_writer.metrics(),
+        "prompt_cache": prompt_cache_stats(),
+        "response_cache": response_cache.metrics(),
+        "image_cache": image_cache.metrics(),
+        "python_sandbox": python_sandbox.metrics(),
+        "csharp_runner": csharp_runner.metrics(),
+        "calculator_cache": calculator_cache_stats(),
+        "single_flight": single_flight.metrics(),
+        "scheduler": ollama_scheduler.metrics(),
+        "image_preprocessor": image_preprocessor.metrics(),
+        "ollama_endpoints": endpoint_pool.metrics(),
+        "ollama_client": ollama_client.get_stats(),
+        "sessions": current_app.sessions.stats()
+    })
+
 @agent_bp.route('/context', methods=['GET'])
-def get_conversation_context():
+@token_optional
+def get_conversation_context(current_user_id):
     """Get current conversation context for debugging"""
     try:
-        context = current_app.chatbot.build_context_from_history()
+        chatbot = current_app.sessions.get(*get_session_key(current_user_id))
+        context = chatbot.build_context_from_history()
         return jsonify({
             "languages_mentioned": list(context.languages_mentioned),
             "topics_discussed": list(context.topics_discussed),
             "user_skill_level": context.user_skill_level,
             "recent_question_types": context.question_types,
-            "conversation_length": len(current_app.chatbot.conversation_history)
+            "conversation_length": len(chatbot.conversation_history)
         })
     except Exception as e:
         logger.error(f"Context error: {str(e)}")
@@ -0,0 +1,92 @@
+from quart import Blueprint, jsonify, current_app
+import asyncio
+import logging
+from config import MODEL_NAME
+from utils.async_ollama_client import async_ollama_client
+from utils.async_auth_utils import token_optional, get_session_key
+from utils.async_database import get_db_pool
+from utils.password_hasher import password_hasher
+from utils.auth_utils import token_cache
+from utils.history_writer import history_writer
+from models.prompts import prompt_cache_stats
+from utils.response_cache import response_cache
+from utils.image_cache import image_cache
+from utils.python_sandbox import python_sandbox
+from utils.csharp_runner import csharp_runner
+from utils.calculator import calculator_cache_stats
+from utils.health_monitor import health_monitor
+from utils.image_preprocessor import image_preprocessor
+from utils.ollama_endpoints import endpoint_pool
+from utils.async_single_flight import async_single_flight
+from utils.async_scheduler import async_ollama_scheduler
+
+agent_bp = Blueprint('agent', __name__)
+logger = logging.getLogger(__name__)
+
+@agent_bp.route('/health', methods=['GET'])
+async def health_check():
+    """Health check, answered from the background monitor's last result"""
+    status = health_monitor.snapshot()
+    return jsonify({
+        "status": "healthy",
+        "ollama": status["ollama"],
+        "model": MODEL_NAME,
+        "checked_at": status["checked_at"],
+        "endpoints": status["endpoints"]
+    })
+
+@agent_bp.route('/agent/status', methods=['GET'])
+async def agent_status():
+    """Get agent capabilities"""
+    return jsonify({
+        "tools": ["search_files", "read_file", "calculate"],
+        "agentic_mode": True,
+        "available_actions": ["file_operations", "calculations", "searches"]
+    })
+
+@agent_bp.route('/metrics', methods=['GET'])
+async def metrics():
+    """Runtime metrics for the process"""
+    pool = get_db_pool()
+    return jsonify({
+        "db_pool": {
+            "size": pool.size,
+            "max_size": pool.maxsize,
+            "in_use": pool.size - pool.freesize,
+            "idle": pool.freesize
+        } if pool else None,
+        "ollama_client": async_ollama_client.get_stats(),
+        "password_hasher": password_hasher.metrics(),
+        "token_cache": token_cache.metrics(),
+        "history_writer": history_writer.metrics(),
+        "prompt_cache": prompt_cache_stats(),
+        "response_cache": response_cache.metrics(),
+        "image_cache": image_cache.metrics(),
+        "python_sandbox": python_sandbox.metrics(),
+        "csharp_runner": csharp_runner.metrics(),
+        "calculator_cache": calculator_cache_stats(),
+        "single_flight": async_single_flight.metrics(),
+        "scheduler": async_ollama_scheduler.metrics(),
+        "image_preprocessor": image_preprocessor.metrics(),
+        "ollama_endpoints": endpoint_pool.metrics(),
+        "sessions": current_app.sessions.stats()
+    })
+
+@agent_bp.route('/context', methods=['GET'])
+@token_optional
+async def get_conversation_context(current_user_id):
+    """Get current conversation context for debugging"""
+    try:
+        chatbot = current_app.sessions.get(*await get_session_key(current_user_id))
+        await asyncio.to_thread(chatbot.load_history)
+        context = chatbot.build_context_from_history()
+        return jsonify({
+            "languages_mentioned": list(context.languages_mentioned),
+            "topics_discussed": list(context.topics_discussed),
+            "user_skill_level": context.user_skill_level,
+            "recent_question_types": context.question_types,
+            "conversation_length": len(chatbot.conversation_history)
+        })
+    except Exception as e:
+        logger.error(f"Context error: {str(e)}")
+        return jsonify({"error": "Error getting context"}), 500
@@ -0,0 +1,161 @@
+from quart import Blueprint, request, jsonify
+import asyncio
+import jwt
+from datetime import datetime, timedelta
+import logging
+from utils.async_database import get_db_pool
+from utils.password_hasher import password_hasher, HasherBusy
+from utils.auth_utils import decode_token, revoke_token
+from config import JWT_SECRET
+
+auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
+logger = logging.getLogger(__name__)
+
+@auth_bp.route('/signup', methods=['POST'])
+async def signup():
+    """User registration"""
+    try:
+        data = await request.get_json()
+        username = data.get('username', '').strip()
+        email = data.get('email', '').strip()
+        password = data.get('password', '')
+        
+        if not username or not email or not password:
+            return jsonify({'error': 'All fields are required'}), 400
+        
+        if len(password) < 8:
+            return jsonify({'error': 'Password must be at least 8 characters'}), 400
+        
+        pool = get_db_pool()
+        if not pool:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        # Hashing runs on the dedicated bcrypt pool, off the event loop
+        password_hash = await asyncio.wrap_future(password_hasher.hash_future(password))
+        
+        async with pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                # Check if user exists
+                await cursor.execute("SELECT id FROM Users WHERE username = %s OR email = %s", (username, email))
+                if await cursor.fetchone():
+                    return jsonify({'error': 'Username or email already exists'}), 400
+                
+                # Insert user
+                await cursor.execute(
+                    "INSERT INTO Users (username, email, password_hash) VALUES (%s, %s, %s)",
+                    (username, email, password_hash)
+                )
+                await connection.commit()
+                
+                user_id = cursor.lastrowid
+        
+        # Generate JWT token
+        token = jwt.encode({
+            'user_id': user_id,
+            'exp': datetime.utcnow() + timedelta(days=30)
+        }, JWT_SECRET, algorithm='HS256')
+        
+        return jsonify({
+            'message': 'User created successfully',
+            'token': token,
+            'user': {
+                'id': user_id,
+                'username': username,
+                'email': email
+            }
+        }), 201
+        
+    except HasherBusy:
+        logger.warning("Password hashing saturated")
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        logger.error(f"Signup error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@auth_bp.route('/login', methods=['POST'])
+async def login():
+    """User login"""
+    try:
+        data = await request.get_json()
+        username = data.get('username', '').strip()
+        password = data.get('password', '')
+        
+        if not username or not password:
+            return jsonify({'error': 'Username and password are required'}), 400
+        
+        pool = get_db_pool()
+        if not pool:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        async with pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                # Get user
+                await cursor.execute(
+                    "SELECT id, username, email, password_hash FROM Users WHERE username = %s",
+                    (username,)
+                )
+                user = await cursor.fetchone()
+        
+        if not user or not await asyncio.wrap_future(password_hasher.verify_future(password, user[3])):
+            return jsonify({'error': 'Invalid username or password'}), 401
+        
+        # Upgrade hashes made with old parameters while we know the password
+        new_hash = None
+        if password_hasher.needs_rehash(user[3]):
+            try:
+                new_hash = await asyncio.wrap_future(password_hasher.hash_future(password))
+            except HasherBusy:
+                logger.info(f"Skipping password rehash for user {user[0]}, hasher busy")
+        
+        async with pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                # Update last login
+                await cursor.execute(
+                    "UPDATE Users SET last_login = CURRENT_TIMESTAMP WHERE id = %s",
+                    (user[0],)
+                )
+                if new_hash:
+                    await cursor.execute(
+                        "UPDATE Users SET password_hash = %s WHERE id = %s",
+                        (new_hash, user[0])
+                    )
+                    password_hasher.record_rehash()
+                await connection.commit()
+        
+        # Generate JWT token
+        token = jwt.encode({
+            'user_id': user[0],
+            'exp': datetime.utcnow() + timedelta(days=30)
+        }, JWT_SECRET, algorithm='HS256')
+        
+        return jsonify({
+            'message': 'Login successful',
+            'token': token,
+            'user': {
+                'id': user[0],
+                'username': user[1],
+                'email': user[2]
+            }
+        }), 200
+        
+    except HasherBusy:
+        logger.warning("Password hashing saturated")
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        logger.error(f"Login error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+async def logout():
+    """Revoke the caller's token so it stops working before it expires"""
+    token = request.headers.get('Authorization')
+    if not token:
+        return jsonify({'error': 'Token is missing'}), 401
+    try:
+        decode_token(token)
+    except jwt.ExpiredSignatureError:
+        return jsonify({'error': 'Token has expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'error': 'Token is invalid'}), 401
+    revoke_token(token)
+    return jsonify({'message': 'Logged out'}), 200
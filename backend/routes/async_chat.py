@@ -0,0 +1,178 @@
+from quart import Blueprint, request, jsonify, current_app, Response
+import asyncio
+import json
+from time import perf_counter
+import logging
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import MAX_TOKENS, IMAGE_MAX_BYTES, IMAGE_TIMEOUT
+from utils.image_preprocessor import image_preprocessor, ImageRejected, ImageBusy
+from utils.image_cache import image_cache, image_key
+from utils.async_ollama_client import async_ollama_client
+from utils.async_auth_utils import token_optional, get_session_key
+from utils.async_scheduler import async_ollama_scheduler
+from utils.circuit_breaker import CircuitOpen
+from utils.scheduler import request_cost, SchedulerBusy
+
+chat_bp = Blueprint('chat', __name__)
+logger = logging.getLogger(__name__)
+
+@chat_bp.route('/chat', methods=['POST'])
+@token_optional
+async def chat(current_user_id):
+    """Handle chat messages"""
+    try:
+        data = await request.get_json()
+        user_message = data.get('message', '').strip()
+        if not user_message:
+            return jsonify({"error": "No message provided"}), 400
+
+        chatbot = current_app.sessions.get(*await get_session_key(current_user_id))
+        # Resumed sessions read their saved history from MySQL, off the loop
+        await asyncio.to_thread(chatbot.load_history)
+
+        # "no_cache": true always asks the model instead of the response cache
+        use_cache = not data.get('no_cache')
+
+        if data.get('stream'):
+            return stream_chat(chatbot, user_message, use_cache)
+
+        start = perf_counter()
+        async with chatbot.async_lock:
+            ai_response = await chatbot.aget_agentic_response(user_message, use_cache)
+        end = perf_counter()
+        response_time = round(end - start, 2)
+
+        return jsonify({
+            "response": ai_response,
+            "response_time": response_time,
+            **chatbot.queue_info
+        })
+    except SchedulerBusy as e:
+        logger.warning(f"Chat not scheduled: {str(e)}")
+        return jsonify({"error": "Server busy, please try again"}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def stream_chat(chatbot, user_message, use_cache=True):
+    """Relay the chat response as newline-delimited JSON while it is generated"""
+    async def generate():
+        start = perf_counter()
+        try:
+            async with chatbot.async_lock:
+                async for event in chatbot.astream_agentic_response(user_message, use_cache):
+                    if event.get("done"):
+                        event["response_time"] = round(perf_counter() - start, 2)
+                        event.update(chatbot.queue_info)
+                    yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}")
+            yield json.dumps({"done": True, "error": "Internal server error"}) + "\n"
+
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@chat_bp.route('/clear', methods=['POST'])
+@token_optional
+async def clear_chat(current_user_id):
+    """Clear conversation history"""
+    try:
+        current_app.sessions.clear(*await get_session_key(current_user_id))
+        return jsonify({"message": "Chat cleared"})
+    except Exception as e:
+        logger.error(f"Clear error: {str(e)}")
+        return jsonify({"error": "Error clearing chat"}), 500
+
+@chat_bp.route('/chat-image', methods=['POST'])
+@token_optional
+async def chat_image(current_user_id):
+    """Handle chat with image"""
+    try:
+        files = await request.files
+        form = await request.form
+        if 'image' not in files:
+            return jsonify({"error": "No image provided"}), 400
+            
+        image_file = files['image']
+        message = form.get('message', 'Analyze this image')
+        # "no_cache": true always runs the vision model
+        use_cache = not form.get('no_cache')
+        
+        if image_file.filename == '':
+            return jsonify({"error": "No image selected"}), 400
+        
+        # Decode, orient, downscale and re-encode on the image pool, off the
+        # event loop, reading straight from the spooled upload
+        try:
+            image = await asyncio.wait_for(
+                asyncio.wrap_future(image_preprocessor.prepare_future(image_file.stream)),
+                IMAGE_TIMEOUT
+            )
+        except ImageRejected as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # The same picture with the same question gets the stored answer
+        key = image_key("llava:7b", image, message)
+        cached = await asyncio.to_thread(image_cache.get, key) if use_cache else None
+        if cached is not None:
+            chatbot = current_app.sessions.get(*await get_session_key(current_user_id))
+            logger.info("Image analysis served from cache")
+            return jsonify({"response": chatbot.clean_response(cached)})
+
+        # Use vision model
+        payload = {
+            "model": "llava:7b",
+            "messages": [
+                {
+                    "role": "user", 
+                    "content": message,
+                    "images": [image]  # Raw JPEG, base64 encoded as the request is sent
+                }
+            ],
+            "stream": False,
+            "options": {
+                "temperature": 0.1,
+                "num_predict": MAX_TOKENS
+            }
+        }
+        
+        logger.info(f"Sending image analysis request...")
+        
+        user_key, _ = await get_session_key(current_user_id)
+        async with async_ollama_scheduler.slot(payload["model"], user_key, request_cost(payload)) as ticket:
+            response = await async_ollama_client.chat(payload, route='vision')
+        
+        if response.status_code == 200:
+            result = response.json()
+            ai_response = result.get("message", {}).get("content", "")
+            
+            if not ai_response.strip():
+                ai_response = "I couldn't analyze the image. Please try again."
+            else:
+                await asyncio.to_thread(image_cache.put, key, ai_response)
+            
+            chatbot = current_app.sessions.get(*await get_session_key(current_user_id))
+            ai_response = chatbot.clean_response(ai_response)
+            logger.info(f"Image analysis completed")
+            
+            return jsonify({"response": ai_response, **ticket.info()})
+        else:
+            logger.error(f"Ollama error: {response.status_code}")
+            return jsonify({"error": "Error processing image"}), 500
+            
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Image is larger than {IMAGE_MAX_BYTES // (1024 * 1024)} MB"}), 413
+    except (ImageBusy, asyncio.TimeoutError):
+        logger.warning("Image preprocessing saturated")
+        return jsonify({"error": "Server busy, please try again"}), 503, {'Retry-After': '1'}
+    except SchedulerBusy as e:
+        logger.warning(f"Image chat not scheduled: {str(e)}")
+        return jsonify({"error": "Server busy, please try again"}), 503, {'Retry-After': '1'}
+    except CircuitOpen:
+        return jsonify({"error": "The AI model is unavailable, please try again later"}), 503, {'Retry-After': '5'}
+    except Exception as e:
+        logger.error(f"Image chat error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
-import bcrypt
 import jwt
 from datetime import datetime, timedelta
 import logging
+from concurrent.futures import TimeoutError as HashTimeout
 from utils.database import get_db_connection
+from utils.password_hasher import password_hasher, HasherBusy
+from utils.auth_utils import decode_token, revoke_token
 from config import JWT_SECRET
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -24,28 +26,29 @@ def signup():
         if len(password) < 8:
             return jsonify({'error': 'Password must be at least 8 characters'}), 400
         
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'error': 'Database connection failed'}), 500
-        
-        cursor = connection.cursor()
-        
-        # Check if user exists
-        cursor.execute("SELECT id FROM Users WHERE username = %s OR email = %s", (username, email))
-        if cursor.fetchone():
-            return jsonify({'error': 'Username or email already exists'}), 400
-        
-        # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        
-        # Insert user
-        cursor.execute(
-            "INSERT INTO Users (username, email, password_hash) VALUES (%s, %s, %s)",
-            (username, email, password_hash)
-        )
-        connection.commit()
-        
-        user_id = cursor.lastrowid
+        # Hash before checking out a connection so none is held during bcrypt
+        password_hash = password_hasher.hash(password)
+        
+        with get_db_connection() as connection:
+            if not connection:
+                return jsonify({'error': 'Database connection failed'}), 500
+            
+            cursor = connection.cursor(buffered=True)
+            
+            # Check if user exists
+            cursor.execute("SELECT id FROM Users WHERE username = %s OR email = %s", (username, email))
+            if cursor.fetchone():
+                return jsonify({'error': 'Username or email already exists'}), 400
+            
+            # Insert user
+            cursor.execute(
+                "INSERT INTO Users (username, email, password_hash) VALUES (%s, %s, %s)",
+                (username, email, password_hash)
+            )
+            connection.commit()
+            
+            user_id = cursor.lastrowid
+            cursor.close()
         
         # Generate JWT token
         token = jwt.encode({
@@ -53,9 +56,6 @@ def signup():
             'exp': datetime.utcnow() + timedelta(days=30)
         }, JWT_SECRET, algorithm='HS256')
         
-        cursor.close()
-        connection.close()
-        
         return jsonify({
             'message': 'User created successfully',
             'token': token,
@@ -66,6 +66,9 @@ def signup():
             }
         }), 201
         
+    except (HasherBusy, HashTimeout):
+        logger.warning("Password hashing saturated")
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Signup error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -81,28 +84,51 @@ def login():
         if not username or not password:
             return jsonify({'error': 'Username and password are required'}), 400
         
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'error': 'Database connection failed'}), 500
-        
-        cursor = connection.cursor()
-        
-        # Get user
-        cursor.execute(
-            "SELECT id, username, email, password_hash FROM Users WHERE username = %s",
-            (username,)
-        )
-        user = cursor.fetchone()
-        
-        if not user or not bcrypt.checkpw(password.encode('utf-8'), user[3].encode('utf-8')):
+        with get_db_connection() as connection:
+            if not connection:
+                return jsonify({'error': 'Database connection failed'}), 500
+            
+            cursor = connection.cursor(buffered=True)
+            
+            # Get user
+            cursor.execute(
+                "SELECT id, username, email, password_hash FROM Users WHERE username = %s",
+                (username,)
+            )
+            user = cursor.fetchone()
+            cursor.close()
+        
+        # Verify outside the connection checkout so none is held during bcrypt
+        if not user or not password_hasher.verify(password, user[3]):
             return jsonify({'error': 'Invalid username or password'}), 401
         
-        # Update last login
-        cursor.execute(
-            "UPDATE Users SET last_login = CURRENT_TIMESTAMP WHERE id = %s",
-            (user[0],)
-        )
-        connection.commit()
+        # Upgrade hashes made with old parameters while we know the password
+        new_hash = None
+        if password_hasher.needs_rehash(user[3]):
+            try:
+                new_hash = password_hasher.hash(password)
+            except (HasherBusy, HashTimeout):
+                logger.info(f"Skipping password rehash for user {user[0]}, hasher busy")
+        
+        with get_db_connection() as connection:
+            if not connection:
+                return jsonify({'error': 'Database connection failed'}), 500
+            
+            cursor = connection.cursor(buffered=True)
+            
+            # Update last login
+            cursor.execute(
+                "UPDATE Users SET last_login = CURRENT_TIMESTAMP WHERE id = %s",
+                (user[0],)
+            )
+            if new_hash:
+                cursor.execute(
+                    "UPDATE Users SET password_hash = %s WHERE id = %s",
+                    (new_hash, user[0])
+                )
+                password_hasher.record_rehash()
+            connection.commit()
+            cursor.close()
         
         # Generate JWT token
         token = jwt.encode({
@@ -110,9 +136,6 @@ def login():
             'exp': datetime.utcnow() + timedelta(days=30)
         }, JWT_SECRET, algorithm='HS256')
         
-        cursor.close()
-        connection.close()
-        
         return jsonify({
             'message': 'Login successful',
             'token': token,
@@ -123,6 +146,24 @@ def login():
             }
         }), 200
         
+    except (HasherBusy, HashTimeout):
+        logger.warning("Password hashing saturated")
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Internal server error'}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoke the caller's token so it stops working before it expires"""
+    token = request.headers.get('Authorization')
+    if not token:
+        return jsonify({'error': 'Token is missing'}), 401
+    try:
+        decode_token(token)
+    except jwt.ExpiredSignatureError:
+        return jsonify({'error': 'Token has expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'error': 'Token is invalid'}), 401
+    revoke_token(token)
+    return jsonify({'message': 'Logged out'}), 200
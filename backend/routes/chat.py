@@ -1,17 +1,23 @@
-from flask import Blueprint, request, jsonify, current_app
-import requests
-import base64
-import io
-from PIL import Image
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+import json
+from concurrent.futures import TimeoutError as ImageTimeout
 from time import perf_counter
 import logging
-from config import OLLAMA_BASE_URL, MAX_TOKENS
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import MAX_TOKENS, IMAGE_MAX_BYTES
+from utils.image_preprocessor import image_preprocessor, ImageRejected, ImageBusy
+from utils.image_cache import image_cache, image_key
+from utils.ollama_client import ollama_client
+from utils.auth_utils import token_optional, get_session_key
+from utils.circuit_breaker import CircuitOpen
+from utils.scheduler import ollama_scheduler, request_cost, SchedulerBusy
 
 chat_bp = Blueprint('chat', __name__)
 logger = logging.getLogger(__name__)
 
 @chat_bp.route('/chat', methods=['POST'])
-def chat():
+@token_optional
+def chat(current_user_id):
     """Handle chat messages"""
     try:
         data = request.get_json()
@@ -19,31 +25,72 @@ def chat():
         if not user_message:
             return jsonify({"error": "No message provided"}), 400
 
+        chatbot = current_app.sessions.get(*get_session_key(current_user_id))
+
+        # "no_cache": true always asks the model instead of the response cache
+        use_cache = not data.get('no_cache')
+
+        if data.get('stream'):
+            return stream_chat(chatbot, user_message, use_cache)
+
         start = perf_counter()
-        ai_response = current_app.chatbot.get_agentic_response(user_message)
+        with chatbot.lock:
+            ai_response = chatbot.get_agentic_response(user_message, use_cache)
         end = perf_counter()
         response_time = round(end - start, 2)
 
         return jsonify({
             "response": ai_response,
-            "response_time": response_time
+            "response_time": response_time,
+            **chatbot.queue_info
         })
+    except SchedulerBusy as e:
+        logger.warning(f"Chat not scheduled: {str(e)}")
+        return jsonify({"error": "Server busy, please try again"}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+def stream_chat(chatbot, user_message, use_cache=True):
+    """Relay the chat response as newline-delimited JSON while it is generated.
+
+    Each line is either {"token": "..."} with the next piece of cleaned text or,
+    last, {"done": true, "response": "...", "response_time": ...} with the full
+    cleaned response.
+    """
+    def generate():
+        start = perf_counter()
+        try:
+            with chatbot.lock:
+                for event in chatbot.stream_agentic_response(user_message, use_cache):
+                    if event.get("done"):
+                        event["response_time"] = round(perf_counter() - start, 2)
+                        event.update(chatbot.queue_info)
+                    yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}")
+            yield json.dumps({"done": True, "error": "Internal server error"}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @chat_bp.route('/clear', methods=['POST'])
-def clear_chat():
+@token_optional
+def clear_chat(current_user_id):
     """Clear conversation history"""
     try:
-        current_app.chatbot.clear_history()
+        current_app.sessions.clear(*get_session_key(current_user_id))
         return jsonify({"message": "Chat cleared"})
     except Exception as e:
         logger.error(f"Clear error: {str(e)}")
         return jsonify({"error": "Error clearing chat"}), 500
 
 @chat_bp.route('/chat-image', methods=['POST'])
-def chat_image():
+@token_optional
+def chat_image(current_user_id):
     """Handle chat with image"""
     try:
         if 'image' not in request.files:
@@ -51,22 +98,27 @@ def chat_image():
             
         image_file = request.files['image']
         message = request.form.get('message', 'Analyze this image')
+        # "no_cache": true always runs the vision model
+        use_cache = not request.form.get('no_cache')
         
         if image_file.filename == '':
             return jsonify({"error": "No image selected"}), 400
         
-        # Read and process image
-        image_data = image_file.read()
-
-        # Validate image format
+        # Decode, orient, downscale and re-encode on the image pool, reading
+        # straight from the spooled upload
         try:
-            Image.open(io.BytesIO(image_data)).verify()
-        except Exception:
-            return jsonify({"error": "Invalid image format"}), 400
-        
-        # Convert to base64 for Ollama
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
+            image = image_preprocessor.prepare(image_file.stream)
+        except ImageRejected as e:
+            return jsonify({"error": str(e)}), 400
         
+        # The same picture with the same question gets the stored answer
+        key = image_key("llava:7b", image, message)
+        cached = image_cache.get(key) if use_cache else None
+        if cached is not None:
+            chatbot = current_app.sessions.get(*get_session_key(current_user_id))
+            logger.info("Image analysis served from cache")
+            return jsonify({"response": chatbot.clean_response(cached)})
+
         # Use vision model
         payload = {
             "model": "llava:7b",
@@ -74,7 +126,7 @@ def chat_image():
                 {
                     "role": "user", 
                     "content": message,
-                    "images": [image_base64]
+                    "images": [image]  # Raw JPEG, base64 encoded as the request is sent
                 }
             ],
             "stream": False,
@@ -86,12 +138,9 @@ def chat_image():
         
         logger.info(f"Sending image analysis request...")
         
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/chat",
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=120
-        )
+        user_key, _ = get_session_key(current_user_id)
+        with ollama_scheduler.slot(payload["model"], user_key, request_cost(payload)) as ticket:
+            response = ollama_client.chat(payload, route='vision')
         
         if response.status_code == 200:
             result = response.json()
@@ -99,15 +148,28 @@ def chat_image():
             
             if not ai_response.strip():
                 ai_response = "I couldn't analyze the image. Please try again."
+            else:
+                image_cache.put(key, ai_response)
             
-            ai_response = current_app.chatbot.clean_response(ai_response)
+            chatbot = current_app.sessions.get(*get_session_key(current_user_id))
+            ai_response = chatbot.clean_response(ai_response)
             logger.info(f"Image analysis completed")
             
-            return jsonify({"response": ai_response})
+            return jsonify({"response": ai_response, **ticket.info()})
         else:
             logger.error(f"Ollama error: {response.status_code}")
             return jsonify({"error": "Error processing image"}), 500
             
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Image is larger than {IMAGE_MAX_BYTES // (1024 * 1024)} MB"}), 413
+    except (ImageBusy, ImageTimeout):
+        logger.warning("Image preprocessing saturated")
+        return jsonify({"error": "Server busy, please try again"}), 503, {'Retry-After': '1'}
+    except SchedulerBusy as e:
+        logger.warning(f"Image chat not scheduled: {str(e)}")
+        return jsonify({"error": "Server busy, please try again"}), 503, {'Retry-After': '1'}
+    except CircuitOpen:
+        return jsonify({"error": "The AI model is unavailable, please try again later"}), 503, {'Retry-After': '5'}
     except Exception as e:
         logger.error(f"Image chat error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""Stand-in for the .NET CLI, covering just what CSharpRunner calls.
+
+`new` and `restore` lay out a project, `build` "compiles" Program.cs by
+collecting its Console.WriteLine string literals into the output assembly,
+and running the assembly prints them. A source containing `undefined_name`
+fails to build with a compiler-style error line.
+"""
+import os
+import re
+import sys
+
+
+def new(args):
+    path = args[args.index('-o') + 1]
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, f"{args[args.index('-n') + 1]}.csproj"), 'w') as f:
+        f.write('<Project Sdk="Microsoft.NET.Sdk" />\n')
+
+
+def restore():
+    os.makedirs('obj', exist_ok=True)
+    with open(os.path.join('obj', 'project.assets.json'), 'w') as f:
+        f.write('{}\n')
+
+
+def build(args):
+    with open('Program.cs', encoding='utf-8') as f:
+        source = f.read()
+    if 'undefined_name' in source:
+        workspace = os.getcwd()
+        print(f"{workspace}/Program.cs(7,9): error CS0103: The name 'undefined_name' does not exist "
+              f"in the current context [{workspace}/Snippet.csproj]")
+        return 1
+    output = args[args.index('-o') + 1]
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, 'Snippet.dll'), 'w', encoding='utf-8') as f:
+        f.write("\n".join(re.findall(r'Console\.WriteLine\("([^"]*)"\)', source)))
+    return 0
+
+
+def run(assembly):
+    with open(assembly, encoding='utf-8') as f:
+        print(f.read())
+
+
+def main(args):
+    if args[0] == 'new':
+        new(args)
+    elif args[0] == 'restore':
+        restore()
+    elif args[0] == 'build':
+        return build(args)
+    else:
+        run(args[0])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
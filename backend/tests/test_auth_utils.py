@@ -0,0 +1,72 @@
+import time
+from datetime import datetime, timedelta
+import jwt
+import pytest
+from flask import Flask
+from config import JWT_SECRET
+from routes.auth import auth_bp
+from utils import auth_utils
+from utils.auth_utils import TokenCache, decode_token, revoke_token
+
+
+def make_token(user_id, expires_in=timedelta(hours=1)):
+    return jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + expires_in}, JWT_SECRET, algorithm='HS256')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth_utils.time, 'time', lambda: now[0])
+    return now
+
+
+def test_entry_expires_exactly_at_exp(clock):
+    cache = TokenCache()
+    cache.put(b'digest', 7, 1010)
+    clock[0] = 1009.999
+    assert cache.get(b'digest') == 7
+    clock[0] = 1010
+    assert cache.get(b'digest') is None
+    assert cache.metrics()["size"] == 0
+
+
+def test_put_refuses_revoked_token(clock):
+    cache = TokenCache()
+    cache.put(b'digest', 7, 2000)
+    cache.revoke(b'digest', 2000)
+    assert cache.get(b'digest') is None
+    assert cache.put(b'digest', 7, 2000) is False
+    assert cache.get(b'digest') is None
+    assert cache.is_revoked(b'digest')
+
+
+def test_size_bound_evicts_least_recently_used(clock):
+    cache = TokenCache(max_size=2)
+    cache.put(b'a', 1, 2000)
+    cache.put(b'b', 2, 2000)
+    cache.get(b'a')
+    cache.put(b'c', 3, 2000)
+    assert cache.metrics()["size"] == 2
+    assert cache.get(b'b') is None
+    assert cache.get(b'a') == 1
+    assert cache.get(b'c') == 3
+
+
+def test_revoked_token_is_rejected():
+    token = make_token(41)
+    assert decode_token(f"Bearer {token}") == 41
+    revoke_token(f"Bearer {token}")
+    with pytest.raises(jwt.InvalidTokenError):
+        decode_token(token)
+
+
+def test_logout_revokes_token():
+    app = Flask(__name__)
+    app.register_blueprint(auth_bp)
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {make_token(42)}"}
+
+    assert client.post('/auth/logout').status_code == 401
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+    # The token is refused from now on, logging out again included
+    assert client.post('/auth/logout', headers=headers).status_code == 401
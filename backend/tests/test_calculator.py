@@ -0,0 +1,111 @@
+from decimal import Decimal
+from fractions import Fraction
+import pytest
+from utils.calculator import calculate, calculate_many, CalculationError
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2+3", 5),
+    ("7/2", 3.5),
+    ("2**3", 8),
+    ("-2**2", -4),
+    ("sqrt(16) + log(e)", 5.0),
+    ("round(2.567, 2)", 2.57),
+    ("max(1, 2, 3)", 3),
+])
+def test_float_mode(expression, expected):
+    assert calculate(expression) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("0.1 + 0.2", Decimal("0.3")),
+    ("2**3", Decimal(8)),
+    ("1.5**2", Decimal("2.25")),
+    ("2**-1", Decimal("0.5")),
+    ("sqrt(4)", Decimal(2)),
+    ("round(1/3, 2)", Decimal("0.33")),
+])
+def test_decimal_mode(expression, expected):
+    assert calculate(expression, 'decimal') == expected
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("1/3 + 1/6", Fraction(1, 2)),
+    ("(2/3)**2", Fraction(4, 9)),
+    ("0.1 + 0.2", Fraction(3, 10)),
+    ("round(1/3, 2)", Fraction(33, 100)),
+])
+def test_fraction_mode(expression, expected):
+    assert calculate(expression, 'fraction') == expected
+
+
+@pytest.mark.parametrize("mode", ['float', 'decimal', 'fraction'])
+@pytest.mark.parametrize("expression", [
+    "9**9**9",
+    "2**1000",
+    "10**101",
+    "1" * 101,
+    "-" + "1" * 101,
+    "round(1/3, 10**9)",
+    "round(1, 1000)",
+    "exp(1000)",
+])
+def test_limits(mode, expression):
+    with pytest.raises(CalculationError):
+        calculate(expression, mode)
+
+
+def test_fraction_mode_limits_tiny_powers():
+    # The denominator would need hundreds of digits
+    with pytest.raises(CalculationError):
+        calculate("(1/3)**1000", 'fraction')
+    with pytest.raises(CalculationError):
+        calculate("2**-400", 'fraction')
+
+
+@pytest.mark.parametrize("mode", ['float', 'decimal'])
+@pytest.mark.parametrize("expression, expected", [
+    ("10**-200", 1e-200),
+    ("2**-400", 2.0 ** -400),
+    ("(1/3)**100", (1 / 3) ** 100),
+])
+def test_negative_and_tiny_powers(mode, expression, expected):
+    assert float(calculate(expression, mode)) == pytest.approx(expected)
+
+
+def test_decimal_mode_keeps_long_integers_exact():
+    assert calculate("12345678901234567890123456789012345 + 1", 'decimal') == \
+        Decimal("12345678901234567890123456789012346")
+    assert calculate("(10**50) % 7", 'decimal') == Decimal(10 ** 50 % 7)
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("(10**60) // (10**-60)", "Result has more than 100 digits"),
+    ("exp(1000)", "Result is too large"),
+    ("sqrt(-1)", "Invalid operation"),
+])
+def test_decimal_errors_are_readable(expression, message):
+    with pytest.raises(CalculationError, match=message.replace('(', r'\(')):
+        calculate(expression, 'decimal')
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os')",
+    "(1).__class__",
+    "x + 1",
+    "sqrt",
+    "'a' * 3",
+    "True + 1",
+    "[1, 2]",
+    "1/0",
+    "",
+])
+def test_rejected(expression):
+    with pytest.raises(CalculationError):
+        calculate(expression)
+
+
+def test_batch_keeps_errors_in_place():
+    results = calculate_many(["1+1", "1/0", "2**3"])
+    assert results[0] == 2 and results[2] == 8
+    assert isinstance(results[1], CalculationError)
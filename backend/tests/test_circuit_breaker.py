@@ -0,0 +1,78 @@
+import pytest
+from utils import circuit_breaker
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(failure_threshold=3, reset_timeout=15, half_open_probes=1)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+    assert breaker.metrics()["rejected"] == 1
+
+
+def test_full_cycle(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.available()
+
+    clock[0] += 15
+    assert breaker.available()
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+    assert breaker.metrics()["opened"] == 1
+
+
+def test_failed_probe_reopens(breaker, clock):
+    breaker.trip()
+    clock[0] += 15
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock[0] += 14
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+    clock[0] += 1
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+
+
+def test_late_success_does_not_close_open_circuit(breaker, clock):
+    breaker.trip()
+    # A call that started before the trip finishes fine
+    breaker.record_success()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+
+
+def test_reset_closes_from_any_state(breaker):
+    breaker.trip()
+    breaker.reset()
+    assert breaker.state == CLOSED
+    breaker.before_request()
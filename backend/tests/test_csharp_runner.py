@@ -0,0 +1,65 @@
+import os
+import shutil
+import sys
+import time
+import pytest
+from utils.csharp_runner import CSharpRunner
+
+FAKE_DOTNET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_dotnet.py')
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="the dotnet stand-in is a shell script")
+
+
+@pytest.fixture
+def runner(tmp_path):
+    dotnet = tmp_path / 'dotnet'
+    dotnet.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_DOTNET}" "$@"\n')
+    dotnet.chmod(0o755)
+    return CSharpRunner(dotnet=str(dotnet), work_dir=str(tmp_path / 'work'), workspaces=2)
+
+
+def test_build_and_run(runner):
+    assert runner.run('Console.WriteLine("hello");') == "hello"
+    assert runner.metrics()["builds"] == 1
+
+
+def test_cache_hit_skips_build(runner):
+    runner.run('Console.WriteLine("again");')
+    assert runner.run('Console.WriteLine("again");') == "again"
+    stats = runner.metrics()
+    assert stats["builds"] == 1
+    assert stats["cache_hits"] == 1
+
+
+def test_compile_error(runner):
+    result = runner.run('Console.WriteLine(undefined_name);')
+    assert result == ("C# Error: Program.cs(7,9): error CS0103: "
+                      "The name 'undefined_name' does not exist in the current context")
+    assert runner.metrics()["build_errors"] == 1
+
+
+def test_rebuilds_evicted_assembly(runner, monkeypatch):
+    code = 'Console.WriteLine("evicted");'
+    runner.run(code)
+    cached = [entry.path for entry in os.scandir(runner.cache_dir)]
+    exists = os.path.exists
+
+    def exists_then_evict(path):
+        # The build is evicted between the cache check and the run
+        found = exists(path)
+        for entry in cached:
+            shutil.rmtree(entry, ignore_errors=True)
+        return found
+
+    monkeypatch.setattr(os.path, 'exists', exists_then_evict)
+    assert runner.run(code) == "evicted"
+    assert runner.metrics()["builds"] == 2
+
+
+def test_missing_sdk_fails_fast(tmp_path):
+    runner = CSharpRunner(dotnet=str(tmp_path / 'missing'), work_dir=str(tmp_path / 'work'))
+    start = time.monotonic()
+    result = runner.run('Console.WriteLine("hi");')
+    assert result.startswith("C# Error: the .NET SDK is unavailable")
+    assert time.monotonic() - start < 5
+    assert runner.metrics()["failed"] == runner.size
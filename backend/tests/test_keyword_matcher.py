@@ -0,0 +1,90 @@
+import random
+import re
+import pytest
+from utils.keyword_matcher import KEYWORDS, WHOLE_WORD_CATEGORIES, KeywordMatcher, keyword_matcher
+
+SAMPLES = [
+    "Going to the store, she said it was fine",
+    "How do I fix this TypeError in my python3 script?",
+    "I'm new to machine learning, what does gradient descent do?",
+    "Compare React vs Angular for web development",
+    "My C# code crashes with an exception; I also know c++ and C",
+    "Can you calculate the performance of this algorithm complexity?",
+    "Install docker and kubernetes on AWS, then configure the environment",
+    "Is Go better than Rust? I'm learning golang and rusty on r",
+    "Explain the design pattern behind this Django/Flask app",
+    "Traceback (most recent call last): KeyError: 'mysql'",
+    "search for files, read file config.py and run this",
+    "what can you do? show system info and capabilities",
+    "Versus, difference, recommend, optimize, improve: the best guide",
+    "easy way to refactor enterprise JavaScript and TypeScript",
+    "AI, ai-driven, said, paid, chair, Ai!",
+    "",
+]
+
+
+def baseline_find(text):
+    """The original per-keyword substring checks, with whole words where the matcher promises them"""
+    text = text.lower()
+    hits = {}
+    for category, words in KEYWORDS.items():
+        for word in words:
+            if category in WHOLE_WORD_CATEGORIES or len(word) <= 2:
+                found = re.search(rf'(?<![^\W_]){re.escape(word)}(?![^\W\d_])', text)
+            else:
+                found = word in text
+            if found:
+                hits.setdefault(category, set()).add(word)
+    return hits
+
+
+@pytest.mark.parametrize("text, absent", [
+    ("Going home", 'go'),
+    ("she said so", 'ai'),
+    ("a rusty nail", 'rust'),
+    ("cat /etc/hosts", 'c'),
+    ("learn regex", 'r'),
+    ("the javascript docs", 'java'),
+])
+def test_whole_word_keywords_skip_inner_matches(text, absent):
+    hits = keyword_matcher.find(text)
+    assert absent not in hits['language'] | hits['topic']
+
+
+def test_whole_word_keywords_allow_punctuation_and_versions():
+    hits = keyword_matcher.find("Go, AI! python3 and c99 (r)")
+    assert hits['language'] == {'go', 'python', 'c', 'r'}
+    assert hits['topic'] == {'ai'}
+
+
+def test_multi_word_keywords():
+    hits = keyword_matcher.find("How do I start with machine learning for game development?")
+    assert 'how do i' in hits['tutorial']
+    assert hits['topic'] == {'machine learning', 'game development'}
+    # Overlapping keywords are all reported
+    assert 'learning' in hits['beginner']
+
+
+def test_symbols_in_keywords():
+    # The baseline also counted the bare c in both
+    assert keyword_matcher.find("C# and C++ code")['language'] == {'c#', 'c++', 'c'}
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_matches_baseline_on_samples(text):
+    assert dict(keyword_matcher.find(text)) == baseline_find(text)
+
+
+def test_matches_baseline_on_random_messages():
+    rng = random.Random(11)
+    words = [word for group in KEYWORDS.values() for word in group]
+    words += ["the", "going", "said", "rusty", "cat", "code", "3", "!", "-", "(", ")", "."]
+    for _ in range(2000):
+        text = rng.choice(["", " "]).join(rng.choice(words) for _ in range(rng.randint(1, 8)))
+        text = ''.join(char.upper() if rng.random() < 0.2 else char for char in text)
+        assert dict(keyword_matcher.find(text)) == baseline_find(text), text
+
+
+def test_custom_categories():
+    matcher = KeywordMatcher({'fruit': ['apple', 'pear'], 'language': ['go']})
+    assert dict(matcher.find("Apples and pears, go!")) == {'fruit': {'apple', 'pear'}, 'language': {'go'}}
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+import pytest
+from utils import scheduler as scheduler_module
+from utils.async_scheduler import AsyncOllamaScheduler
+from utils.scheduler import FairQueue, OllamaScheduler, QueueFull, QueueTimeout
+
+MODEL = 'test-model'
+
+
+def busy_queue():
+    """A one-slot queue whose slot is taken, so new tickets wait"""
+    queue = FairQueue(1)
+    queue.enqueue('holder', 1, 60)
+    queue.dispatch()
+    return queue
+
+
+def release_one(queue):
+    queue.release()
+    queue.dispatch()
+
+
+def grant_order(queue, tickets):
+    """Users in the order their tickets are granted, each releasing its slot at once"""
+    order = []
+    pending = list(tickets)
+    release_one(queue)
+    while pending:
+        granted = [ticket for ticket in pending if ticket.granted]
+        assert len(granted) == 1
+        order.append(granted[0].user)
+        pending.remove(granted[0])
+        release_one(queue)
+    return order
+
+
+def test_light_user_overtakes_heavy_backlog():
+    queue = busy_queue()
+    tickets = [queue.enqueue('heavy', 100, 60) for _ in range(3)]
+    tickets.append(queue.enqueue('light', 10, 60))
+    assert grant_order(queue, tickets) == ['light', 'heavy', 'heavy', 'heavy']
+
+
+def test_equal_users_alternate():
+    queue = busy_queue()
+    tickets = [queue.enqueue('a', 50, 60) for _ in range(3)]
+    tickets += [queue.enqueue('b', 50, 60) for _ in range(3)]
+    assert grant_order(queue, tickets) == ['a', 'b', 'a', 'b', 'a', 'b']
+
+
+def test_weight_gives_a_larger_share(monkeypatch):
+    monkeypatch.setattr(scheduler_module, 'SCHEDULER_USER_WEIGHTS', {'vip': 2.0})
+    queue = busy_queue()
+    tickets = [queue.enqueue('vip', 50, 60) for _ in range(4)]
+    tickets += [queue.enqueue('other', 50, 60) for _ in range(2)]
+    assert grant_order(queue, tickets) == ['vip', 'vip', 'other', 'vip', 'vip', 'other']
+
+
+def test_expired_ticket_is_skipped():
+    queue = busy_queue()
+    stale = queue.enqueue('stale', 1, 0)
+    fresh = queue.enqueue('fresh', 100, 60)
+    release_one(queue)
+    assert stale.expired and not stale.granted
+    assert fresh.granted
+    assert queue.active == 1 and not queue.waiting
+
+
+def test_withdrawn_ticket_is_never_granted():
+    queue = busy_queue()
+    ticket = queue.enqueue('gone', 1, 60)
+    queue.withdraw(ticket)
+    release_one(queue)
+    assert not ticket.granted
+    assert queue.active == 0
+
+
+def holding_slot(scheduler):
+    """Start a thread holding the model's only slot; set the event to let it go"""
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with scheduler.slot(MODEL, 'holder', 1):
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    return release, thread
+
+
+def test_scheduler_expires_waiters_past_their_deadline():
+    scheduler = OllamaScheduler(timeout=0.1)
+    scheduler.queues[MODEL] = FairQueue(1)
+    release, thread = holding_slot(scheduler)
+    with pytest.raises(QueueTimeout):
+        scheduler.acquire(MODEL, 'late', 1)
+    release.set()
+    thread.join()
+    assert scheduler.metrics()["queues"][MODEL] == {"active": 0, "waiting": 0}
+    assert scheduler.metrics()["expired"] == 1
+
+
+def test_scheduler_rejects_past_queue_limit():
+    scheduler = OllamaScheduler(queue_limit=1, timeout=0.5)
+    scheduler.queues[MODEL] = FairQueue(1)
+    release, thread = holding_slot(scheduler)
+    waiter = threading.Thread(target=lambda: pytest.raises(QueueTimeout, scheduler.acquire, MODEL, 'waiting', 1))
+    waiter.start()
+    while not scheduler.metrics()["queues"][MODEL]["waiting"]:
+        time.sleep(0.01)
+    with pytest.raises(QueueFull):
+        scheduler.acquire(MODEL, 'extra', 1)
+    waiter.join()
+    release.set()
+    thread.join()
+    assert scheduler.metrics()["rejected"] == 1
+
+
+def test_scheduler_hands_slot_to_next_waiter():
+    scheduler = OllamaScheduler()
+    scheduler.queues[MODEL] = FairQueue(1)
+    release, thread = holding_slot(scheduler)
+    threading.Timer(0.05, release.set).start()
+    with scheduler.slot(MODEL, 'next', 1) as ticket:
+        assert ticket.granted and ticket.waited > 0
+    thread.join()
+    assert scheduler.metrics()["queues"][MODEL]["active"] == 0
+
+
+def test_async_cancelled_waiter_gives_back_a_granted_slot():
+    async def scenario():
+        scheduler = AsyncOllamaScheduler()
+        queue = scheduler.queues[MODEL] = FairQueue(1)
+        await scheduler.acquire(MODEL, 'holder', 1)
+        waiter = asyncio.create_task(scheduler.acquire(MODEL, 'waiter', 1))
+        await asyncio.sleep(0.01)
+        assert len(queue.waiting) == 1
+
+        # Release the holder's slot the way slot() does, which grants it to the
+        # waiter, and cancel the waiter before it gets to run again
+        cond = scheduler.get_cond()
+        async with cond:
+            queue.release()
+            queue.dispatch()
+            cond.notify_all()
+        assert queue.active == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.active == 0 and not queue.waiting
+
+
+def test_async_waiter_expires():
+    async def scenario():
+        scheduler = AsyncOllamaScheduler(timeout=0.05)
+        queue = scheduler.queues[MODEL] = FairQueue(1)
+        await scheduler.acquire(MODEL, 'holder', 1)
+        with pytest.raises(QueueTimeout):
+            await scheduler.acquire(MODEL, 'late', 1)
+        return queue, scheduler
+
+    queue, scheduler = asyncio.run(scenario())
+    assert queue.active == 1 and not queue.waiting
+    assert scheduler.stats["expired"] == 1
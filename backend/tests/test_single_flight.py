@@ -0,0 +1,277 @@
+import asyncio
+import queue
+import threading
+import time
+import pytest
+from utils import async_single_flight as async_single_flight_module
+from utils import single_flight as single_flight_module
+from utils.async_scheduler import AsyncOllamaScheduler
+from utils.async_single_flight import AsyncSingleFlight
+from utils.scheduler import OllamaScheduler
+from utils.single_flight import SingleFlight
+
+PAYLOAD = {'model': 'test-model', 'messages': [{'role': 'user', 'content': 'hi'}]}
+REPLY = {'message': {'role': 'assistant', 'content': 'hello'}}
+
+
+@pytest.fixture(autouse=True)
+def schedulers(monkeypatch):
+    monkeypatch.setattr(single_flight_module, 'ollama_scheduler', OllamaScheduler())
+    monkeypatch.setattr(async_single_flight_module, 'async_ollama_scheduler', AsyncOllamaScheduler())
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class FakeStream:
+    """A streamed response whose lines the test feeds; an exception is raised in place"""
+
+    def __init__(self):
+        self.status_code = 200
+        self.lines = queue.Queue()
+        self.closed = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed.set()
+
+    def iter_lines(self):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                return
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+
+class FakeClient:
+    def __init__(self, error=None):
+        self.release = threading.Event()
+        self.error = error
+        self.stream = FakeStream()
+        self.calls = 0
+        self.streams = 0
+
+    def chat(self, payload, route, affinity):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return REPLY
+
+    def stream_chat(self, payload, route, affinity):
+        self.streams += 1
+        return self.stream
+
+
+def call_in_thread(group, results):
+    def run():
+        try:
+            results.append(group.chat('key', PAYLOAD))
+        except Exception as e:
+            results.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_follower_gets_leaders_response():
+    client = FakeClient()
+    group = SingleFlight(client)
+    results = []
+    leader = call_in_thread(group, results)
+    wait_until(lambda: client.calls == 1)
+    follower = call_in_thread(group, results)
+    wait_until(lambda: group.stats["shared_calls"] == 1)
+    client.release.set()
+    leader.join()
+    follower.join()
+    assert results == [REPLY, REPLY]
+    assert client.calls == 1
+    assert group.metrics()["in_flight"] == 0
+
+
+def test_call_error_reaches_follower():
+    client = FakeClient(error=ConnectionError("down"))
+    group = SingleFlight(client)
+    results = []
+    leader = call_in_thread(group, results)
+    wait_until(lambda: client.calls == 1)
+    follower = call_in_thread(group, results)
+    wait_until(lambda: group.stats["shared_calls"] == 1)
+    client.release.set()
+    leader.join()
+    follower.join()
+    assert [type(result) for result in results] == [ConnectionError, ConnectionError]
+
+
+def test_late_subscriber_replays_received_lines():
+    client = FakeClient()
+    group = SingleFlight(client)
+    with group.stream_chat('key', PAYLOAD) as first:
+        lines = first.iter_lines()
+        client.stream.lines.put('a')
+        client.stream.lines.put('b')
+        assert [next(lines), next(lines)] == ['a', 'b']
+
+        with group.stream_chat('key', PAYLOAD) as late:
+            client.stream.lines.put('c')
+            client.stream.lines.put(None)
+            assert list(late.iter_lines()) == ['a', 'b', 'c']
+        assert list(lines) == ['c']
+    assert client.streams == 1
+    assert group.stats["shared_streams"] == 1
+
+
+def test_upstream_closes_when_every_subscriber_leaves():
+    client = FakeClient()
+    group = SingleFlight(client)
+    with group.stream_chat('key', PAYLOAD) as stream:
+        client.stream.lines.put('a')
+        assert next(stream.iter_lines()) == 'a'
+    # The producer notices on the next line and stops reading
+    client.stream.lines.put('b')
+    assert client.stream.closed.wait(5)
+    wait_until(lambda: group.metrics()["in_flight"] == 0)
+    assert group.stats["abandoned_streams"] == 1
+
+
+def test_stream_error_reaches_every_subscriber():
+    client = FakeClient()
+    group = SingleFlight(client)
+    with group.stream_chat('key', PAYLOAD) as first, group.stream_chat('key', PAYLOAD) as second:
+        client.stream.lines.put('a')
+        client.stream.lines.put(ConnectionError("reset"))
+        for stream in (first, second):
+            received = []
+            with pytest.raises(ConnectionError):
+                for line in stream.iter_lines():
+                    received.append(line)
+            assert received == ['a']
+
+
+class FakeAsyncStream:
+    def __init__(self):
+        self.status_code = 200
+        self.lines = asyncio.Queue()
+        self.closed = asyncio.Event()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed.set()
+
+    async def aiter_lines(self):
+        while True:
+            line = await self.lines.get()
+            if line is None:
+                return
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+
+class FakeAsyncClient:
+    def __init__(self, error=None):
+        self.release = asyncio.Event()
+        self.error = error
+        self.stream = FakeAsyncStream()
+        self.calls = 0
+        self.streams = 0
+
+    async def chat(self, payload, route, affinity):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return REPLY
+
+    def stream_chat(self, payload, route, affinity):
+        self.streams += 1
+        return self.stream
+
+
+async def collect(stream):
+    received = []
+    try:
+        async with stream:
+            async for line in stream.aiter_lines():
+                received.append(line)
+    except ConnectionError as e:
+        received.append(e)
+    return received
+
+
+def test_async_follower_gets_leaders_response():
+    async def scenario():
+        client = FakeAsyncClient()
+        group = AsyncSingleFlight(client)
+        calls = [asyncio.create_task(group.chat('key', PAYLOAD)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        client.release.set()
+        return await asyncio.gather(*calls), client, group
+
+    results, client, group = asyncio.run(scenario())
+    assert results == [REPLY, REPLY]
+    assert client.calls == 1
+    assert group.stats["shared_calls"] == 1
+
+
+def test_async_late_subscriber_replays_received_lines():
+    async def scenario():
+        client = FakeAsyncClient()
+        group = AsyncSingleFlight(client)
+        first = asyncio.create_task(collect(group.stream_chat('key', PAYLOAD)))
+        await client.stream.lines.put('a')
+        await client.stream.lines.put('b')
+        await asyncio.sleep(0.01)
+        late = asyncio.create_task(collect(group.stream_chat('key', PAYLOAD)))
+        await client.stream.lines.put('c')
+        await client.stream.lines.put(None)
+        return await first, await late, client
+
+    first, late, client = asyncio.run(scenario())
+    assert first == late == ['a', 'b', 'c']
+    assert client.streams == 1
+
+
+def test_async_upstream_closes_when_every_subscriber_leaves():
+    async def scenario():
+        client = FakeAsyncClient()
+        group = AsyncSingleFlight(client)
+        stream = group.stream_chat('key', PAYLOAD)
+        async with stream:
+            await client.stream.lines.put('a')
+            async for line in stream.aiter_lines():
+                break
+        await client.stream.lines.put('b')
+        await asyncio.wait_for(client.stream.closed.wait(), 5)
+        await asyncio.sleep(0)
+        return group
+
+    group = asyncio.run(scenario())
+    assert group.stats["abandoned_streams"] == 1
+    assert group.metrics()["in_flight"] == 0
+
+
+def test_async_stream_error_reaches_every_subscriber():
+    async def scenario():
+        client = FakeAsyncClient()
+        group = AsyncSingleFlight(client)
+        subscribers = [asyncio.create_task(collect(group.stream_chat('key', PAYLOAD))) for _ in range(2)]
+        await client.stream.lines.put('a')
+        await client.stream.lines.put(ConnectionError("reset"))
+        return await asyncio.gather(*subscribers)
+
+    for received in asyncio.run(scenario()):
+        assert received[0] == 'a'
+        assert isinstance(received[1], ConnectionError)
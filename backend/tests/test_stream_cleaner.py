@@ -0,0 +1,49 @@
+import random
+import pytest
+from models.conversation import SimpleChatBot
+from utils.stream_cleaner import StreamCleaner
+
+FRAGMENTS = ['a', 'Intro', 'x y', ' ', '\t', '\n', '\n\n', '\r', '#', '##', '###', '<', '>', 'think',
+             '<think>', '</think>', '<thinking>', '</thinking>', '<THINK>', '</Thinking>']
+
+
+def clean_response(text):
+    return SimpleChatBot.clean_response(None, text)
+
+
+def stream(tokens):
+    cleaner = StreamCleaner()
+    return ''.join(cleaner.feed(token) for token in tokens) + cleaner.flush()
+
+
+def split(text, rng):
+    """Cut text into tokens at random points"""
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(0, len(text) - 1))) if len(text) > 1 else []
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("text", [
+    "Hello world",
+    "<think>plan</think>Answer",
+    "Before <THINKING>hidden\n\n</THINKING>after",
+    "## Title\n\n\n\nBody   \ntext",
+    "Start <think>never closed\nstill thinking",
+    "<think>mismatched</thinking> rest",
+    "a < b and c <thin d",
+    "Intro\n##\nBody",
+    "Answer:\n\n#",
+    "####deep",
+])
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_matches_clean_response(text, size):
+    assert stream([text[i:i + size] for i in range(0, len(text), size)]) == clean_response(text)
+
+
+def test_matches_clean_response_for_any_split():
+    rng = random.Random(1234)
+    for _ in range(5000):
+        text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 12)))
+        if not text.strip():
+            continue  # clean_response answers blank output with a fallback message
+        tokens = split(text, rng)
+        assert stream(tokens) == clean_response(text), tokens
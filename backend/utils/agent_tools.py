@@ -7,6 +7,9 @@ import sys
 from io import StringIO
 import tempfile
 import shutil
+from utils.python_sandbox import python_sandbox
+from utils.csharp_runner import csharp_runner
+from utils.calculator import calculate, calculate_many, CalculationError
 
 
 
@@ -35,16 +38,20 @@ class AgentTools:
             return "Error reading file"
     
     @staticmethod
-    def calculate(expression):
-        """Safe mathematical calculations"""
+    def calculate(expression, mode='float'):
+        """Safe mathematical calculations; mode is 'float', 'decimal' or 'fraction'"""
         try:
-            # Only allow safe operations
-            allowed = "0123456789+-*/.() "
-            if all(c in allowed for c in expression):
-                return str(eval(expression))
-            return "Invalid expression"
-        except:
-            return "Calculation error"
+            return str(calculate(expression, mode))
+        except CalculationError as e:
+            return f"Calculation error: {e}"
+
+    @staticmethod
+    def calculate_batch(expressions, mode='float'):
+        """Evaluate several expressions in one call, one result string each"""
+        return [
+            f"Calculation error: {result}" if isinstance(result, CalculationError) else str(result)
+            for result in calculate_many(expressions, mode)
+        ]
         
     @staticmethod  # <-- Add this line and everything below
     def search_files_in_path(directory, pattern="*.*"):
@@ -97,84 +104,10 @@ class AgentTools:
     
     @staticmethod
     def execute_python_code(code):
-        """Execute Python code safely and return output"""
-        import sys
-        from io import StringIO
-        original_stdout = sys.stdout
-        original_stderr = sys.stderr
-        captured_output = StringIO()
-        captured_error = StringIO()
-        try:
-            
-            sys.stdout = captured_output
-            sys.stderr = captured_error
-
-            exec(code)
-
-            output = captured_output.getvalue()
-            error = captured_error.getvalue()
-
-
-            if error:
-                return f"Error: {error}"
-            return output if output else "Code executed successfully (no output)"
-        except Exception as e:
-            return f"Execution Error: {str(e)}"
-        finally:
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
+        """Execute Python code in a sandbox worker process and return output"""
+        return python_sandbox.run(code)
 
     @staticmethod
     def execute_csharp_code(code):
-            """Execute C# code using dotnet"""
-            import subprocess
-            import tempfile
-            import os
-            import shutil
-            try:
-                    temp_dir = os.path.join(tempfile.gettempdir(), f"csharp_temp_{os.getpid()}")
-                    os.makedirs(temp_dir, exist_ok=True)
-
-                    try:
-                        subprocess.run(['dotnet', 'new', 'console', '--force'], 
-                                      cwd=temp_dir, capture_output=True, text=True, check=True)
-                        
-                        program_file = os.path.join(temp_dir, 'Program.cs')
-                                            
-                        if 'class Program' not in code and 'static void Main' not in code:
-                            wrapped_code = f"""using System;
-
-
-using System;
-class Program 
-{{
-    static void Main() 
-    {{
-        {code}
-    }}
-}}"""
-                        else:
-                          wrapped_code = code
-
-                        with open(program_file, 'w', encoding='utf-8') as f:
-                         f.write(wrapped_code)
-
-                        result = subprocess.run(['dotnet', 'run'], 
-                                  cwd=temp_dir, capture_output=True, text=True, timeout=10)
-                                
-
-                        if result.returncode == 0:
-                          return result.stdout.strip() if result.stdout.strip() else "C# executed successfully"
-                        else:
-                          return f"C# Error: {result.stderr.strip()}"
-                        
-                    finally:
-                        try:
-                            shutil.rmtree(temp_dir)
-                        except:
-                            pass
-
-            except subprocess.TimeoutExpired:
-                return "C# execution timeout"
-            except Exception as e:
-                return f"C# Error: {result.stderr.strip()}"
\ No newline at end of file
+        """Execute C# code in a pre-restored .NET workspace"""
+        return csharp_runner.run(code)
@@ -0,0 +1,40 @@
+from quart import request, jsonify
+import jwt
+from functools import wraps
+from utils.auth_utils import decode_token, normalize_conversation_id
+
+def token_optional(f):
+    """Quart version of utils.auth_utils.token_optional"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return await f(None, *args, **kwargs)
+
+        try:
+            current_user_id = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            return jsonify({'error': 'Token has expired'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'error': 'Token is invalid'}), 401
+
+        return await f(current_user_id, *args, **kwargs)
+    return decorated
+
+async def get_session_key(current_user_id):
+    """Quart version of utils.auth_utils.get_session_key"""
+    data = await request.get_json(silent=True) or {}
+    form = await request.form
+    conversation_id = (
+        data.get('conversation_id')
+        or form.get('conversation_id')
+        or request.args.get('conversation_id')
+        or request.headers.get('X-Conversation-Id')
+        or 'default'
+    )
+    if current_user_id is None:
+        # Anonymous callers are kept apart by client address
+        user_key = f"anonymous:{request.remote_addr}"
+    else:
+        user_key = f"user:{current_user_id}"
+    return user_key, normalize_conversation_id(conversation_id)
@@ -0,0 +1,35 @@
+import aiomysql
+import logging
+from config import DB_CONFIG, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+pool = None
+
+async def init_db_pool():
+    """Create the aiomysql pool used by the ASGI app"""
+    global pool
+    try:
+        pool = await aiomysql.create_pool(
+            host=DB_CONFIG['host'],
+            db=DB_CONFIG['database'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            minsize=DB_POOL_MIN_SIZE,
+            maxsize=DB_POOL_MAX_SIZE
+        )
+        print("✅ Async database pool ready!")
+    except Exception as e:
+        pool = None
+        print(f"❌ Async database pool failed: {e}")
+
+async def close_db_pool():
+    global pool
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+        pool = None
+
+def get_db_pool():
+    """Get the async database pool, or None if it is unavailable"""
+    return pool
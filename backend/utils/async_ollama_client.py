@@ -0,0 +1,145 @@
+import httpx
+import logging
+from contextlib import asynccontextmanager
+from time import perf_counter
+from utils.circuit_breaker import CircuitOpen
+from utils.json_body import JsonBody, has_raw_images
+from utils.ollama_endpoints import endpoint_pool
+from config import (
+    OLLAMA_POOL_MAXSIZE, OLLAMA_MAX_RETRIES,
+    OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUTS, OLLAMA_KEEP_ALIVE, OLLAMA_WARMUP_MODELS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaClient:
+    """Async counterpart of OllamaClient for the ASGI app.
+
+    A waiting generation costs a coroutine instead of a worker thread, so one
+    process can keep hundreds of requests in flight against Ollama.
+    """
+
+    def __init__(self, pool=endpoint_pool):
+        self.pool = pool
+        self.client = None
+        self.stats = {"requests": 0, "errors": 0, "total_time": 0.0}
+
+    def get_client(self):
+        """Create the httpx client lazily so it binds to the serving loop"""
+        if self.client is None:
+            # httpx retries connection failures only, like the sync client
+            transport = httpx.AsyncHTTPTransport(retries=OLLAMA_MAX_RETRIES)
+            hosts = len(self.pool.endpoints)
+            self.client = httpx.AsyncClient(
+                transport=transport,
+                limits=httpx.Limits(
+                    max_connections=OLLAMA_POOL_MAXSIZE * hosts,
+                    max_keepalive_connections=OLLAMA_POOL_MAXSIZE * hosts
+                ),
+                headers={"Content-Type": "application/json"}
+            )
+        return self.client
+
+    def timeout_for(self, route):
+        """httpx timeout for a route name from OLLAMA_TIMEOUTS"""
+        read = OLLAMA_TIMEOUTS.get(route, OLLAMA_TIMEOUTS['chat'])
+        return httpx.Timeout(read, connect=OLLAMA_CONNECT_TIMEOUT)
+
+    def record(self, endpoint, start, failed, route):
+        self.stats["requests"] += 1
+        self.stats["total_time"] += perf_counter() - start
+        if failed:
+            self.stats["errors"] += 1
+        # Health checks bypass the breaker, like in the sync client
+        if route != 'health':
+            if failed:
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.record_success()
+
+    def guard(self, endpoint, route):
+        """Raise CircuitOpen while the endpoint's breaker refuses calls"""
+        if route != 'health':
+            endpoint.breaker.before_request()
+
+    async def request(self, endpoint, method, path, route='chat', **kwargs):
+        """Send a request to one Ollama endpoint through the pooled async client"""
+        self.guard(endpoint, route)
+        kwargs.setdefault('timeout', self.timeout_for(route))
+        start = perf_counter()
+        failed = True
+        try:
+            response = await self.get_client().request(method, f"{endpoint.url}{path}", **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            self.record(endpoint, start, failed, route)
+
+    async def chat(self, payload, route='chat', affinity=None):
+        """POST a payload to /api/chat on an endpoint serving its model.
+
+        Images passed as raw bytes are base64 encoded while the body streams out.
+        """
+        payload.setdefault('keep_alive', OLLAMA_KEEP_ALIVE)
+        if has_raw_images(payload):
+            # An explicit length keeps httpx from switching to chunked encoding
+            content = JsonBody(payload)
+            body = {'content': content.aiter_chunks(), 'headers': {'Content-Length': str(len(content))}}
+        else:
+            body = {'json': payload}
+        with self.pool.lease(payload['model'], affinity) as endpoint:
+            return await self.request(endpoint, 'POST', '/api/chat', route, **body)
+
+    @asynccontextmanager
+    async def stream_chat(self, payload, route='chat', affinity=None):
+        """POST a streaming payload to /api/chat, yielding the open response"""
+        payload.setdefault('keep_alive', OLLAMA_KEEP_ALIVE)
+        with self.pool.lease(payload['model'], affinity) as endpoint:
+            self.guard(endpoint, route)
+            start = perf_counter()
+            failed = True
+            try:
+                async with self.get_client().stream(
+                    'POST', f"{endpoint.url}/api/chat", json=payload, timeout=self.timeout_for(route)
+                ) as response:
+                    failed = response.status_code >= 500
+                    try:
+                        yield response
+                    except Exception:
+                        failed = True
+                        raise
+            finally:
+                self.record(endpoint, start, failed, route)
+
+    async def warmup(self, models=OLLAMA_WARMUP_MODELS):
+        """Load models into memory so the first user request doesn't pay for it"""
+        for endpoint in self.pool.endpoints:
+            for model in models:
+                if not endpoint.serves(model):
+                    continue
+                try:
+                    response = await self.request(endpoint, 'POST', '/api/generate', 'warmup',
+                                                  json={"model": model, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE})
+                    if response.status_code == 200:
+                        logger.info(f"Warmed up {model} on {endpoint.url}")
+                    else:
+                        logger.warning(f"Warmup of {model} on {endpoint.url} failed: {response.status_code}")
+                except (httpx.HTTPError, CircuitOpen) as e:
+                    logger.warning(f"Warmup of {model} on {endpoint.url} failed: {e}")
+
+    async def version(self, endpoint):
+        """GET /api/version from one endpoint, used for health checks"""
+        return await self.request(endpoint, 'GET', '/api/version', 'health')
+
+    def get_stats(self):
+        """Snapshot of request counters"""
+        return dict(self.stats)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+async_ollama_client = AsyncOllamaClient()
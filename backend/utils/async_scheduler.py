@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from config import SCHEDULER_QUEUE_LIMIT, SCHEDULER_QUEUE_TIMEOUT
+from utils.scheduler import FairQueue, QueueFull, QueueTimeout, model_slots
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaScheduler:
+    """Async counterpart of OllamaScheduler for the ASGI app"""
+
+    def __init__(self, queue_limit=SCHEDULER_QUEUE_LIMIT, timeout=SCHEDULER_QUEUE_TIMEOUT):
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.queues = {}  # model -> FairQueue
+        self.cond = None
+        self.stats = {"scheduled": 0, "rejected": 0, "expired": 0, "total_wait": 0.0}
+
+    def get_cond(self):
+        """Create the condition lazily so it binds to the serving loop"""
+        if self.cond is None:
+            self.cond = asyncio.Condition()
+        return self.cond
+
+    def queue_for(self, model):
+        queue = self.queues.get(model)
+        if queue is None:
+            queue = self.queues[model] = FairQueue(model_slots(model))
+        return queue
+
+    @asynccontextmanager
+    async def slot(self, model, user, cost):
+        """Hold one of the model's generation slots, waiting for a fair turn"""
+        ticket = await self.acquire(model, user, cost)
+        try:
+            yield ticket
+        finally:
+            cond = self.get_cond()
+            async with cond:
+                queue = self.queues[model]
+                queue.release()
+                queue.dispatch()
+                cond.notify_all()
+
+    async def acquire(self, model, user, cost):
+        cond = self.get_cond()
+        async with cond:
+            queue = self.queue_for(model)
+            if len(queue.waiting) >= self.queue_limit:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"Too many requests waiting for {model}")
+            ticket = queue.enqueue(user, cost, self.timeout)
+            while True:
+                queue.dispatch()
+                cond.notify_all()
+                if ticket.granted:
+                    break
+                remaining = ticket.deadline - time.monotonic()
+                if ticket.expired or remaining <= 0:
+                    queue.withdraw(ticket)
+                    self.stats["expired"] += 1
+                    raise QueueTimeout(f"Request for {model} waited more than {self.timeout}s")
+                try:
+                    # Not wait_for: it can swallow a cancellation that arrives
+                    # just after the wait ended, leaving a cancelled task holding a slot
+                    async with asyncio.timeout(remaining):
+                        await cond.wait()
+                except TimeoutError:
+                    pass
+                except asyncio.CancelledError:
+                    # The client went away; give up the place in the queue
+                    queue.withdraw(ticket)
+                    if ticket.granted:
+                        queue.release()
+                        queue.dispatch()
+                        cond.notify_all()
+                    raise
+            self.stats["scheduled"] += 1
+            self.stats["total_wait"] += ticket.waited
+        if ticket.position:
+            logger.info(f"Scheduled {user} on {model} after {ticket.waited:.2f}s (position {ticket.position})")
+        return ticket
+
+    def metrics(self):
+        """Snapshot of queue lengths and counters"""
+        return {
+            "queues": {model: {"active": queue.active, "waiting": len(queue.waiting)}
+                       for model, queue in self.queues.items()},
+            **self.stats
+        }
+
+
+async_ollama_scheduler = AsyncOllamaScheduler()
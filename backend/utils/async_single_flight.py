@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from config import SINGLE_FLIGHT_ENABLED
+from utils.async_ollama_client import async_ollama_client
+from utils.async_scheduler import async_ollama_scheduler
+from utils.scheduler import request_cost
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFlight:
+    """State of one streamed generation shared by its subscribers"""
+
+    def __init__(self):
+        self.cond = asyncio.Condition()
+        self.lines = []          # Raw NDJSON lines received so far
+        self.status_code = None
+        self.error = None
+        self.done = False
+        self.subscribers = 0
+        self.queue = {}          # Queue stats of the scheduled generation
+
+
+class AsyncSharedStream:
+    """One subscriber's copy of a shared streamed response (status_code, aiter_lines)"""
+
+    def __init__(self, group, key, flight):
+        self.group = group
+        self.key = key
+        self.flight = flight
+
+    @property
+    def status_code(self):
+        return self.flight.status_code
+
+    @property
+    def queue(self):
+        return self.flight.queue
+
+    async def __aenter__(self):
+        flight = self.flight
+        async with flight.cond:
+            await flight.cond.wait_for(lambda: flight.status_code is not None or flight.done)
+        if flight.status_code is None and flight.error is not None:
+            self.group.leave(flight)
+            raise flight.error
+        return self
+
+    async def __aexit__(self, *exc):
+        self.group.leave(self.flight)
+
+    async def aiter_lines(self):
+        flight = self.flight
+        index = 0
+        while True:
+            async with flight.cond:
+                await flight.cond.wait_for(lambda: index < len(flight.lines) or flight.done)
+                lines = flight.lines[index:]
+                index = len(flight.lines)
+                finished = flight.done
+            for line in lines:
+                yield line
+            if finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+
+class AsyncSingleFlight:
+    """Async counterpart of SingleFlight for the ASGI app.
+
+    The upstream call runs as its own task, so a subscriber that disconnects
+    doesn't cancel the generation the other subscribers are waiting for.
+    """
+
+    def __init__(self, client=async_ollama_client):
+        self.client = client
+        self.calls = {}    # key -> Task of a pending non-streaming call
+        self.streams = {}  # key -> AsyncFlight of a pending streaming call
+        self.stats = {"calls": 0, "shared_calls": 0, "streams": 0, "shared_streams": 0, "abandoned_streams": 0}
+
+    async def chat(self, key, payload, route='chat', user=None, queue_info=None, affinity=None):
+        """Like AsyncOllamaClient.chat, sharing the response with identical concurrent calls"""
+        if not SINGLE_FLIGHT_ENABLED:
+            key = object()  # Never shared
+
+        task = self.calls.get(key)
+        if task is None:
+            task = self.calls[key] = asyncio.ensure_future(self.call(payload, route, user, affinity))
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+            self.stats["calls"] += 1
+        else:
+            self.stats["shared_calls"] += 1
+        response, queue = await asyncio.shield(task)
+        if queue_info is not None:
+            queue_info.update(queue)
+        return response
+
+    async def call(self, payload, route, user, affinity):
+        """One scheduled upstream call: (response, queue stats)"""
+        async with async_ollama_scheduler.slot(payload['model'], user, request_cost(payload)) as ticket:
+            return await self.client.chat(payload, route, affinity), ticket.info()
+
+    def stream_chat(self, key, payload, route='chat', user=None, affinity=None):
+        """Like AsyncOllamaClient.stream_chat, subscribing to a shared stream"""
+        if not SINGLE_FLIGHT_ENABLED:
+            key = object()  # Never shared
+
+        flight = self.streams.get(key)
+        if flight is None:
+            flight = self.streams[key] = AsyncFlight()
+            asyncio.ensure_future(self.produce(key, flight, payload, route, user, affinity))
+            self.stats["streams"] += 1
+        else:
+            self.stats["shared_streams"] += 1
+        flight.subscribers += 1
+        return AsyncSharedStream(self, key, flight)
+
+    async def produce(self, key, flight, payload, route, user, affinity):
+        """Read the upstream stream into the flight until it ends or nobody listens"""
+        try:
+            async with async_ollama_scheduler.slot(payload['model'], user, request_cost(payload)) as ticket:
+                flight.queue = ticket.info()
+                if self.abandoned(key, flight):
+                    return
+                async with self.client.stream_chat(payload, route, affinity) as response:
+                    async with flight.cond:
+                        flight.status_code = response.status_code
+                        flight.cond.notify_all()
+                    if response.status_code != 200:
+                        return
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        async with flight.cond:
+                            flight.lines.append(line)
+                            flight.cond.notify_all()
+                        if self.abandoned(key, flight):
+                            # Closing the response makes Ollama stop generating
+                            return
+        except Exception as e:
+            flight.error = e
+        finally:
+            self.forget(key, flight)
+            async with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def abandoned(self, key, flight):
+        """True, and the flight forgotten, once every subscriber has left"""
+        if flight.subscribers == 0:
+            self.stats["abandoned_streams"] += 1
+            self.forget(key, flight)
+            return True
+        return False
+
+    def forget(self, key, flight):
+        """Stop routing new subscribers to a flight"""
+        if self.streams.get(key) is flight:
+            del self.streams[key]
+
+    def leave(self, flight):
+        flight.subscribers -= 1
+
+    def metrics(self):
+        """Snapshot of coalescing counters"""
+        return {
+            "enabled": SINGLE_FLIGHT_ENABLED,
+            "in_flight": len(self.calls) + len(self.streams),
+            **self.stats
+        }
+
+
+async_single_flight = AsyncSingleFlight()
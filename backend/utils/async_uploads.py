@@ -0,0 +1,17 @@
+from quart import Request
+from quart.formparser import FormDataParser
+from utils.uploads import spooled_stream_factory
+
+
+class SpooledFormDataParser(FormDataParser):
+    """Quart form parser that spools file uploads like the Flask app"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('stream_factory', spooled_stream_factory)
+        super().__init__(*args, **kwargs)
+
+
+class UploadRequest(Request):
+    """Quart request whose file uploads are spooled at UPLOAD_SPOOL_BYTES"""
+
+    form_data_parser_class = SpooledFormDataParser
@@ -1,7 +1,115 @@
 from flask import request, jsonify
 import jwt
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-from config import JWT_SECRET
+from config import JWT_SECRET, JWT_CACHE_SIZE
+
+
+class TokenCache:
+    """Bounded LRU cache of verified tokens, keyed by token digest.
+
+    Entries expire exactly at the token's exp claim, so a cache hit never
+    accepts a token that jwt.decode would reject as expired. Revoked tokens
+    are remembered until their exp so they can't be re-verified either.
+    """
+
+    def __init__(self, max_size=JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # digest -> (user_id, exp)
+        self.revoked = {}             # digest -> exp
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, digest):
+        """Cached user id for a token digest, or None"""
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is not None:
+                if time.time() < entry[1]:
+                    self.entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry[0]
+                del self.entries[digest]
+            self.misses += 1
+            return None
+
+    def put(self, digest, user_id, exp):
+        """Cache a verified token; False, and nothing cached, if it was revoked.
+
+        Checking under the same lock as revoke() means a revocation that lands
+        after jwt.decode can't be overwritten by a stale cache entry.
+        """
+        with self.lock:
+            if digest in self.revoked:
+                return False
+            self.entries[digest] = (user_id, exp)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            return True
+
+    def is_revoked(self, digest):
+        with self.lock:
+            return digest in self.revoked
+
+    def revoke(self, digest, exp):
+        """Drop a token from the cache and reject it until it expires"""
+        now = time.time()
+        with self.lock:
+            self.entries.pop(digest, None)
+            self.revoked = {d: e for d, e in self.revoked.items() if e > now}
+            self.revoked[digest] = exp
+
+    def metrics(self):
+        """Snapshot of cache counters"""
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "revoked": len(self.revoked),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+token_cache = TokenCache()
+
+def decode_token(token):
+    """Verify a bearer token and return its user id"""
+    if token.startswith('Bearer '):
+        token = token[7:]
+    digest = TokenCache.digest(token)
+
+    user_id = token_cache.get(digest)
+    if user_id is not None:
+        return user_id
+
+    data = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+    if 'exp' in data:
+        accepted = token_cache.put(digest, data['user_id'], data['exp'])
+    else:
+        accepted = not token_cache.is_revoked(digest)
+    if not accepted:
+        raise jwt.InvalidTokenError('Token has been revoked')
+    return data['user_id']
+
+def revoke_token(token):
+    """Revocation hook: invalidate a token before its exp, e.g. on logout"""
+    if token.startswith('Bearer '):
+        token = token[7:]
+    try:
+        data = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return
+    # Tokens without exp never expire, so remember them for a year
+    token_cache.revoke(TokenCache.digest(token), data.get('exp', time.time() + 365 * 24 * 3600))
 
 def token_required(f):
     @wraps(f)
@@ -9,16 +117,55 @@ def token_required(f):
         token = request.headers.get('Authorization')
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
-        
+
         try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            data = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-            current_user_id = data['user_id']
+            current_user_id = decode_token(token)
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Token is invalid'}), 401
-        
+
         return f(current_user_id, *args, **kwargs)
-    return decorated
\ No newline at end of file
+    return decorated
+
+def token_optional(f):
+    """Like token_required, but callers without a token get current_user_id=None"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return f(None, *args, **kwargs)
+
+        try:
+            current_user_id = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            return jsonify({'error': 'Token has expired'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'error': 'Token is invalid'}), 401
+
+        return f(current_user_id, *args, **kwargs)
+    return decorated
+
+def normalize_conversation_id(conversation_id):
+    """Client-chosen conversation id, hashed when it wouldn't fit the VARCHAR(64) history columns"""
+    conversation_id = str(conversation_id)
+    if len(conversation_id) > 64:
+        return hashlib.sha256(conversation_id.encode('utf-8')).hexdigest()
+    return conversation_id
+
+def get_session_key(current_user_id):
+    """(user key, conversation id) identifying the caller's chat session"""
+    data = request.get_json(silent=True) or {}
+    conversation_id = (
+        data.get('conversation_id')
+        or request.form.get('conversation_id')
+        or request.args.get('conversation_id')
+        or request.headers.get('X-Conversation-Id')
+        or 'default'
+    )
+    if current_user_id is None:
+        # Anonymous callers are kept apart by client address
+        user_key = f"anonymous:{request.remote_addr}"
+    else:
+        user_key = f"user:{current_user_id}"
+    return user_key, normalize_conversation_id(conversation_id)
@@ -0,0 +1,237 @@
+import ast
+import decimal
+import math
+import operator
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+from config import (
+    CALC_MAX_LENGTH, CALC_MAX_OPERATIONS, CALC_MAX_EXPONENT, CALC_MAX_DIGITS, CALC_CACHE_SIZE
+)
+
+
+class CalculationError(Exception):
+    """The expression is invalid or exceeds a limit; the message is safe to show"""
+
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg
+}
+
+CONSTANTS = {
+    'pi': math.pi,
+    'e': math.e,
+    'tau': math.tau
+}
+
+
+def sqrt(x):
+    return x.sqrt() if isinstance(x, Decimal) else math.sqrt(x)
+
+
+def bounded_round(x, ndigits=None):
+    """round(), refusing ndigits large enough to make it build a huge power of ten"""
+    if ndigits is None:
+        return round(x)
+    if not isinstance(ndigits, int) and not (isinstance(ndigits, (Decimal, Fraction)) and ndigits == int(ndigits)):
+        raise CalculationError("round() needs a whole number of digits")
+    if abs(ndigits) > CALC_MAX_DIGITS:
+        raise CalculationError(f"round() can keep at most {CALC_MAX_DIGITS} digits")
+    return round(x, int(ndigits))
+
+
+def log(x, base=None):
+    if isinstance(x, Decimal) and base is None:
+        return x.ln()
+    return math.log(x) if base is None else math.log(x, base)
+
+
+# Exact for Decimal and Fraction arguments where the type allows it; the rest
+# work on floats
+FUNCTIONS = {
+    'sqrt': sqrt,
+    'log': log,
+    'ln': log,
+    'log10': math.log10,
+    'log2': math.log2,
+    'exp': math.exp,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'asin': math.asin,
+    'acos': math.acos,
+    'atan': math.atan,
+    'degrees': math.degrees,
+    'radians': math.radians,
+    'abs': abs,
+    'round': bounded_round,
+    'floor': math.floor,
+    'ceil': math.ceil,
+    'min': min,
+    'max': max
+}
+
+MODES = ('float', 'decimal', 'fraction')
+
+
+def digits(value):
+    """Approximate decimal digits of a number, counting a fraction's denominator"""
+    if isinstance(value, Fraction):
+        return max(digits(value.numerator), digits(value.denominator))
+    if isinstance(value, Decimal):
+        # Decimals can be far smaller than the smallest float
+        return float(abs(value).log10()) if value else 0.0
+    return math.log10(abs(value)) if value else 0.0
+
+
+@lru_cache(maxsize=CALC_CACHE_SIZE)
+def compile_expression(expression):
+    """Parse and validate an expression once; repeated expressions hit the cache"""
+    if len(expression) > CALC_MAX_LENGTH:
+        raise CalculationError(f"Expression is longer than {CALC_MAX_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        raise CalculationError("Invalid expression")
+
+    operations = 0
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call)):
+            operations += 1
+        if isinstance(node, ast.BinOp) and type(node.op) not in BINARY_OPERATORS:
+            raise CalculationError("Unsupported operator")
+        if isinstance(node, ast.UnaryOp) and type(node.op) not in UNARY_OPERATORS:
+            raise CalculationError("Unsupported operator")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise CalculationError("Unsupported function")
+        elif isinstance(node, ast.Name):
+            if node.id not in (FUNCTIONS if id(node) in called else CONSTANTS):
+                raise CalculationError(f"Unknown name '{node.id}'")
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise CalculationError("Only numbers are allowed")
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.operator,
+                                   ast.unaryop, ast.Load)):
+            raise CalculationError("Invalid expression")
+    if operations > CALC_MAX_OPERATIONS:
+        raise CalculationError(f"Expression has more than {CALC_MAX_OPERATIONS} operations")
+    return tree.body
+
+
+class Evaluator:
+    """Walks a validated expression tree with numbers of one kind.
+
+    'float' behaves like Python arithmetic, 'decimal' keeps decimal literals
+    exact (0.1 + 0.2 == 0.3) and 'fraction' keeps division exact (1/3).
+    Every intermediate result is checked against CALC_MAX_DIGITS, and powers
+    are estimated before they are computed, so no expression can run for
+    long or build a huge integer.
+    """
+
+    def __init__(self, mode='float'):
+        if mode not in MODES:
+            raise CalculationError(f"Unknown mode '{mode}'")
+        self.mode = mode
+
+    def number(self, value):
+        """A literal or intermediate result as this evaluator's kind of number"""
+        if self.mode == 'float' or not isinstance(value, (int, float)):
+            return value
+        if self.mode == 'decimal':
+            return Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+        return Fraction(repr(value)) if isinstance(value, float) else Fraction(value)
+
+    def check(self, value):
+        if isinstance(value, complex):
+            raise CalculationError("Result is not a real number")
+        if isinstance(value, (float, Decimal)) and not math.isfinite(value):
+            raise CalculationError("Result is too large")
+        if digits(value) > CALC_MAX_DIGITS:
+            raise CalculationError(f"Result has more than {CALC_MAX_DIGITS} digits")
+        return value
+
+    def evaluate(self, node):
+        if isinstance(node, ast.Constant):
+            return self.check(self.number(node.value))
+        if isinstance(node, ast.Name):
+            return self.check(self.number(CONSTANTS[node.id]))
+        if isinstance(node, ast.UnaryOp):
+            return self.check(UNARY_OPERATORS[type(node.op)](self.evaluate(node.operand)))
+        if isinstance(node, ast.Call):
+            args = [self.evaluate(arg) for arg in node.args]
+            return self.check(self.number(FUNCTIONS[node.func.id](*args)))
+        if isinstance(node, ast.BinOp):
+            left, right = self.evaluate(node.left), self.evaluate(node.right)
+            if isinstance(node.op, ast.Pow):
+                if abs(right) > CALC_MAX_EXPONENT:
+                    raise CalculationError(f"Exponent is larger than {CALC_MAX_EXPONENT}")
+                # A fraction's digits grow with either sign of the exponent;
+                # other numbers only get large for a positive one (10**-200 is fine)
+                exponent = float(right)
+                if digits(left) * (abs(exponent) if self.mode == 'fraction' else exponent) > CALC_MAX_DIGITS:
+                    raise CalculationError(f"Result has more than {CALC_MAX_DIGITS} digits")
+            return self.check(self.number(BINARY_OPERATORS[type(node.op)](left, right)))
+        raise CalculationError("Invalid expression")
+
+    def run(self, expression):
+        try:
+            # Enough precision that any integer within the digit limit stays exact
+            with decimal.localcontext() as context:
+                context.prec = max(CALC_MAX_DIGITS, decimal.DefaultContext.prec)
+                return self.evaluate(compile_expression(expression))
+        except CalculationError:
+            raise
+        except ZeroDivisionError:
+            raise CalculationError("Division by zero")
+        except OverflowError:
+            raise CalculationError("Result is too large")
+        except decimal.DecimalException as e:
+            raise CalculationError(decimal_message(e))
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise CalculationError(str(e) or "Calculation error")
+
+
+def decimal_message(error):
+    """Readable text for a trapped decimal signal instead of its class list"""
+    # The C implementation raises InvalidOperation listing the actual signals
+    signals = error.args[0] if error.args and isinstance(error.args[0], list) else [type(error)]
+    if any(issubclass(signal, decimal.Overflow) for signal in signals):
+        return "Result is too large"
+    if any(issubclass(signal, decimal.DivisionImpossible) for signal in signals):
+        return f"Result has more than {CALC_MAX_DIGITS} digits"
+    return "Invalid operation"
+
+
+def calculate(expression, mode='float'):
+    """Evaluate one expression, raising CalculationError"""
+    return Evaluator(mode).run(expression)
+
+
+def calculate_many(expressions, mode='float'):
+    """Evaluate a batch of expressions; each item is a result or a CalculationError"""
+    evaluator = Evaluator(mode)
+    results = []
+    for expression in expressions:
+        try:
+            results.append(evaluator.run(expression))
+        except CalculationError as e:
+            results.append(e)
+    return results
+
+
+def calculator_cache_stats():
+    """Hit/miss counters of the compiled expression cache"""
+    return compile_expression.cache_info()._asdict()
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, CIRCUIT_HALF_OPEN_PROBES
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    """Ollama is known to be down; the request was refused without trying"""
+
+
+class CircuitBreaker:
+    """Fails Ollama calls fast while the backend is unhealthy.
+
+    After failure_threshold consecutive failures the circuit opens and every
+    call is refused at once. After reset_timeout seconds it turns half-open
+    and lets a few probe calls through; the first success closes it again,
+    a failure reopens it. The health monitor can trip or reset it directly.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT,
+                 half_open_probes=CIRCUIT_HALF_OPEN_PROBES):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.lock = threading.Lock()
+        self.stats = {"rejected": 0, "opened": 0}
+
+    def available(self):
+        """Whether before_request would let a call through, without changing state"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.probes < self.half_open_probes
+
+    def before_request(self):
+        """Raise CircuitOpen unless a call may go through now"""
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probes = 0
+                logger.info("Ollama circuit half-open, probing")
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and self.probes < self.half_open_probes:
+                self.probes += 1
+                return
+            self.stats["rejected"] += 1
+        raise CircuitOpen("Ollama is unavailable")
+
+    def record_success(self):
+        with self.lock:
+            if self.state == OPEN:
+                # A call that started before the circuit opened; only probes close it
+                return
+            if self.state == HALF_OPEN:
+                logger.info("Ollama circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.open()
+
+    def reset(self):
+        """Close the circuit now, e.g. after a successful health check"""
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info("Ollama circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def trip(self):
+        """Open the circuit now, e.g. after a failed health check"""
+        with self.lock:
+            self.open()
+
+    def open(self):
+        """Switch to open; lock held"""
+        if self.state != OPEN:
+            logger.warning("Ollama circuit open, failing calls fast")
+            self.stats["opened"] += 1
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def metrics(self):
+        """Snapshot of the circuit state"""
+        with self.lock:
+            return {"state": self.state, "failures": self.failures, **self.stats}
+
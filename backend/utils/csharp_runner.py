@@ -0,0 +1,254 @@
+import hashlib
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from config import (
+    DOTNET_EXECUTABLE, CSHARP_WORK_DIR, CSHARP_WORKSPACES, CSHARP_CACHE_ENTRIES,
+    CSHARP_BUILD_TIMEOUT, CSHARP_RUN_TIMEOUT, CSHARP_QUEUE_TIMEOUT, CSHARP_RETRY_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+PROJECT_NAME = 'Snippet'
+
+# Keep the CLI from printing banners or phoning home on every call
+DOTNET_ENV = {**os.environ, 'DOTNET_CLI_TELEMETRY_OPTOUT': '1', 'DOTNET_NOLOGO': '1',
+              'DOTNET_SKIP_FIRST_TIME_EXPERIENCE': '1'}
+
+
+def wrap_code(code):
+    """Wrap a bare snippet in a Program class with a Main method"""
+    if 'class Program' in code or 'static void Main' in code:
+        return code
+    return f"""using System;
+
+class Program
+{{
+    static void Main()
+    {{
+        {code}
+    }}
+}}"""
+
+
+def build_errors(output):
+    """Compiler errors from dotnet build output, without paths and duplicates"""
+    errors = []
+    for line in output.splitlines():
+        if ': error ' not in line:
+            continue
+        location, message = line.strip().split(': error ', 1)
+        line = f"{os.path.basename(location)}: error {message.rsplit(' [', 1)[0]}"
+        if line not in errors:
+            errors.append(line)
+    return "\n".join(errors) or output.strip()
+
+
+class CSharpRunner:
+    """Builds and runs C# snippets in pre-restored .NET projects.
+
+    A few workspaces are created once with `dotnet new` and `dotnet restore`
+    and reused for every build, so a snippet only pays for compilation. The
+    compiled output is kept per source hash, and a snippet that was built
+    before just runs its cached assembly. Everything lives under
+    CSHARP_WORK_DIR and survives restarts.
+
+    Workspaces that can't be prepared, e.g. because the SDK is missing, are
+    tried again every CSHARP_RETRY_INTERVAL seconds. While none is usable,
+    builds fail at once instead of waiting for a free workspace.
+    """
+
+    def __init__(self, dotnet=DOTNET_EXECUTABLE, work_dir=CSHARP_WORK_DIR, workspaces=CSHARP_WORKSPACES,
+                 cache_entries=CSHARP_CACHE_ENTRIES):
+        self.dotnet = dotnet
+        self.work_dir = work_dir or os.path.join(tempfile.gettempdir(), 'agent_csharp')
+        self.cache_dir = os.path.join(self.work_dir, 'cache')
+        self.size = workspaces
+        self.cache_entries = cache_entries
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+        self.error = None  # Why the last workspace couldn't be prepared
+        self.failed = []  # Workspaces that couldn't be prepared
+        self.retrying = False
+        self.retry_at = 0.0
+        self.stats = {"runs": 0, "cache_hits": 0, "builds": 0, "build_errors": 0, "timeouts": 0, "busy": 0}
+
+    def start(self):
+        """Prepare the workspaces on a background thread; called at app startup or on first use"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+            self.retrying = True
+        paths = [os.path.join(self.work_dir, f"workspace_{n}") for n in range(self.size)]
+        threading.Thread(target=self.prepare_workspaces, args=(paths,), name='csharp-workspaces', daemon=True).start()
+
+    def retry_failed(self):
+        """Prepare failed workspaces again once CSHARP_RETRY_INTERVAL has passed"""
+        with self.lock:
+            if not self.failed or self.retrying or time.monotonic() < self.retry_at:
+                return
+            self.retrying = True
+            paths = list(self.failed)
+        threading.Thread(target=self.prepare_workspaces, args=(paths,), name='csharp-workspaces', daemon=True).start()
+
+    def prepare_workspaces(self, paths):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for path in paths:
+                try:
+                    self.prepare_workspace(path)
+                except (OSError, subprocess.SubprocessError) as e:
+                    logger.warning(f"Could not prepare C# workspace {path}: {e}")
+                    with self.lock:
+                        self.error = f"the .NET SDK is unavailable ({e})"
+                        if path not in self.failed:
+                            self.failed.append(path)
+                    continue
+                with self.lock:
+                    if path in self.failed:
+                        self.failed.remove(path)
+                self.idle.put(path)
+        finally:
+            with self.lock:
+                self.retrying = False
+                self.retry_at = time.monotonic() + CSHARP_RETRY_INTERVAL
+
+    def unavailable(self):
+        """True while every workspace has failed to prepare"""
+        with self.lock:
+            return len(self.failed) == self.size
+
+    def prepare_workspace(self, path):
+        """Create and restore a console project unless a previous run already did"""
+        if os.path.exists(os.path.join(path, 'obj', 'project.assets.json')):
+            return
+        shutil.rmtree(path, ignore_errors=True)
+        self.dotnet_cli(['new', 'console', '-n', PROJECT_NAME, '-o', path, '--no-restore', '--force'],
+                        CSHARP_BUILD_TIMEOUT, check=True)
+        self.dotnet_cli(['restore'], CSHARP_BUILD_TIMEOUT, cwd=path, check=True)
+        logger.info(f"Prepared C# workspace {path}")
+
+    def dotnet_cli(self, args, timeout, cwd=None, check=False):
+        return subprocess.run([self.dotnet, *args], cwd=cwd, env=DOTNET_ENV, capture_output=True,
+                              text=True, timeout=timeout, check=check)
+
+    def run(self, code):
+        """Build (or reuse) and run a snippet, returning the messages the tool always gave"""
+        self.start()
+        source = wrap_code(code)
+        key = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        output_dir = os.path.join(self.cache_dir, key)
+        assembly = os.path.join(output_dir, f"{PROJECT_NAME}.dll")
+
+        try:
+            for _ in range(2):
+                if os.path.exists(assembly):
+                    with self.lock:
+                        self.stats["cache_hits"] += 1
+                else:
+                    error = self.build(source, output_dir)
+                    if error:
+                        return error
+                try:
+                    os.utime(output_dir)  # Most recently used, for eviction
+                    break
+                except FileNotFoundError:
+                    # Evicted since the check above; build it again
+                    continue
+            else:
+                return "C# Error: the compiled snippet was evicted, please try again"
+
+            result = self.dotnet_cli([assembly], CSHARP_RUN_TIMEOUT)
+            with self.lock:
+                self.stats["runs"] += 1
+
+            if result.returncode == 0:
+                return result.stdout.strip() if result.stdout.strip() else "C# executed successfully"
+            return f"C# Error: {result.stderr.strip()}"
+
+        except subprocess.TimeoutExpired:
+            with self.lock:
+                self.stats["timeouts"] += 1
+            return "C# execution timeout"
+        except Exception as e:
+            return f"C# Error: {str(e)}"
+
+    def build(self, source, output_dir):
+        """Compile source into output_dir on a free workspace; an error message on failure"""
+        workspace = self.acquire_workspace()
+        if workspace is None:
+            if self.unavailable():
+                return f"C# Error: {self.error}"
+            with self.lock:
+                self.stats["busy"] += 1
+            return "C# Error: no C# workspace is free, please try again"
+
+        # Build into a scratch directory and move it into place, so a
+        # concurrent run of the same snippet never sees a half-written output
+        scratch = f"{output_dir}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(os.path.join(workspace, 'Program.cs'), 'w', encoding='utf-8') as f:
+                f.write(source)
+            result = self.dotnet_cli(['build', '--no-restore', '-nologo', '-v', 'q', '-c', 'Release', '-o', scratch],
+                                     CSHARP_BUILD_TIMEOUT, cwd=workspace)
+        except subprocess.TimeoutExpired:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+        finally:
+            self.idle.put(workspace)
+
+        with self.lock:
+            self.stats["builds"] += 1
+            if result.returncode != 0:
+                self.stats["build_errors"] += 1
+        if result.returncode != 0:
+            shutil.rmtree(scratch, ignore_errors=True)
+            return f"C# Error: {build_errors(result.stdout + result.stderr)}"
+
+        try:
+            os.replace(scratch, output_dir)
+        except OSError:
+            # Another request built the same snippet first
+            shutil.rmtree(scratch, ignore_errors=True)
+        self.evict()
+        return None
+
+    def acquire_workspace(self):
+        """A free workspace, or None after CSHARP_QUEUE_TIMEOUT or as soon as none can be prepared"""
+        self.retry_failed()
+        deadline = time.monotonic() + CSHARP_QUEUE_TIMEOUT
+        while not self.unavailable():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                # Wake up now and then to notice workspaces failing to prepare
+                return self.idle.get(timeout=min(remaining, 1))
+            except queue.Empty:
+                continue
+        return None
+
+    def evict(self):
+        """Remove the least recently used builds past cache_entries"""
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_dir() and '.' not in entry.name]
+        except OSError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:max(len(entries) - self.cache_entries, 0)]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def metrics(self):
+        """Snapshot of runner counters"""
+        with self.lock:
+            return {"workspaces": self.size, "idle": self.idle.qsize(), "failed": len(self.failed), **self.stats}
+
+
+csharp_runner = CSharpRunner()
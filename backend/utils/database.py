@@ -1,7 +1,11 @@
 import mysql.connector
 from mysql.connector import Error
+import collections
 import logging
-from config import DB_CONFIG
+import threading
+import time
+from contextlib import contextmanager
+from config import DB_CONFIG, DB_POOL_MAX_SIZE, DB_POOL_CHECKOUT_TIMEOUT, DB_POOL_PING_INTERVAL
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +22,139 @@ def test_db_connection():
 # Add this before app.run()
 test_db_connection()
 
+
+class PoolTimeout(Exception):
+    """No connection became free within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Bounded MySQL connection pool with health checks and metrics"""
+
+    def __init__(self, config=DB_CONFIG, max_size=DB_POOL_MAX_SIZE,
+                 checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT, ping_interval=DB_POOL_PING_INTERVAL):
+        self.config = config
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+        self.idle = collections.deque()  # (connection, returned_at), most recent last
+        self.size = 0                    # Open connections, idle or in use
+        self.in_use = 0
+        self.waiters = 0
+        self.cond = threading.Condition()
+        self.stats = {"checkouts": 0, "timeouts": 0, "discarded": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+    def acquire(self, timeout=None):
+        """Check out a connection, opening one if the pool has room"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        connection, returned_at = None, None
+
+        with self.cond:
+            self.waiters += 1
+            try:
+                while True:
+                    if self.idle:
+                        connection, returned_at = self.idle.pop()
+                        break
+                    if self.size < self.max_size:
+                        self.size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection free after {timeout}s")
+                    self.cond.wait(remaining)
+            finally:
+                self.waiters -= 1
+            self.in_use += 1
+
+        # Connecting and pinging happen outside the lock
+        try:
+            if connection is not None and time.monotonic() - returned_at > self.ping_interval:
+                if not connection.is_connected():
+                    self.close_quietly(connection)
+                    connection = None
+                    with self.cond:
+                        self.stats["discarded"] += 1
+            if connection is None:
+                connection = mysql.connector.connect(**self.config)
+        except Exception:
+            with self.cond:
+                self.size -= 1
+                self.in_use -= 1
+                self.cond.notify()
+            raise
+
+        wait = time.monotonic() - start
+        with self.cond:
+            self.stats["checkouts"] += 1
+            self.stats["total_wait"] += wait
+            self.stats["max_wait"] = max(self.stats["max_wait"], wait)
+        return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection, rolling back anything left uncommitted"""
+        if not discard:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+
+        with self.cond:
+            self.in_use -= 1
+            if discard:
+                self.size -= 1
+                self.stats["discarded"] += 1
+            else:
+                self.idle.append((connection, time.monotonic()))
+            self.cond.notify()
+
+        if discard:
+            self.close_quietly(connection)
+
+    def metrics(self):
+        """Snapshot of pool usage"""
+        with self.cond:
+            checkouts = self.stats["checkouts"]
+            return {
+                "size": self.size,
+                "max_size": self.max_size,
+                "in_use": self.in_use,
+                "idle": len(self.idle),
+                "waiters": self.waiters,
+                "checkouts": checkouts,
+                "timeouts": self.stats["timeouts"],
+                "discarded": self.stats["discarded"],
+                "avg_wait": round(self.stats["total_wait"] / checkouts, 4) if checkouts else 0.0,
+                "max_wait": round(self.stats["max_wait"], 4)
+            }
+
+    @staticmethod
+    def close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+db_pool = ConnectionPool()
+
+@contextmanager
 def get_db_connection():
-    """Get database connection"""
+    """Check out a pooled database connection, or None if unavailable"""
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
+        connection = db_pool.acquire()
+    except (Error, PoolTimeout) as e:
         logger.error(f"Database connection error: {e}")
-        return None
\ No newline at end of file
+        yield None
+        return
+
+    discard = False
+    try:
+        yield connection
+    except Error:
+        discard = True
+        raise
+    finally:
+        db_pool.release(connection, discard)
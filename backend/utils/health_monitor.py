@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from time import perf_counter
+import requests
+from config import HEALTH_CHECK_INTERVAL, HEALTH_RETRY_INTERVAL, HEALTH_FAILURE_THRESHOLD
+from utils.ollama_client import ollama_client
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Checks every Ollama endpoint on a background thread and caches the result.
+
+    /health answers from the cached status instead of calling Ollama on every
+    probe. Each check also drives the endpoint's circuit breaker: a run of
+    failure_threshold failed checks trips it, ejecting the endpoint from
+    routing, and a successful one closes it, so requests stop waiting on a
+    dead backend without one slow check ejecting a live one, and return to it
+    as soon as it is back.
+    """
+
+    def __init__(self, client=ollama_client, interval=HEALTH_CHECK_INTERVAL,
+                 retry_interval=HEALTH_RETRY_INTERVAL, failure_threshold=HEALTH_FAILURE_THRESHOLD):
+        self.client = client
+        self.interval = interval
+        self.retry_interval = retry_interval  # Shorter, while an endpoint is down
+        self.failure_threshold = failure_threshold
+        self.failures = {}  # endpoint url -> consecutive failed checks
+        self.status = {"ollama": "unknown", "checked_at": None, "endpoints": {}}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='ollama-health', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while True:
+            healthy = self.check()
+            if self.stop_event.wait(self.interval if healthy else self.retry_interval):
+                return
+
+    def check(self):
+        """Probe every endpoint once and record the outcomes; True if all are up"""
+        endpoints = {}
+        for endpoint in self.client.pool.endpoints:
+            start = perf_counter()
+            try:
+                healthy = self.client.version(endpoint).status_code == 200
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"Health check of {endpoint.url} failed: {e}")
+                healthy = False
+
+            if healthy:
+                self.failures[endpoint.url] = 0
+                endpoint.breaker.reset()
+            else:
+                self.failures[endpoint.url] = self.failures.get(endpoint.url, 0) + 1
+                if self.failures[endpoint.url] >= self.failure_threshold:
+                    endpoint.breaker.trip()
+
+            endpoints[endpoint.url] = {
+                "status": "connected" if healthy else "disconnected",
+                "latency": round(perf_counter() - start, 3)
+            }
+
+        with self.lock:
+            for url, result in endpoints.items():
+                previous = self.status["endpoints"].get(url, {}).get("status")
+                if previous != result["status"]:
+                    logger.info(f"Ollama at {url} is {'up' if result['status'] == 'connected' else 'down'}")
+            self.status = {
+                "ollama": "connected" if any(r["status"] == "connected" for r in endpoints.values()) else "disconnected",
+                "checked_at": time.time(),
+                "endpoints": endpoints
+            }
+        return all(r["status"] == "connected" for r in endpoints.values())
+
+    def snapshot(self):
+        """Last known status, with the current circuit state of each endpoint"""
+        with self.lock:
+            status = dict(self.status)
+            endpoints = dict(status["endpoints"])
+        for endpoint in self.client.pool.endpoints:
+            endpoints[endpoint.url] = {**endpoints.get(endpoint.url, {}), "circuit": endpoint.breaker.state}
+        status["endpoints"] = endpoints
+        return status
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,263 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from config import HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL, HISTORY_QUEUE_LIMIT, HISTORY_LOAD_LIMIT
+from utils.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS Conversations (
+        user_key VARCHAR(64) NOT NULL,
+        conversation_id VARCHAR(64) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_key, conversation_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS Messages (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        user_key VARCHAR(64) NOT NULL,
+        conversation_id VARCHAR(64) NOT NULL,
+        role VARCHAR(16) NOT NULL,
+        content MEDIUMTEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_messages_conversation (user_key, conversation_id, id)
+    )"""
+]
+
+
+class HistoryWriter:
+    """Write-behind persistence of chat messages.
+
+    Chat turns only enqueue their messages; a background thread writes them
+    from all sessions as multi-row inserts once a batch fills up or the flush
+    interval passes. The queue is bounded so a slow database drops history
+    rather than stalling responses, and pending writes are flushed at exit.
+
+    Until the writer has processed them, queued messages and clears are also
+    tracked per conversation, so load_history returns what the database will
+    hold rather than what it holds right now.
+    """
+
+    def __init__(self, batch_size=HISTORY_BATCH_SIZE, flush_interval=HISTORY_FLUSH_INTERVAL,
+                 queue_limit=HISTORY_QUEUE_LIMIT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_limit)
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.schema_ready = False
+        self.lock = threading.Lock()     # Guards pending, seq and stats
+        self.io_lock = threading.Lock()  # Makes a write and its pending update atomic for load_history
+        self.pending = {}  # (user_key, conversation_id) -> {"clear": seq or None, "messages": deque}
+        self.seq = 0
+        self.stats = {"written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def start(self):
+        """Start the writer thread once"""
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='history-writer', daemon=True)
+                self.thread.start()
+                atexit.register(self.stop)
+
+    def enqueue_message(self, user_key, conversation_id, role, content):
+        """Queue a message for persistence without blocking"""
+        self.put('message', (user_key, conversation_id, role, content))
+
+    def enqueue_clear(self, user_key, conversation_id):
+        """Queue deletion of a conversation, after any of its pending messages"""
+        self.put('clear', (user_key, conversation_id))
+
+    def put(self, kind, args):
+        self.start()
+        key = args[:2]
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+            entry = self.pending.setdefault(key, {"clear": None, "messages": deque()})
+            if kind == 'clear':
+                previous = (entry["clear"], entry["messages"])
+                entry["clear"], entry["messages"] = seq, deque()
+            else:
+                entry["messages"].append((seq, {"role": args[2], "content": args[3]}))
+            try:
+                self.queue.put_nowait((kind, seq, args))
+            except queue.Full:
+                if kind == 'clear':
+                    entry["clear"], entry["messages"] = previous
+                else:
+                    entry["messages"].pop()
+                self.forget(key)
+                self.stats["dropped"] += 1
+                logger.warning("History queue full, dropping write")
+
+    def forget(self, key):
+        """Drop a conversation's pending entry once nothing is left in it; lock held"""
+        entry = self.pending.get(key)
+        if entry and entry["clear"] is None and not entry["messages"]:
+            del self.pending[key]
+
+    def processed(self, kind, seq, key):
+        """Remove a queue item the writer has handled from the pending record"""
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                return
+            if kind == 'clear':
+                if entry["clear"] == seq:
+                    entry["clear"] = None
+            else:
+                messages = entry["messages"]
+                while messages and messages[0][0] <= seq:
+                    messages.popleft()
+            self.forget(key)
+
+    def run(self):
+        while not (self.stopping.is_set() and self.queue.empty()):
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    kind, seq, args = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if kind == 'clear':
+                    # Keep ordering: write what we have, then delete
+                    self.write_batch(batch)
+                    batch = []
+                    with self.io_lock:
+                        self.delete_conversation(*args)
+                        self.processed('clear', seq, args)
+                else:
+                    batch.append((seq, args))
+            self.write_batch(batch)
+
+    def write_batch(self, batch):
+        """Write queued (seq, message) items as multi-row inserts.
+
+        If the batch fails, its rows are retried one by one, so a single bad
+        row only loses itself rather than every session's messages with it.
+        """
+        if not batch:
+            return
+        rows = [args for _, args in batch]
+        with self.io_lock:
+            try:
+                self.insert(rows)
+                written, failed = len(rows), 0
+            except Exception as e:
+                logger.error(f"History batch write error, retrying rows one by one: {e}")
+                written = failed = 0
+                for row in rows:
+                    try:
+                        self.insert([row])
+                        written += 1
+                    except Exception as e:
+                        failed += 1
+                        logger.error(f"History write error: {e}")
+            for seq, args in batch:
+                self.processed('message', seq, args[:2])
+        with self.lock:
+            self.stats["written"] += written
+            self.stats["failed"] += failed
+            self.stats["batches"] += 1
+
+    def insert(self, rows):
+        with get_db_connection() as connection:
+            if not connection:
+                raise RuntimeError("Database connection failed")
+            cursor = connection.cursor()
+            self.ensure_schema(cursor)
+            conversations = sorted({(user_key, conversation_id) for user_key, conversation_id, _, _ in rows})
+            # executemany rewrites these into single multi-row INSERTs
+            cursor.executemany(
+                "INSERT IGNORE INTO Conversations (user_key, conversation_id) VALUES (%s, %s)",
+                conversations
+            )
+            cursor.executemany(
+                "INSERT INTO Messages (user_key, conversation_id, role, content) VALUES (%s, %s, %s, %s)",
+                rows
+            )
+            connection.commit()
+            cursor.close()
+
+    def delete_conversation(self, user_key, conversation_id):
+        try:
+            with get_db_connection() as connection:
+                if not connection:
+                    raise RuntimeError("Database connection failed")
+                cursor = connection.cursor()
+                self.ensure_schema(cursor)
+                cursor.execute(
+                    "DELETE FROM Messages WHERE user_key = %s AND conversation_id = %s",
+                    (user_key, conversation_id)
+                )
+                cursor.execute(
+                    "DELETE FROM Conversations WHERE user_key = %s AND conversation_id = %s",
+                    (user_key, conversation_id)
+                )
+                connection.commit()
+                cursor.close()
+        except Exception as e:
+            logger.error(f"History delete error: {e}")
+
+    def ensure_schema(self, cursor):
+        if not self.schema_ready:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            self.schema_ready = True
+
+    def load_history(self, user_key, conversation_id, limit=HISTORY_LOAD_LIMIT):
+        """Most recent messages of a conversation, oldest first.
+
+        Includes messages still waiting in the queue, and ignores stored rows
+        that a queued clear is about to delete.
+        """
+        key = (user_key, conversation_id)
+        # Holding io_lock keeps the writer from moving items out of pending
+        # between the read and the snapshot, which would drop or duplicate them
+        with self.io_lock:
+            with self.lock:
+                entry = self.pending.get(key)
+                cleared = entry is not None and entry["clear"] is not None
+            history = [] if cleared else self.read_history(user_key, conversation_id, limit)
+            with self.lock:
+                entry = self.pending.get(key)
+                queued = [message for _, message in entry["messages"]] if entry else []
+        return (history + queued)[-limit:]
+
+    def read_history(self, user_key, conversation_id, limit):
+        with get_db_connection() as connection:
+            if not connection:
+                return []
+            cursor = connection.cursor(buffered=True)
+            self.ensure_schema(cursor)
+            cursor.execute(
+                "SELECT role, content FROM Messages WHERE user_key = %s AND conversation_id = %s "
+                "ORDER BY id DESC LIMIT %s",
+                (user_key, conversation_id, limit)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def stop(self, timeout=10):
+        """Flush everything still queued and stop the writer thread"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def metrics(self):
+        """Snapshot of writer counters"""
+        with self.lock:
+            return dict(self.stats, queued=self.queue.qsize())
+
+
+history_writer = HistoryWriter()
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import IMAGE_CACHE_ENABLED, IMAGE_CACHE_PATH, IMAGE_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+def image_key(model, image, prompt):
+    """Digest of the model, the preprocessed image and the normalized prompt.
+
+    Hashing the preprocessed image rather than the upload means re-saved or
+    re-sized copies of the same picture usually share an entry. The prompt is
+    lowercased and its whitespace collapsed.
+    """
+    digest = hashlib.sha256()
+    for part in (model, ' '.join(prompt.lower().split())):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(image)
+    return digest.hexdigest()
+
+
+class ImageAnalysisCache:
+    """Raw vision model answers stored in SQLite, bounded by total size.
+
+    Entries are evicted least recently used first once the stored responses
+    exceed max_bytes. The file survives restarts.
+    """
+
+    def __init__(self, path=IMAGE_CACHE_PATH, max_bytes=IMAGE_CACHE_MAX_BYTES, enabled=IMAGE_CACHE_ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.db = None
+        self.opened = False
+        self.bytes = 0
+
+    def connect(self):
+        """Open the SQLite file on first use rather than at import; lock held"""
+        if self.opened or not self.enabled:
+            return self.db
+        self.opened = True
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses "
+                "(cache_key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS analyses_last_used ON analyses (last_used)")
+            self.db.commit()
+            self.bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Image cache unavailable: {e}")
+            self.db = None
+        return self.db
+
+    def get(self, key):
+        """Cached raw response for a key, or None"""
+        with self.lock:
+            if self.connect() is None:
+                return None
+            try:
+                row = self.db.execute("SELECT response FROM analyses WHERE cache_key = ?", (key,)).fetchone()
+                if row is None:
+                    self.stats["misses"] += 1
+                    return None
+                self.db.execute("UPDATE analyses SET last_used = ? WHERE cache_key = ?", (time.time(), key))
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Image cache read failed: {e}")
+                return None
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key, response):
+        size = len(response.encode('utf-8'))
+        with self.lock:
+            if self.connect() is None:
+                return
+            try:
+                old = self.db.execute("SELECT size FROM analyses WHERE cache_key = ?", (key,)).fetchone()
+                self.db.execute(
+                    "INSERT OR REPLACE INTO analyses (cache_key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, response, size, time.time())
+                )
+                self.bytes += size - (old[0] if old else 0)
+                self.stats["stores"] += 1
+                self.evict()
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Image cache write failed: {e}")
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes; lock held"""
+        while self.bytes > self.max_bytes:
+            rows = self.db.execute(
+                "SELECT cache_key, size FROM analyses ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self.bytes = 0
+                return
+            for cache_key, size in rows:
+                if self.bytes <= self.max_bytes:
+                    return
+                self.db.execute("DELETE FROM analyses WHERE cache_key = ?", (cache_key,))
+                self.bytes -= size
+                self.stats["evictions"] += 1
+
+    def metrics(self):
+        """Snapshot of cache counters"""
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                "enabled": self.enabled and (self.db is not None or not self.opened),
+                "bytes": self.bytes,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+                **self.stats
+            }
+
+
+image_cache = ImageAnalysisCache()
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import threading
+from PIL import Image, ImageOps
+from config import (
+    IMAGE_MAX_BYTES, IMAGE_MAX_PIXELS, IMAGE_TARGET_SIZE, IMAGE_JPEG_QUALITY,
+    IMAGE_WORKERS, IMAGE_QUEUE_LIMIT, IMAGE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ImageRejected(Exception):
+    """The upload isn't an image we can use; the message is safe to show"""
+
+
+class ImageBusy(Exception):
+    """The preprocessing queue is full; the caller should retry later"""
+
+
+def upload_size(upload):
+    """Size in bytes of a seekable upload stream, rewound to the start"""
+    upload.seek(0, io.SEEK_END)
+    size = upload.tell()
+    upload.seek(0)
+    return size
+
+
+def prepare_image(upload):
+    """Decode an upload once and return it as a compact JPEG for the vision model.
+
+    The upload is read straight from its (spooled) stream, never copied into
+    a bytes object. The image is turned upright according to its EXIF
+    orientation, scaled so its longest side is at most IMAGE_TARGET_SIZE
+    (llava resizes to that anyway) and re-encoded. For JPEGs the decoder
+    already scales down while reading, so large photos never get decoded at
+    full size.
+    """
+    if upload_size(upload) > IMAGE_MAX_BYTES:
+        raise ImageRejected(f"Image is larger than {IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+    try:
+        image = Image.open(upload)
+        if image.width * image.height > IMAGE_MAX_PIXELS:
+            raise ImageRejected("Image dimensions are too large")
+        image.draft('RGB', (IMAGE_TARGET_SIZE, IMAGE_TARGET_SIZE))
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+            # Flatten transparency onto white rather than black
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((IMAGE_TARGET_SIZE, IMAGE_TARGET_SIZE), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True)
+    except ImageRejected:
+        raise
+    except Exception as e:
+        # Truncated or malformed files surface from Pillow's decoders as all
+        # sorts of errors (SyntaxError, EOFError, struct.error, IndexError...)
+        logger.info(f"Rejected image upload: {e}")
+        raise ImageRejected("Invalid image format")
+    return output.getvalue()
+
+
+class ImagePreprocessor:
+    """Runs image preparation on a small dedicated pool with a bounded queue.
+
+    Pillow releases the GIL while decoding and resizing, so the work doesn't
+    stall request threads or the event loop, and the queue limit caps how
+    many decoded images are held in memory at once.
+    """
+
+    def __init__(self, workers=IMAGE_WORKERS, queue_limit=IMAGE_QUEUE_LIMIT, timeout=IMAGE_TIMEOUT):
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+        self.slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.lock = threading.Lock()
+        self.stats = {"processed": 0, "rejected": 0, "busy": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def prepare_future(self, upload):
+        """Queue an upload for prepare_image, raising ImageBusy when the queue is full"""
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.stats["busy"] += 1
+            raise ImageBusy("Image preprocessing queue is full")
+        future = self.executor.submit(self.run, upload)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def prepare(self, upload):
+        """Blocking prepare_image on the pool; concurrent.futures.TimeoutError past the timeout"""
+        return self.prepare_future(upload).result(timeout=self.timeout)
+
+    def run(self, upload):
+        try:
+            size = upload_size(upload)
+            prepared = prepare_image(upload)
+        except ImageRejected:
+            with self.lock:
+                self.stats["rejected"] += 1
+            raise
+        with self.lock:
+            self.stats["processed"] += 1
+            self.stats["bytes_in"] += size
+            self.stats["bytes_out"] += len(prepared)
+        return prepared
+
+    def metrics(self):
+        """Snapshot of preprocessing counters"""
+        with self.lock:
+            return dict(self.stats)
+
+
+image_preprocessor = ImagePreprocessor()
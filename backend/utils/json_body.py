@@ -0,0 +1,68 @@
+import base64
+import json
+import secrets
+
+CHUNK_SIZE = 48 * 1024  # A multiple of 3, so chunks base64 encode without padding
+
+
+def has_raw_images(payload):
+    """True if any message carries images as bytes rather than base64 text"""
+    return any(
+        isinstance(image, (bytes, bytearray))
+        for message in payload.get('messages', [])
+        for image in message.get('images', [])
+    )
+
+
+class JsonBody:
+    """A chat payload serialized to JSON while it is sent.
+
+    Images given as raw bytes are base64 encoded chunk by chunk as the body is
+    read, so neither the encoded image nor the full JSON document is ever held
+    in memory. The length is known up front, so the request still goes out
+    with a Content-Length, and the body can be iterated again if a connection
+    failure makes the client retry.
+    """
+
+    def __init__(self, payload):
+        marker = secrets.token_hex(8)
+        images = []
+
+        def placeholder(image):
+            if isinstance(image, (bytes, bytearray)):
+                images.append(image)
+                return f"{marker}:{len(images) - 1}"
+            return image
+
+        messages = [
+            {**message, 'images': [placeholder(image) for image in message['images']]}
+            if message.get('images') else message
+            for message in payload.get('messages', [])
+        ]
+        text = json.dumps({**payload, 'messages': messages})
+
+        # Alternate JSON text and raw images, in body order
+        self.parts = []
+        for n, image in enumerate(images):
+            before, text = text.split(f"{marker}:{n}", 1)
+            self.parts += [before.encode('utf-8'), image]
+        self.parts.append(text.encode('utf-8'))
+
+    def __len__(self):
+        return sum(
+            len(part) if n % 2 == 0 else 4 * -(-len(part) // 3)
+            for n, part in enumerate(self.parts)
+        )
+
+    def __iter__(self):
+        for n, part in enumerate(self.parts):
+            if n % 2 == 0:
+                yield part
+            else:
+                for offset in range(0, len(part), CHUNK_SIZE):
+                    yield base64.b64encode(part[offset:offset + CHUNK_SIZE])
+
+    async def aiter_chunks(self):
+        """The body as an async iterator, which httpx.AsyncClient requires"""
+        for chunk in self:
+            yield chunk
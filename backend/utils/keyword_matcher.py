@@ -0,0 +1,120 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+# Categories whose keywords only count as whole words, so 'c', 'r' and 'go'
+# don't match inside unrelated words. A trailing digit is still allowed
+# ('python3', 'c99'). Keywords of two characters or less are always whole words.
+WHOLE_WORD_CATEGORIES = {'language', 'topic'}
+
+KEYWORDS = {
+    # Question types, checked in this order by classify_question_type
+    'debugging': ["error", "exception", "bug", "not working", "broken", "crash"],
+    'tutorial': ["how to", "how do i", "how can i", "tutorial", "guide"],
+    'advice': ["best", "better", "optimize", "improve", "recommend"],
+    'explanation': ["explain", "what does", "analyze", "review"],
+    'comparison': ["vs", "versus", "compare", "difference"],
+    'setup': ["install", "setup", "configure", "environment"],
+
+    'language': [
+        'python', 'javascript', 'java', 'c#', 'csharp', 'c++', 'cpp', 'c',
+        'php', 'ruby', 'go', 'rust', 'swift', 'kotlin', 'scala', 'r',
+        'html', 'css', 'sql', 'typescript', 'dart', 'perl', 'bash', 'shell'
+    ],
+    'beginner': [
+        'beginner', 'new to', 'learning', 'just started', 'first time',
+        'basics', 'simple', 'easy way', 'tutorial', 'guide'
+    ],
+    'advanced': [
+        'optimization', 'performance', 'architecture', 'design pattern',
+        'algorithm complexity', 'scalability', 'refactor', 'enterprise'
+    ],
+    'topic': [
+        'react', 'angular', 'vue', 'nodejs', 'express', 'django', 'flask',
+        'spring', 'hibernate', 'mongodb', 'mysql', 'postgresql', 'redis',
+        'docker', 'kubernetes', 'aws', 'azure', 'git', 'machine learning',
+        'ai', 'web development', 'mobile development', 'game development'
+    ],
+    'error': ['error', 'exception', 'traceback'],
+    'agentic': [
+        'search for', 'find files', 'read file', 'calculate', 'help me with', 'can you',
+        'what can you do', 'system info', 'capabilities', 'execute', 'run this'
+    ],
+}
+
+QUESTION_TYPES = ['debugging', 'tutorial', 'advice', 'explanation', 'comparison', 'setup']
+
+LANGUAGE_ALIASES = {'c#': 'csharp', 'c++': 'cpp'}
+
+
+def build_trie_pattern(words):
+    """Regex alternation factored as a prefix trie, longest match first.
+
+    At every text position the regex engine follows one branch per character
+    instead of trying each keyword in turn, so matching cost grows with the
+    text length rather than with the number of keywords.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def render(node):
+        end = '' in node
+        branches = [re.escape(char) + render(child)
+                    for char, child in sorted(node.items(), key=lambda item: item[0]) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            body = '(?:' + body + ')?'
+        return body
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """Finds keywords from several categories in a single pass over a text"""
+
+    def __init__(self, categories: Dict[str, Iterable[str]] = KEYWORDS):
+        self.categories = defaultdict(set)  # keyword -> categories it belongs to
+        self.whole_word = set()
+        for category, words in categories.items():
+            for word in words:
+                self.categories[word].add(category)
+                if category in WHOLE_WORD_CATEGORIES or len(word) <= 2:
+                    self.whole_word.add(word)
+        # The lookahead reports a match at every position, so overlapping
+        # keywords ('machine learning' and 'learning') are all found. Only
+        # the longest keyword is reported at a position, so the shorter ones
+        # it starts with ('c' in 'c#') are checked from it.
+        self.pattern = re.compile('(?=(' + build_trie_pattern(self.categories) + '))')
+        self.prefixes = {word: [other for other in self.categories if other != word and word.startswith(other)]
+                         for word in self.categories}
+
+    def find(self, text: str) -> Dict[str, Set[str]]:
+        """Map each category to the keywords of it found in text"""
+        text = text.lower()
+        hits = defaultdict(set)
+        for match in self.pattern.finditer(text):
+            start = match.start(1)
+            longest = match.group(1)
+            for word in [longest] + self.prefixes[longest]:
+                if word in self.whole_word and not self.is_whole_word(text, start, start + len(word)):
+                    continue
+                for category in self.categories[word]:
+                    hits[category].add(word)
+        return hits
+
+    @staticmethod
+    def is_whole_word(text, start, end):
+        if start > 0 and text[start - 1].isalnum():
+            return False
+        if end < len(text) and text[end].isalpha():
+            return False
+        return True
+
+
+keyword_matcher = KeywordMatcher()
@@ -0,0 +1,164 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import logging
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from utils.circuit_breaker import CircuitOpen
+from utils.json_body import JsonBody, has_raw_images
+from utils.ollama_endpoints import endpoint_pool
+from config import (
+    OLLAMA_POOL_CONNECTIONS, OLLAMA_POOL_MAXSIZE,
+    OLLAMA_MAX_RETRIES, OLLAMA_RETRY_BACKOFF, OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUTS,
+    OLLAMA_KEEP_ALIVE, OLLAMA_WARMUP_MODELS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaClient:
+    """Shared keep-alive HTTP client used for every call to Ollama.
+
+    Requests are spread over the endpoints of an EndpointPool; the session
+    keeps a connection pool per endpoint host.
+    """
+
+    def __init__(self, pool=endpoint_pool):
+        self.pool = pool
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        # Only connection failures are retried: the request never reached
+        # Ollama, so retrying a POST cannot start a second generation.
+        retry = Retry(
+            total=OLLAMA_MAX_RETRIES,
+            connect=OLLAMA_MAX_RETRIES,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=OLLAMA_RETRY_BACKOFF,
+            allowed_methods=None,
+            raise_on_status=False
+        )
+        # Never block on an exhausted pool: requests can't give urllib3 a pool
+        # timeout, so a blocked thread would wait forever. The scheduler's
+        # slots already cap concurrent generations; past pool_maxsize a fresh
+        # connection is opened and closed after use.
+        adapter = HTTPAdapter(
+            pool_connections=max(OLLAMA_POOL_CONNECTIONS, len(pool.endpoints)),
+            pool_maxsize=OLLAMA_POOL_MAXSIZE,
+            pool_block=False,
+            max_retries=retry
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "total_time": 0.0}
+
+    def timeout_for(self, route):
+        """(connect, read) timeout for a route name from OLLAMA_TIMEOUTS"""
+        return (OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUTS.get(route, OLLAMA_TIMEOUTS['chat']))
+
+    def record(self, endpoint, start, failed, route, method='POST', path='/api/chat'):
+        elapsed = perf_counter() - start
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["total_time"] += elapsed
+            if failed:
+                self.stats["errors"] += 1
+        # Health checks bypass the breaker; the health monitor feeds it itself
+        if route != 'health':
+            if failed:
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.record_success()
+        logger.debug(f"Ollama {method} {endpoint.url}{path} [{route}] took {elapsed:.2f}s")
+
+    def guard(self, endpoint, route):
+        """Raise CircuitOpen while the endpoint's breaker refuses calls"""
+        if route != 'health':
+            endpoint.breaker.before_request()
+
+    def request(self, endpoint, method, path, route='chat', **kwargs):
+        """Send a request to one Ollama endpoint through the pooled session.
+
+        Raises CircuitOpen without calling Ollama while the endpoint's circuit
+        breaker is open. Health checks bypass the breaker; the health monitor
+        feeds their outcome to it itself.
+        """
+        self.guard(endpoint, route)
+        kwargs.setdefault('timeout', self.timeout_for(route))
+        start = perf_counter()
+        failed = True
+        try:
+            response = self.session.request(method, f"{endpoint.url}{path}", **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            self.record(endpoint, start, failed, route, method, path)
+
+    def chat(self, payload, route='chat', affinity=None):
+        """POST a payload to /api/chat on an endpoint serving its model.
+
+        Images passed as raw bytes are base64 encoded while the body streams out.
+        """
+        payload.setdefault('keep_alive', OLLAMA_KEEP_ALIVE)
+        body = {'data': JsonBody(payload)} if has_raw_images(payload) else {'json': payload}
+        with self.pool.lease(payload['model'], affinity) as endpoint:
+            return self.request(endpoint, 'POST', '/api/chat', route, **body)
+
+    @contextmanager
+    def stream_chat(self, payload, route='chat', affinity=None):
+        """POST a streaming payload to /api/chat, yielding the open response"""
+        payload.setdefault('keep_alive', OLLAMA_KEEP_ALIVE)
+        with self.pool.lease(payload['model'], affinity) as endpoint:
+            self.guard(endpoint, route)
+            start = perf_counter()
+            failed = True
+            try:
+                with self.session.post(f"{endpoint.url}/api/chat", json=payload, stream=True,
+                                       timeout=self.timeout_for(route)) as response:
+                    failed = response.status_code >= 500
+                    try:
+                        yield response
+                    except Exception:
+                        # A stream cut off mid-response counts against the endpoint too
+                        failed = True
+                        raise
+            finally:
+                self.record(endpoint, start, failed, route)
+
+    def warmup(self, models=OLLAMA_WARMUP_MODELS):
+        """Load models into memory so the first user request doesn't pay for it.
+
+        An /api/generate call with an empty prompt only loads the model, on
+        every endpoint that serves it. Failures are logged and ignored: Ollama
+        may simply not be up yet.
+        """
+        for endpoint in self.pool.endpoints:
+            for model in models:
+                if not endpoint.serves(model):
+                    continue
+                try:
+                    response = self.request(endpoint, 'POST', '/api/generate', 'warmup',
+                                            json={"model": model, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE})
+                    if response.status_code == 200:
+                        logger.info(f"Warmed up {model} on {endpoint.url}")
+                    else:
+                        logger.warning(f"Warmup of {model} on {endpoint.url} failed: {response.status_code}")
+                except (requests.exceptions.RequestException, CircuitOpen) as e:
+                    logger.warning(f"Warmup of {model} on {endpoint.url} failed: {e}")
+
+    def version(self, endpoint):
+        """GET /api/version from one endpoint, used for health checks"""
+        return self.request(endpoint, 'GET', '/api/version', 'health')
+
+    def get_stats(self):
+        """Snapshot of request counters"""
+        with self.lock:
+            return dict(self.stats)
+
+
+ollama_client = OllamaClient()
@@ -0,0 +1,108 @@
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import (
+    OLLAMA_ENDPOINTS, OLLAMA_AFFINITY_SIZE, SCHEDULER_MODEL_CONCURRENCY, SCHEDULER_DEFAULT_CONCURRENCY
+)
+from utils.circuit_breaker import CircuitBreaker, CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+
+class NoEndpoint(CircuitOpen):
+    """No healthy endpoint serves the requested model"""
+
+
+class Endpoint:
+    """One Ollama server, the models it serves and its own circuit breaker"""
+
+    def __init__(self, url, models=None):
+        self.url = url.rstrip('/')
+        self.models = set(models or [])
+        self.outstanding = 0
+        self.active = {}  # model -> requests in flight
+        self.breaker = CircuitBreaker()
+        self.requests = 0
+
+    def serves(self, model):
+        return not self.models or model in self.models
+
+    def metrics(self):
+        return {
+            "url": self.url,
+            "models": sorted(self.models),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "circuit": self.breaker.metrics()
+        }
+
+
+class EndpointPool:
+    """Routes Ollama requests across endpoints.
+
+    Picks the endpoint serving the model with the fewest requests in flight.
+    With an affinity key (a conversation) it keeps using the endpoint that
+    served it last, where the conversation's prompt prefix is still cached,
+    as long as that endpoint is healthy and still has a free generation slot
+    for the model (SCHEDULER_MODEL_CONCURRENCY is per endpoint). Endpoints whose circuit is open, for
+    example after a failed health check, are skipped until they recover.
+    """
+
+    def __init__(self, endpoints=OLLAMA_ENDPOINTS, affinity_size=OLLAMA_AFFINITY_SIZE):
+        self.endpoints = [Endpoint(**endpoint) for endpoint in endpoints]
+        self.affinity_size = affinity_size
+        self.affinity = OrderedDict()  # affinity key -> Endpoint, least recent first
+        self.lock = threading.Lock()
+
+    def count_for(self, model):
+        """Number of endpoints configured to serve a model"""
+        return sum(1 for endpoint in self.endpoints if endpoint.serves(model))
+
+    def choose(self, model, affinity=None):
+        """Pick an endpoint for a request and count it as outstanding"""
+        with self.lock:
+            candidates = [e for e in self.endpoints if e.serves(model) and e.breaker.available()]
+            if not candidates:
+                raise NoEndpoint(f"No healthy Ollama endpoint serves {model}")
+
+            limit = SCHEDULER_MODEL_CONCURRENCY.get(model, SCHEDULER_DEFAULT_CONCURRENCY)
+            endpoint = self.affinity.get(affinity) if affinity is not None else None
+            if endpoint not in candidates or endpoint.active.get(model, 0) >= limit:
+                endpoint = min(candidates, key=lambda e: (e.active.get(model, 0), e.outstanding))
+
+            if affinity is not None:
+                self.affinity[affinity] = endpoint
+                self.affinity.move_to_end(affinity)
+                while len(self.affinity) > self.affinity_size:
+                    self.affinity.popitem(last=False)
+
+            endpoint.outstanding += 1
+            endpoint.active[model] = endpoint.active.get(model, 0) + 1
+            endpoint.requests += 1
+        return endpoint
+
+    def release(self, endpoint, model):
+        with self.lock:
+            endpoint.outstanding -= 1
+            endpoint.active[model] -= 1
+
+    @contextmanager
+    def lease(self, model, affinity=None):
+        """Hold an endpoint for the duration of a request"""
+        endpoint = self.choose(model, affinity)
+        try:
+            yield endpoint
+        finally:
+            self.release(endpoint, model)
+
+    def metrics(self):
+        """Per-endpoint load and circuit state"""
+        with self.lock:
+            return {
+                "endpoints": [endpoint.metrics() for endpoint in self.endpoints],
+                "affinity_entries": len(self.affinity)
+            }
+
+
+endpoint_pool = EndpointPool()
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import logging
+import threading
+from config import BCRYPT_ROUNDS, AUTH_HASH_WORKERS, AUTH_HASH_QUEUE_LIMIT, AUTH_HASH_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    """The hashing queue is full; the caller should retry later"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated pool with a bounded queue.
+
+    bcrypt releases the GIL, so hashing on these threads keeps login bursts
+    from stealing request threads, and the queue limit turns overload into a
+    fast 503 instead of an ever-growing backlog.
+    """
+
+    def __init__(self, workers=AUTH_HASH_WORKERS, queue_limit=AUTH_HASH_QUEUE_LIMIT,
+                 rounds=BCRYPT_ROUNDS, timeout=AUTH_HASH_TIMEOUT):
+        self.rounds = rounds
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.lock = threading.Lock()
+        self.stats = {"submitted": 0, "rejected": 0, "rehashed": 0}
+
+    def submit(self, fn, *args):
+        """Queue work on the hashing pool, raising HasherBusy when it is full"""
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.stats["rejected"] += 1
+            raise HasherBusy("Password hashing queue is full")
+        with self.lock:
+            self.stats["submitted"] += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def hash_future(self, password):
+        return self.submit(self._hash, password)
+
+    def verify_future(self, password, password_hash):
+        return self.submit(self._verify, password, password_hash)
+
+    def hash(self, password):
+        """Hash a password with the configured rounds"""
+        return self.hash_future(password).result(self.timeout)
+
+    def verify(self, password, password_hash):
+        """Check a password against a stored hash"""
+        return self.verify_future(password, password_hash).result(self.timeout)
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with different rounds than configured"""
+        if isinstance(password_hash, bytes):
+            password_hash = password_hash.decode('utf-8')
+        try:
+            # Format: $2b$<rounds>$<salt+hash>
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def record_rehash(self):
+        with self.lock:
+            self.stats["rehashed"] += 1
+
+    def metrics(self):
+        """Snapshot of hashing counters"""
+        with self.lock:
+            return dict(self.stats, rounds=self.rounds)
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)).decode('utf-8')
+
+    @staticmethod
+    def _verify(password, password_hash):
+        if isinstance(password_hash, str):
+            password_hash = password_hash.encode('utf-8')
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+from config import (
+    SANDBOX_WORKERS, SANDBOX_MAX_RUNS, SANDBOX_CPU_SECONDS, SANDBOX_WALL_SECONDS,
+    SANDBOX_MEMORY_BYTES, SANDBOX_OUTPUT_BYTES, SANDBOX_QUEUE_TIMEOUT, SANDBOX_PRELOAD
+)
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_worker.py')
+
+
+class SandboxWorker:
+    """One worker process and its protocol pipes"""
+
+    def __init__(self, limits):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, json.dumps(limits)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding='utf-8'
+        )
+        self.ready = False
+        self.runs = 0
+        self.timed_out = False
+
+    def wait_ready(self, timeout):
+        """Block until the worker has finished its imports"""
+        if not self.ready:
+            self.ready = self.read(timeout) is not None
+
+    def read(self, timeout):
+        """Next reply from the worker, or None if it died or ran past the timeout.
+
+        A timer kills the worker at the deadline, which ends the blocked read;
+        this works on Windows too, where pipes can't be polled.
+        """
+        timer = threading.Timer(timeout, self.expire)
+        timer.start()
+        try:
+            line = self.process.stdout.readline()
+        finally:
+            timer.cancel()
+        return json.loads(line) if line else None
+
+    def send(self, code):
+        self.process.stdin.write(json.dumps({"code": code}) + "\n")
+        self.process.stdin.flush()
+        self.runs += 1
+
+    def expire(self):
+        self.timed_out = True
+        self.kill()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+
+    def close(self):
+        """Let the worker exit on end of input, killing it if it doesn't"""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class PythonSandbox:
+    """Runs execute_python_code in a pool of pre-started worker processes.
+
+    User code never runs in the server process: each run gets its own
+    captured output, capped at SANDBOX_OUTPUT_BYTES, and is bounded by a
+    wall-clock timeout. Where the resource module exists it is also bounded
+    by CPU time and address space (rlimits). A worker that times out, dies
+    or has served SANDBOX_MAX_RUNS runs is replaced by a fresh one, so state
+    left behind by one run can't leak far into later ones.
+    """
+
+    def __init__(self, workers=SANDBOX_WORKERS, max_runs=SANDBOX_MAX_RUNS,
+                 wall_seconds=SANDBOX_WALL_SECONDS, queue_timeout=SANDBOX_QUEUE_TIMEOUT):
+        self.size = workers
+        self.max_runs = max_runs
+        self.wall_seconds = wall_seconds
+        self.queue_timeout = queue_timeout
+        self.limits = {
+            "cpu_seconds": SANDBOX_CPU_SECONDS,
+            "memory_bytes": SANDBOX_MEMORY_BYTES,
+            "output_bytes": SANDBOX_OUTPUT_BYTES,
+            "preload": SANDBOX_PRELOAD
+        }
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+        self.stats = {"runs": 0, "timeouts": 0, "crashes": 0, "truncated": 0, "recycled": 0, "busy": 0}
+
+    def start(self):
+        """Start the workers; called at app startup, or lazily on first use"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for _ in range(self.size):
+            self.idle.put(SandboxWorker(self.limits))
+
+    def stop(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def run(self, code):
+        """Run code in a worker, returning the same messages exec() used to give"""
+        self.start()
+        try:
+            worker = self.idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            with self.lock:
+                self.stats["busy"] += 1
+            return "Execution Error: all Python workers are busy, please try again"
+
+        reply = None
+        try:
+            worker.wait_ready(self.wall_seconds)
+            if worker.ready:
+                worker.send(code)
+                reply = worker.read(self.wall_seconds)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Python worker failed: {e}")
+        finally:
+            self.release(worker, reusable=reply is not None)
+
+        with self.lock:
+            self.stats["runs"] += 1
+            if reply is None:
+                self.stats["timeouts" if worker.timed_out else "crashes"] += 1
+            elif reply["truncated"]:
+                self.stats["truncated"] += 1
+
+        if reply is None:
+            return self.failure_message(worker)
+        if reply["error"]:
+            return f"Execution Error: {reply['error']}"
+        if reply["stderr"]:
+            return f"Error: {reply['stderr']}"
+        output = reply["stdout"] + ("\n[output truncated]" if reply["truncated"] else "")
+        return output if output else "Code executed successfully (no output)"
+
+    def failure_message(self, worker):
+        if worker.timed_out:
+            return f"Execution Error: timed out after {self.wall_seconds}s"
+        if -worker.process.wait() == getattr(signal, 'SIGXCPU', None):  # The CPU rlimit was hit
+            return f"Execution Error: CPU time limit of {self.limits['cpu_seconds']}s exceeded"
+        return "Execution Error: the Python worker stopped unexpectedly"
+
+    def release(self, worker, reusable=True):
+        """Return a worker to the pool, or replace it if it's spent or failed"""
+        if reusable and worker.runs < self.max_runs:
+            self.idle.put(worker)
+            return
+        if reusable:
+            with self.lock:
+                self.stats["recycled"] += 1
+            worker.close()
+        else:
+            worker.kill()
+            worker.process.wait()
+        self.idle.put(SandboxWorker(self.limits))
+
+    def metrics(self):
+        """Snapshot of sandbox counters"""
+        with self.lock:
+            return {"workers": self.size, "idle": self.idle.qsize(), **self.stats}
+
+
+python_sandbox = PythonSandbox()
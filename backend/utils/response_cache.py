@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import (
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+# Payload fields that don't change what the model answers
+IGNORED_FIELDS = {'stream', 'keep_alive'}
+
+
+def cache_key(payload):
+    """Digest of the model, options and normalized messages of a chat payload.
+
+    Message text is stripped and whitespace runs collapsed, so trivially
+    different spellings of the same conversation share an entry.
+    """
+    normalized = {
+        key: value for key, value in payload.items()
+        if key not in IGNORED_FIELDS and key != 'messages'
+    }
+    normalized['messages'] = [
+        [msg['role'], ' '.join(msg['content'].split())] for msg in payload.get('messages', [])
+    ]
+    encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Exact-match cache of raw model responses.
+
+    In memory it's an LRU bounded by entry count and total bytes, with every
+    entry expiring after ttl seconds. With a path, entries are also written to
+    a SQLite file so they survive restarts; memory misses fall back to it.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 ttl=RESPONSE_CACHE_TTL, path=RESPONSE_CACHE_PATH):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (response, created)
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self.db = None
+        if path:
+            try:
+                self.db = sqlite3.connect(path, check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(cache_key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl,))
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Response cache store unavailable: {e}")
+                self.db = None
+
+    def get(self, key):
+        """Cached response for a key, or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+                self.remove(key)
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT response, created FROM responses WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self.insert(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, response):
+        now = time.time()
+        with self.lock:
+            self.insert(key, response, now)
+            self.stats["stores"] += 1
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO responses (cache_key, response, created) VALUES (?, ?, ?)",
+                        (key, response, now)
+                    )
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Response cache write failed: {e}")
+
+    def insert(self, key, response, created):
+        """Add an entry and evict the oldest ones past the limits; lock held"""
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = (response, created)
+        self.bytes += len(response.encode('utf-8'))
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            self.remove(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def remove(self, key):
+        response, _ = self.entries.pop(key)
+        self.bytes -= len(response.encode('utf-8'))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def metrics(self):
+        """Snapshot of cache counters"""
+        with self.lock:
+            return {
+                "enabled": RESPONSE_CACHE_ENABLED,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "persistent": self.db is not None,
+                **self.stats
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,131 @@
+"""Worker process for PythonSandbox; run as a script, standard library only.
+
+Reads one JSON request per line ({"code": ...}) from the protocol pipe and
+answers with one JSON line per run. The worker's own stdin and stdout are
+pointed at the null device first, so user code can neither read the
+protocol nor corrupt it.
+"""
+import builtins
+import io
+import json
+import os
+import sys
+import time
+import traceback
+
+try:
+    import resource  # Not available on Windows, where runs are only bounded by the wall clock
+except ImportError:
+    resource = None
+
+
+class OutputLimit(BaseException):
+    """Raised inside user code once it has printed more than the cap.
+
+    A BaseException, so a bare `except Exception` in user code can't swallow it.
+    """
+
+
+class CappedWriter(io.TextIOBase):
+    """Text stream that keeps at most max_bytes of UTF-8 output"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.parts = []
+        self.truncated = False
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        data = text.encode('utf-8', errors='replace')
+        room = self.max_bytes - self.size
+        if len(data) > room:
+            self.parts.append(data[:room].decode('utf-8', errors='ignore'))
+            self.size = self.max_bytes
+            self.truncated = True
+            raise OutputLimit()
+        self.parts.append(text)
+        self.size += len(data)
+        return len(text)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+def set_cpu_limit(seconds):
+    """Allow this run `seconds` more CPU time; the kernel kills the worker past it"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def run(code, output_bytes):
+    stdout = CappedWriter(output_bytes)
+    stderr = CappedWriter(output_bytes)
+    error = None
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        exec(compile(code, '<code>', 'exec'), {'__name__': '__main__', '__builtins__': builtins})
+    except OutputLimit:
+        pass
+    except MemoryError:
+        error = "memory limit exceeded"
+    except SystemExit:
+        pass
+    except BaseException as e:
+        error = str(e) or type(e).__name__
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return {
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "error": error,
+        "truncated": stdout.truncated or stderr.truncated
+    }
+
+
+def main():
+    limits = json.loads(sys.argv[1])
+
+    # Keep the pipes for the protocol and hide them from user code
+    requests = os.fdopen(os.dup(0), 'r', encoding='utf-8')
+    replies = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    sys.stdin = open(os.devnull, 'r')
+
+    # Pay for common imports once per worker rather than once per run
+    for module in limits["preload"]:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+    if resource is not None and limits["memory_bytes"]:
+        resource.setrlimit(resource.RLIMIT_AS, (limits["memory_bytes"], limits["memory_bytes"]))
+
+    replies.write(json.dumps({"ready": True}) + "\n")
+    replies.flush()
+
+    for line in requests:
+        request = json.loads(line)
+        if resource is not None:
+            set_cpu_limit(limits["cpu_seconds"])
+        start = time.perf_counter()
+        try:
+            reply = run(request["code"], limits["output_bytes"])
+        except BaseException:
+            reply = {"stdout": "", "stderr": "", "error": traceback.format_exc(limit=1), "truncated": False}
+        reply["elapsed"] = round(time.perf_counter() - start, 3)
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from config import (
+    SCHEDULER_MODEL_CONCURRENCY, SCHEDULER_DEFAULT_CONCURRENCY, SCHEDULER_QUEUE_LIMIT,
+    SCHEDULER_QUEUE_TIMEOUT, SCHEDULER_USER_WEIGHTS
+)
+from utils.token_budget import estimate_tokens, MESSAGE_OVERHEAD
+from utils.ollama_endpoints import endpoint_pool
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerBusy(Exception):
+    """A generation couldn't be scheduled; the caller should retry later"""
+
+
+class QueueFull(SchedulerBusy):
+    """Too many requests are already waiting for this model"""
+
+
+class QueueTimeout(SchedulerBusy):
+    """The request waited past its deadline and was dropped"""
+
+
+# llava turns every image into a fixed number of prompt tokens
+IMAGE_TOKENS = 576
+
+
+def request_cost(payload):
+    """Approximate prompt tokens of a chat payload, the work it asks of Ollama"""
+    return sum(
+        estimate_tokens(msg.get('content', '')) + MESSAGE_OVERHEAD + IMAGE_TOKENS * len(msg.get('images', []))
+        for msg in payload.get('messages', [])
+    )
+
+
+def model_slots(model):
+    """Generations of a model allowed at once, across every endpoint serving it"""
+    per_endpoint = SCHEDULER_MODEL_CONCURRENCY.get(model, SCHEDULER_DEFAULT_CONCURRENCY)
+    return per_endpoint * max(endpoint_pool.count_for(model), 1)
+
+
+class Ticket:
+    """A request's place in a model queue"""
+
+    def __init__(self, user, cost, start, finish, deadline, seq):
+        self.user = user
+        self.cost = cost
+        self.start = start
+        self.finish = finish
+        self.deadline = deadline
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.position = 0     # Requests ahead of this one when it was queued
+        self.waited = 0.0
+        self.granted = False
+        self.expired = False
+
+    def info(self):
+        """Queue stats reported back to the client"""
+        return {"queue_position": self.position, "queue_wait": round(self.waited, 3)}
+
+
+class FairQueue:
+    """Weighted fair queue of requests for one model.
+
+    Each request gets a virtual finish tag of start + cost / weight, where
+    start is the later of the queue's virtual time and the user's previous
+    finish tag, and the smallest tag is served first. A user with many queued
+    prompts only competes with their own backlog, and since cost is the
+    prompt size, short prompts get ahead of long ones. Not thread-safe; the
+    schedulers hold their lock around every call.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.active = 0
+        self.waiting = []
+        self.virtual_time = 0.0
+        self.last_finish = {}  # user -> finish tag of their latest request
+        self.seq = itertools.count()
+
+    def enqueue(self, user, cost, timeout):
+        weight = SCHEDULER_USER_WEIGHTS.get(user, 1.0)
+        start = max(self.virtual_time, self.last_finish.get(user, 0.0))
+        finish = start + max(cost, 1) / weight
+        self.last_finish[user] = finish
+        ticket = Ticket(user, cost, start, finish, time.monotonic() + timeout, next(self.seq))
+        ticket.position = self.active + sum(1 for other in self.waiting if (other.finish, other.seq) < (finish, ticket.seq))
+        self.waiting.append(ticket)
+        return ticket
+
+    def dispatch(self):
+        """Grant free slots to the queued tickets with the smallest finish tags"""
+        now = time.monotonic()
+        while self.active < self.slots and self.waiting:
+            ticket = min(self.waiting, key=lambda t: (t.finish, t.seq))
+            self.waiting.remove(ticket)
+            if ticket.deadline <= now:
+                ticket.expired = True
+                continue
+            ticket.granted = True
+            ticket.waited = now - ticket.enqueued
+            self.active += 1
+            self.virtual_time = max(self.virtual_time, ticket.start)
+        # Finish tags behind the virtual time no longer affect anybody
+        self.last_finish = {user: tag for user, tag in self.last_finish.items() if tag > self.virtual_time}
+
+    def withdraw(self, ticket):
+        if ticket in self.waiting:
+            self.waiting.remove(ticket)
+
+    def release(self):
+        self.active -= 1
+
+
+class OllamaScheduler:
+    """Admission control in front of Ollama: bounded concurrency per model,
+    weighted fair queuing per user and a deadline for every queued request.
+    """
+
+    def __init__(self, queue_limit=SCHEDULER_QUEUE_LIMIT, timeout=SCHEDULER_QUEUE_TIMEOUT):
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.queues = {}  # model -> FairQueue
+        self.cond = threading.Condition()
+        self.stats = {"scheduled": 0, "rejected": 0, "expired": 0, "total_wait": 0.0}
+
+    def queue_for(self, model):
+        queue = self.queues.get(model)
+        if queue is None:
+            queue = self.queues[model] = FairQueue(model_slots(model))
+        return queue
+
+    @contextmanager
+    def slot(self, model, user, cost):
+        """Hold one of the model's generation slots, waiting for a fair turn"""
+        ticket = self.acquire(model, user, cost)
+        try:
+            yield ticket
+        finally:
+            with self.cond:
+                queue = self.queues[model]
+                queue.release()
+                queue.dispatch()
+                self.cond.notify_all()
+
+    def acquire(self, model, user, cost):
+        with self.cond:
+            queue = self.queue_for(model)
+            if len(queue.waiting) >= self.queue_limit:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"Too many requests waiting for {model}")
+            ticket = queue.enqueue(user, cost, self.timeout)
+            while True:
+                queue.dispatch()
+                self.cond.notify_all()
+                if ticket.granted:
+                    break
+                remaining = ticket.deadline - time.monotonic()
+                if ticket.expired or remaining <= 0:
+                    queue.withdraw(ticket)
+                    self.stats["expired"] += 1
+                    raise QueueTimeout(f"Request for {model} waited more than {self.timeout}s")
+                self.cond.wait(remaining)
+            self.stats["scheduled"] += 1
+            self.stats["total_wait"] += ticket.waited
+        if ticket.position:
+            logger.info(f"Scheduled {user} on {model} after {ticket.waited:.2f}s (position {ticket.position})")
+        return ticket
+
+    def metrics(self):
+        """Snapshot of queue lengths and counters"""
+        with self.cond:
+            return {
+                "queues": {model: {"active": queue.active, "waiting": len(queue.waiting)}
+                           for model, queue in self.queues.items()},
+                **self.stats
+            }
+
+
+ollama_scheduler = OllamaScheduler()
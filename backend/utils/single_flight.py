@@ -0,0 +1,204 @@
+import logging
+import threading
+from concurrent.futures import Future
+from config import SINGLE_FLIGHT_ENABLED
+from utils.ollama_client import ollama_client
+from utils.scheduler import ollama_scheduler, request_cost
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """State of one streamed generation shared by its subscribers"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.lines = []          # Raw NDJSON lines received so far
+        self.status_code = None
+        self.error = None
+        self.done = False
+        self.subscribers = 0
+        self.queue = {}          # Queue stats of the scheduled generation
+
+
+class SharedStream:
+    """One subscriber's copy of a shared streamed response.
+
+    Offers the parts of requests.Response the chat code uses (status_code,
+    iter_lines, use as a context manager). Every subscriber reads the whole
+    stream from the start, however late it joined.
+    """
+
+    def __init__(self, group, key, flight):
+        self.group = group
+        self.key = key
+        self.flight = flight
+
+    @property
+    def status_code(self):
+        return self.flight.status_code
+
+    @property
+    def queue(self):
+        return self.flight.queue
+
+    def __enter__(self):
+        flight = self.flight
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.status_code is not None or flight.done)
+            if flight.status_code is None and flight.error is not None:
+                self.group.leave(flight)
+                raise flight.error
+        return self
+
+    def __exit__(self, *exc):
+        self.group.leave(self.flight)
+
+    def iter_lines(self):
+        flight = self.flight
+        index = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: index < len(flight.lines) or flight.done)
+                lines = flight.lines[index:]
+                index = len(flight.lines)
+                finished = flight.done
+            yield from lines
+            if finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+
+class SingleFlight:
+    """Coalesces identical concurrent Ollama chat requests into one upstream call.
+
+    Callers pass a request key (see response_cache.cache_key). While a call
+    for a key is in flight, later callers with the same key wait for it and
+    get the same response instead of queueing a duplicate generation. Streams
+    are read by a background thread and fanned out to every subscriber.
+    Only the upstream call waits for a slot from the scheduler, so requests
+    that share it don't take slots of their own.
+    """
+
+    def __init__(self, client=ollama_client):
+        self.client = client
+        self.calls = {}    # key -> Future of a pending non-streaming call
+        self.streams = {}  # key -> Flight of a pending streaming call
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "shared_calls": 0, "streams": 0, "shared_streams": 0, "abandoned_streams": 0}
+
+    def chat(self, key, payload, route='chat', user=None, queue_info=None, affinity=None):
+        """Like OllamaClient.chat, sharing the response with identical concurrent calls.
+
+        queue_info, if given, is filled with the queue position and wait of
+        the scheduled generation.
+        """
+        if not SINGLE_FLIGHT_ENABLED:
+            key = object()  # Never shared
+
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Future()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared_calls"] += 1
+
+        if leader:
+            try:
+                with ollama_scheduler.slot(payload['model'], user, request_cost(payload)) as ticket:
+                    call.queue = ticket.info()
+                    call.set_result(self.client.chat(payload, route, affinity))
+            except BaseException as e:
+                call.set_exception(e)
+                raise
+            finally:
+                with self.lock:
+                    del self.calls[key]
+
+        response = call.result()
+        if queue_info is not None:
+            queue_info.update(call.queue)
+        return response
+
+    def stream_chat(self, key, payload, route='chat', user=None, affinity=None):
+        """Like OllamaClient.stream_chat, subscribing to a shared stream"""
+        if not SINGLE_FLIGHT_ENABLED:
+            key = object()  # Never shared
+
+        with self.lock:
+            flight = self.streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.streams[key] = Flight()
+                self.stats["streams"] += 1
+            else:
+                self.stats["shared_streams"] += 1
+            flight.subscribers += 1
+
+        if leader:
+            threading.Thread(target=self.produce, args=(key, flight, payload, route, user, affinity), daemon=True).start()
+        return SharedStream(self, key, flight)
+
+    def produce(self, key, flight, payload, route, user, affinity):
+        """Read the upstream stream into the flight until it ends or nobody listens"""
+        try:
+            with ollama_scheduler.slot(payload['model'], user, request_cost(payload)) as ticket:
+                flight.queue = ticket.info()
+                if self.abandoned(key, flight):
+                    return
+                with self.client.stream_chat(payload, route, affinity) as response:
+                    with flight.cond:
+                        flight.status_code = response.status_code
+                        flight.cond.notify_all()
+                    if response.status_code != 200:
+                        return
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        with flight.cond:
+                            flight.lines.append(line)
+                            flight.cond.notify_all()
+                        if self.abandoned(key, flight):
+                            # Closing the response makes Ollama stop generating
+                            return
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self.lock:
+                self.forget(key, flight)
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def abandoned(self, key, flight):
+        """True, and the flight forgotten, once every subscriber has left"""
+        with self.lock:
+            if flight.subscribers == 0:
+                self.stats["abandoned_streams"] += 1
+                self.forget(key, flight)
+                return True
+            return False
+
+    def forget(self, key, flight):
+        """Stop routing new subscribers to a flight; lock held"""
+        if self.streams.get(key) is flight:
+            del self.streams[key]
+
+    def leave(self, flight):
+        with self.lock:
+            flight.subscribers -= 1
+
+    def metrics(self):
+        """Snapshot of coalescing counters"""
+        with self.lock:
+            return {
+                "enabled": SINGLE_FLIGHT_ENABLED,
+                "in_flight": len(self.calls) + len(self.streams),
+                **self.stats
+            }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,116 @@
+import re
+
+EXTRA_NEWLINES = re.compile(r'\n\s*\n\s*\n+')
+TRAILING_SPACES = re.compile(r'[ \t]+\n')
+HEADER_MARKS = re.compile(r'^#{1,3}\s*', re.MULTILINE)
+
+
+def tidy(text):
+    """Line-level cleanup shared by clean_response and StreamCleaner"""
+    # Clean up excessive newlines (max 2 consecutive)
+    text = EXTRA_NEWLINES.sub('\n\n', text)
+    # Remove trailing spaces at end of lines
+    text = TRAILING_SPACES.sub('\n', text)
+    # Remove header markdown
+    return HEADER_MARKS.sub('', text)
+
+
+class BlockFilter:
+    """Streaming re.sub(r'<tag>.*?</tag>', '', text, flags=re.DOTALL | re.IGNORECASE).
+
+    A block is held back until its closing tag arrives and then dropped; a
+    block that is never closed is given back by flush(), as the regex would
+    leave it in place.
+    """
+
+    def __init__(self, tag):
+        self.open_tag = re.compile(f'<{tag}>', re.IGNORECASE)
+        self.close_tag = re.compile(f'</{tag}>', re.IGNORECASE)
+        self.open_len = len(tag) + 2
+        self.close_len = len(tag) + 3
+        self.buffer = ""
+        self.block = None  # Text of the open block, tag included
+
+    def feed(self, text):
+        self.buffer += text
+        out = []
+        while True:
+            if self.block is not None:
+                match = self.close_tag.search(self.buffer)
+                if match:
+                    self.buffer = self.buffer[match.end():]
+                    self.block = None
+                    continue
+                # Keep a possible partial closing tag in the buffer
+                keep = max(len(self.buffer) - (self.close_len - 1), 0)
+                self.block += self.buffer[:keep]
+                self.buffer = self.buffer[keep:]
+                break
+
+            match = self.open_tag.search(self.buffer)
+            if match:
+                out.append(self.buffer[:match.start()])
+                self.block = match.group(0)
+                self.buffer = self.buffer[match.end():]
+                continue
+
+            # Hold back a trailing '<...' that may still become an opening tag
+            cut = self.buffer.rfind('<', max(0, len(self.buffer) - (self.open_len - 1)))
+            if cut == -1:
+                cut = len(self.buffer)
+            out.append(self.buffer[:cut])
+            self.buffer = self.buffer[cut:]
+            break
+        return ''.join(out)
+
+    def flush(self):
+        text = (self.block or "") + self.buffer
+        self.buffer = ""
+        self.block = None
+        return text
+
+
+class StreamCleaner:
+    """Incremental version of SimpleChatBot.clean_response for streamed tokens.
+
+    Feed raw model tokens in and get back text that is safe to show right
+    away; joined with flush(), the output equals clean_response on the full
+    text. Thinking blocks go through the same two passes as clean_response.
+    tidy() only ever changes runs of whitespace and '#', so text is held back
+    from the last other character on and everything before it is final.
+    """
+
+    def __init__(self):
+        self.filters = [BlockFilter('think'), BlockFilter('thinking')]
+        self.pending = ""  # Trailing whitespace and '#' that may still change
+        self.last = None  # Last character emitted, never whitespace or '#'
+
+    def feed(self, token):
+        """Consume a raw token and return the cleaned text ready to emit"""
+        for block_filter in self.filters:
+            token = block_filter.feed(token)
+        return self._format(token)
+
+    def flush(self):
+        """Emit whatever is still buffered once the stream has ended"""
+        text = ""
+        for block_filter in self.filters:
+            text = block_filter.feed(text) + block_filter.flush()
+        return self._format(text, final=True)
+
+    def _format(self, text, final=False):
+        self.pending += text
+        cut = len(self.pending)
+        if not final:
+            while cut and (self.pending[cut - 1].isspace() or self.pending[cut - 1] == '#'):
+                cut -= 1
+        chunk, self.pending = self.pending[:cut], self.pending[cut:]
+
+        if self.last is None:
+            out = tidy(chunk).lstrip()
+        else:
+            # The character before the chunk keeps '^' from matching at its start
+            out = tidy(self.last + chunk)[1:]
+        if chunk and not final:
+            self.last = chunk[-1]
+        return out.rstrip() if final else out
@@ -0,0 +1,40 @@
+import re
+from config import CONTEXT_TOKEN_BUDGETS, DEFAULT_CONTEXT_TOKEN_BUDGET
+
+# Words split into chunks of up to 4 characters plus one token per symbol is
+# close to what BPE tokenizers produce for both prose and code.
+TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+MESSAGE_OVERHEAD = 4  # Role markers and separators per chat message
+
+def estimate_tokens(text):
+    """Fast approximate token count for a piece of text"""
+    return len(TOKEN_RE.findall(text))
+
+def message_tokens(message):
+    """Token estimate for a chat message, cached on the message itself"""
+    tokens = message.get('tokens')
+    if tokens is None:
+        tokens = estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD
+        message['tokens'] = tokens
+    return tokens
+
+def budget_for(model):
+    """Prompt token budget configured for a model"""
+    return CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_CONTEXT_TOKEN_BUDGET)
+
+def fit_history(history, budget):
+    """Most recent messages of history that fit within budget tokens.
+
+    Messages are taken newest first and kept contiguous. The latest user turn
+    is always included, even if on its own it exceeds the budget.
+    """
+    last_user = max((i for i, msg in enumerate(history) if msg.get('role') == 'user'), default=-1)
+    start = len(history)
+    used = 0
+    for i in range(len(history) - 1, -1, -1):
+        tokens = message_tokens(history[i])
+        if used + tokens > budget and i < last_user:
+            break
+        used += tokens
+        start = i
+    return history[start:]
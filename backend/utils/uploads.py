@@ -0,0 +1,15 @@
+from tempfile import SpooledTemporaryFile
+from flask import Request
+from config import UPLOAD_SPOOL_BYTES
+
+
+def spooled_stream_factory(total_content_length, content_type, filename, content_length=None):
+    """Keep small uploads in memory and spill larger ones to a temporary file"""
+    return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode='rb+')
+
+
+class UploadRequest(Request):
+    """Flask request whose file uploads are spooled at UPLOAD_SPOOL_BYTES"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return spooled_stream_factory(total_content_length, content_type, filename, content_length)